@@ -17,19 +17,15 @@ SQL (Structured Query Language) - это язык структурированн
 (использующими различные структуры данных, такие как документы, графы или ключ-значение).
 '''
 import sqlite3
+
+from migrations import migrate
+from school import LEGACY_MIGRATIONS
+
 # Подключаемся (или создаем, если файла нет) database
 conn = sqlite3.connect('school.db')
 cursor = conn.cursor()
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS students (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    age INTEGER,
-    email TEXT
-)
-''')
-conn.commit()  # Сохраняем изменения
+# Таблица создаётся один раз, дальше только проверяется версия схемы
+migrate(conn, LEGACY_MIGRATIONS)
 ''''CRUD - Create, Read, Update, Delete'''
 # cursor.execute("INSERT INTO students (name, age, email) VALUES (?, ?, ?)", 
 #                 ('Азамат', 14, 
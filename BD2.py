@@ -37,22 +37,14 @@
 
 # conn.close()
 import sqlite3
+
+from migrations import migrate
+from school import MIGRATIONS, Students
+
 conn = sqlite3.connect('school_v2.db')
 cursor = conn.cursor()
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS students (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    age INTEGER,
-    email TEXT, 
-    grade INTEGER
-)
-''')
-conn.commit()
-cursor.execute("INSERT INTO students (name, age, email, grade) VALUES (?, ?, ?, ?)", 
-                ('Айгуль', 15,
-                'aigul@example.com', 9))
-conn.commit()
+migrate(conn, MIGRATIONS)
+students = Students(conn)
 # cursor.execute("INSERT INTO students (name, age, email, grade) VALUES (?, ?, ?, ?)", 
 #                 ('Азамат', 16,
 #                  'azamat@example.com', 10))
@@ -85,24 +77,15 @@ cursor.execute("SELECT * FROM students WHERE age > 15")
 print("\n ====== Студенты старше 15 лет ======")
 for row in cursor.fetchall():
     print(row)
-cursor.execute("UPDATE students SET grade = 10 WHERE name = 'Айгуль'")
-cursor.execute("UPDATE students SET grade = 10 WHERE name = 'Алина'")
-conn.commit()
+students.update_many([('Айгуль', {'grade': 10}), ('Алина', {'grade': 10})])
 print("\n ====== Обновление данных ======")
 cursor.execute("SELECT * FROM students")
 for row in cursor.fetchall():
     print(row)
-cursor.execute("UPDATE students SET email = 'timur10@example.com' WHERE name = 'Тимур'")
-conn.commit()
-cursor.execute("UPDATE students SET age = age + 1")
-conn.commit()
-print("\n ====== После изменений ======")
-cursor.execute("SELECT * FROM students")
-for row in cursor.fetchall():
-    print(row)
-cursor.execute("DELETE FROM students WHERE age < 16")
-conn.commit()
-print("\n ====== После удаления ======")
+students.update_many([('Тимур', {'email': 'timur10@example.com'})])
+# Год прошёл: всем +1 год, младше 16 удаляются той же транзакцией
+students.advance_year(drop_below=16)
+print("\n ====== После изменений и удаления ======")
 cursor.execute("SELECT * FROM students")
 for row in cursor.fetchall():
     print(row)
@@ -1,8 +1,124 @@
+import heapq
 import sqlite3
-from datetime import datetime
-conn = sqlite3.connect('chocolate.db')
-cursor = conn.cursor()
-cursor.execute('''
+import threading
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from auth import Authenticator, hash_password, normalize_email
+from db_pool import ConnectionPool
+from errors import InvalidCouponError
+
+DB_FILE = 'chocolate.db'
+
+# Сводки отчётов (миграция 4) поддерживаются триггерами построчно, а при
+# массовой загрузке (DatabaseManager.bulk_load) пересчитываются целиком.
+ROLLUP_REBUILD = [
+'DELETE FROM revenue_daily',
+'DELETE FROM product_sales_daily',
+'DELETE FROM product_sales_total',
+'''
+INSERT INTO revenue_daily (day, amount, payments)
+SELECT date(payment_date), SUM(amount), COUNT(*) FROM payments
+WHERE status = 'success' GROUP BY date(payment_date)
+''',
+'''
+INSERT INTO product_sales_daily (day, product_id, units)
+SELECT date(o.created_at), oi.product_id, SUM(oi.quantity)
+FROM order_items oi JOIN orders o ON o.id = oi.order_id
+WHERE o.status IN ('paid', 'shipped', 'completed')
+GROUP BY date(o.created_at), oi.product_id
+''',
+'''
+INSERT INTO product_sales_total (product_id, units)
+SELECT product_id, SUM(units) FROM product_sales_daily GROUP BY product_id
+''',
+]
+
+ROLLUP_TRIGGERS = {
+'revenue_daily_insert': '''
+CREATE TRIGGER IF NOT EXISTS revenue_daily_insert AFTER INSERT ON payments
+WHEN NEW.status = 'success'
+BEGIN
+    INSERT INTO revenue_daily (day, amount, payments) VALUES (date(NEW.payment_date), NEW.amount, 1)
+    ON CONFLICT(day) DO UPDATE SET amount = amount + excluded.amount, payments = payments + 1;
+END
+''',
+'revenue_daily_delete': '''
+CREATE TRIGGER IF NOT EXISTS revenue_daily_delete AFTER DELETE ON payments
+WHEN OLD.status = 'success'
+BEGIN
+    UPDATE revenue_daily SET amount = amount - OLD.amount, payments = payments - 1
+    WHERE day = date(OLD.payment_date);
+END
+''',
+'revenue_daily_update': '''
+CREATE TRIGGER IF NOT EXISTS revenue_daily_update AFTER UPDATE OF amount, status, payment_date ON payments
+BEGIN
+    UPDATE revenue_daily SET amount = amount - OLD.amount, payments = payments - 1
+    WHERE OLD.status = 'success' AND day = date(OLD.payment_date);
+    INSERT INTO revenue_daily (day, amount, payments)
+    SELECT date(NEW.payment_date), NEW.amount, 1 WHERE NEW.status = 'success'
+    ON CONFLICT(day) DO UPDATE SET amount = amount + excluded.amount, payments = payments + 1;
+END
+''',
+'product_sales_item_insert': '''
+CREATE TRIGGER IF NOT EXISTS product_sales_item_insert AFTER INSERT ON order_items
+WHEN (SELECT status FROM orders WHERE id = NEW.order_id) IN ('paid', 'shipped', 'completed')
+BEGIN
+    INSERT INTO product_sales_daily (day, product_id, units)
+    SELECT date(created_at), NEW.product_id, NEW.quantity FROM orders WHERE id = NEW.order_id
+    ON CONFLICT(day, product_id) DO UPDATE SET units = units + excluded.units;
+    INSERT INTO product_sales_total (product_id, units) VALUES (NEW.product_id, NEW.quantity)
+    ON CONFLICT(product_id) DO UPDATE SET units = units + excluded.units;
+END
+''',
+'product_sales_item_delete': '''
+CREATE TRIGGER IF NOT EXISTS product_sales_item_delete AFTER DELETE ON order_items
+WHEN (SELECT status FROM orders WHERE id = OLD.order_id) IN ('paid', 'shipped', 'completed')
+BEGIN
+    UPDATE product_sales_daily SET units = units - OLD.quantity
+    WHERE product_id = OLD.product_id AND day = (SELECT date(created_at) FROM orders WHERE id = OLD.order_id);
+    UPDATE product_sales_total SET units = units - OLD.quantity WHERE product_id = OLD.product_id;
+END
+''',
+'product_sales_order_counted': '''
+CREATE TRIGGER IF NOT EXISTS product_sales_order_counted AFTER UPDATE OF status ON orders
+WHEN NEW.status IN ('paid', 'shipped', 'completed')
+    AND COALESCE(OLD.status, '') NOT IN ('paid', 'shipped', 'completed')
+BEGIN
+    INSERT INTO product_sales_daily (day, product_id, units)
+    SELECT date(NEW.created_at), product_id, SUM(quantity) FROM order_items
+    WHERE order_id = NEW.id GROUP BY product_id
+    ON CONFLICT(day, product_id) DO UPDATE SET units = units + excluded.units;
+    INSERT INTO product_sales_total (product_id, units)
+    SELECT product_id, SUM(quantity) FROM order_items
+    WHERE order_id = NEW.id GROUP BY product_id
+    ON CONFLICT(product_id) DO UPDATE SET units = units + excluded.units;
+END
+''',
+'product_sales_order_uncounted': '''
+CREATE TRIGGER IF NOT EXISTS product_sales_order_uncounted AFTER UPDATE OF status ON orders
+WHEN OLD.status IN ('paid', 'shipped', 'completed')
+    AND COALESCE(NEW.status, '') NOT IN ('paid', 'shipped', 'completed')
+BEGIN
+    UPDATE product_sales_daily SET units = units - (
+        SELECT SUM(quantity) FROM order_items
+        WHERE order_id = NEW.id AND product_id = product_sales_daily.product_id)
+    WHERE day = date(OLD.created_at)
+        AND product_id IN (SELECT product_id FROM order_items WHERE order_id = NEW.id);
+    UPDATE product_sales_total SET units = units - (
+        SELECT SUM(quantity) FROM order_items
+        WHERE order_id = NEW.id AND product_id = product_sales_total.product_id)
+    WHERE product_id IN (SELECT product_id FROM order_items WHERE order_id = NEW.id);
+END
+''',
+}
+
+MIGRATIONS = [
+(1, [
+'''
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT,
@@ -11,9 +127,8 @@ CREATE TABLE IF NOT EXISTS users (
     balance REAL DEFAULT 0,
     role TEXT CHECK(role IN ('client', 'admin'))
 )
-''')
-conn.commit()
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS products (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 name TEXT,
@@ -22,26 +137,20 @@ price REAL,
 quantity INTEGER,
 discount_id INTEGER NULL,
 FOREIGN KEY(discount_id) REFERENCES discounts(id))
+''',
 '''
-)
-conn.commit()
-cursor.execute('''
 CREATE TABLE IF NOT EXISTS discounts (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 name TEXT,
 discount_percent REAL,
 valid_from TEXT,
-valid_to TEXT, 
+valid_to TEXT,
 is_active INTEGER DEFAULT 1,
 applies_to TEXT CHECK(applies_to IN ('product', 'category', 'global')),
 target_value TEXT NULL
 )
+''',
 '''
-)
-
-conn.commit()
-
-cursor.execute('''
 CREATE TABLE IF NOT EXISTS coupons (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 code TEXT UNIQUE,
@@ -52,22 +161,20 @@ usage_limit INTEGER,
 used_count INTEGER DEFAULT 0,
 is_active INTEGER DEFAULT 1
 )
-''')
-conn.commit()
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS orders (
-d INTEGER PRIMARY KEY AUTOINCREMENT, 
+d INTEGER PRIMARY KEY AUTOINCREMENT,
 user_id INTEGER,
 total_price REAL,
-coupon_id INTEGER NULL, 
-created_at TEXT, 
+coupon_id INTEGER NULL,
+created_at TEXT,
 status TEXT CHECK(status IN ('pending', 'paid', 'shipped', 'completed', 'cancelled')),
 FOREIGN KEY(user_id) REFERENCES users(id),
 FOREIGN KEY(coupon_id) REFERENCES coupons(id)
 )
-''')
-conn.commit()
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS order_items (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 order_id INTEGER,
@@ -77,30 +184,170 @@ price REAL,
 FOREIGN KEY(order_id) REFERENCES orders(id),
 FOREIGN KEY(product_id) REFERENCES products(id)
 )
-''')
-conn.commit()
-
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS payments (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
-order_id INTEGER, 
+order_id INTEGER,
 user_id INTEGER,
-amount REAL, 
+amount REAL,
 status TEXT CHECK(status IN ('success', 'failed')),
 payment_date TEXT,
 FOREIGN KEY(order_id) REFERENCES orders(id),
 FOREIGN KEY(user_id) REFERENCES users(id)
 )
-''')
-conn.commit()
+''',
+'''
+INSERT INTO discounts (name, discount_percent, valid_from, valid_to, is_active, applies_to, target_value)
+SELECT 'Summer Sale', 15.0, '2024-06-01', '2024-06-30', 1, 'category', 'chocolate'
+WHERE NOT EXISTS (SELECT 1 FROM discounts WHERE name = 'Summer Sale')
+''',
+]),
+# Раньше 'Summer Sale' вставлялась при каждом импорте: оставляем одну копию
+# каждой скидки и перевешиваем на неё товары. Заодно исправляем имя ключа orders.
+(2, [
+'''
+UPDATE products SET discount_id = (
+    SELECT MIN(d2.id) FROM discounts d1
+    JOIN discounts d2 ON d2.name IS d1.name AND d2.discount_percent IS d1.discount_percent
+        AND d2.valid_from IS d1.valid_from AND d2.valid_to IS d1.valid_to
+        AND d2.applies_to IS d1.applies_to AND d2.target_value IS d1.target_value
+    WHERE d1.id = products.discount_id)
+WHERE discount_id IN (SELECT id FROM discounts)
+''',
+'''
+DELETE FROM discounts WHERE id NOT IN (
+    SELECT MIN(id) FROM discounts
+    GROUP BY name, discount_percent, valid_from, valid_to, applies_to, target_value)
+''',
+'ALTER TABLE orders RENAME COLUMN d TO id',
+]),
+# Счётчик изменений discounts: по нему DiscountEngine понимает, что кэш устарел
+(3, [
+'''
+CREATE TABLE IF NOT EXISTS table_versions (
+name TEXT PRIMARY KEY,
+version INTEGER NOT NULL DEFAULT 0
+)
+''',
+"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('discounts', 0)",
+'''
+CREATE TRIGGER IF NOT EXISTS discounts_version_insert AFTER INSERT ON discounts
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'discounts';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS discounts_version_update AFTER UPDATE ON discounts
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'discounts';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS discounts_version_delete AFTER DELETE ON discounts
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'discounts';
+END
+''',
+]),
+# Сводки для отчётов администратора: выручка по дням и продажи товаров
+# (по дням и за всё время). Поддерживаются триггерами на payments,
+# orders и order_items; в продажи идут только заказы paid/shipped/completed.
+(4, [
+'''
+CREATE TABLE IF NOT EXISTS revenue_daily (
+day TEXT PRIMARY KEY,
+amount REAL NOT NULL DEFAULT 0,
+payments INTEGER NOT NULL DEFAULT 0
+)
+''',
+'''
+CREATE TABLE IF NOT EXISTS product_sales_daily (
+day TEXT,
+product_id INTEGER,
+units INTEGER NOT NULL DEFAULT 0,
+PRIMARY KEY (day, product_id)
+)
+''',
+'''
+CREATE TABLE IF NOT EXISTS product_sales_total (
+product_id INTEGER PRIMARY KEY,
+units INTEGER NOT NULL DEFAULT 0
+)
+''',
+'CREATE INDEX IF NOT EXISTS product_sales_total_units ON product_sales_total(units)',
+*ROLLUP_REBUILD,
+*ROLLUP_TRIGGERS.values(),
+]),
+# Индексы под внешние ключи и отчёты
+(5, [
+'CREATE INDEX IF NOT EXISTS order_items_order_id ON order_items(order_id)',
+'CREATE INDEX IF NOT EXISTS order_items_product_id ON order_items(product_id, quantity, price, order_id)',
+'CREATE INDEX IF NOT EXISTS orders_user_id ON orders(user_id)',
+'CREATE INDEX IF NOT EXISTS orders_coupon_id ON orders(coupon_id)',
+'CREATE INDEX IF NOT EXISTS payments_order_id ON payments(order_id)',
+'CREATE INDEX IF NOT EXISTS payments_status_date ON payments(status, payment_date, amount)',
+'CREATE INDEX IF NOT EXISTS products_discount_id ON products(discount_id)',
+]),
+# Версия строки товара для оптимистичных резервов и временные резервы (reservations.py)
+(6, [
+'ALTER TABLE products ADD COLUMN version INTEGER NOT NULL DEFAULT 0',
+'''
+CREATE TABLE IF NOT EXISTS stock_holds (
+id INTEGER PRIMARY KEY AUTOINCREMENT,
+product_id INTEGER NOT NULL,
+quantity INTEGER NOT NULL,
+holder TEXT,
+expires_at REAL NOT NULL,
+FOREIGN KEY(product_id) REFERENCES products(id)
+)
+''',
+'CREATE INDEX IF NOT EXISTS stock_holds_expires_at ON stock_holds(expires_at)',
+'CREATE INDEX IF NOT EXISTS stock_holds_product_id ON stock_holds(product_id)',
+]),
+# Версия каталога для ETag в webapp.py: добавление, удаление и правка
+# видимых полей products. Списания и резервы меняют только quantity и
+# version, ETag страниц каталога от них не сбрасывается
+(7, [
+"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('products', 0)",
+'''
+CREATE TRIGGER IF NOT EXISTS products_version_insert AFTER INSERT ON products
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'products';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS products_version_update AFTER UPDATE OF name, category, price, discount_id ON products
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'products';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS products_version_delete AFTER DELETE ON products
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'products';
+END
+''',
+]),
+# Email хранится в виде normalize_email; записи, у которых нормализованный
+# email уже занят другим пользователем, остаются как есть
+(8, [
+'''
+UPDATE users SET email = lower(trim(email))
+WHERE email <> lower(trim(email))
+    AND NOT EXISTS (SELECT 1 FROM users u WHERE u.email = lower(trim(users.email)))
+    AND id = (SELECT MIN(u.id) FROM users u WHERE lower(trim(u.email)) = lower(trim(users.email)))
+''',
+]),
+]
 
 
 class OutOfStockError(Exception):
     pass
-class InvalidCouponError(Exception):
-    pass
 class InsufficientBalanceError(Exception):
     pass
+class ReservationConflictError(Exception):
+    pass
 
 class User:
     def __init__(self, db, name, email, password, balance=0):
@@ -109,30 +356,27 @@ class User:
         self.email = email
         self.password = password
         self.balance = balance
-    
-def save(self):
-        cursor = self.db.cursor()
+
+    def save(self):
         try:
-            cursor.execute('INSERT INTO users (name, email, password, balance) VALUES (?, ?, ?, ?)',
-                           (self.name, self.email, self.password, self.balance))
-            self.db.commit()
+            with self.db.connection() as conn:
+                conn.execute('INSERT INTO users (name, email, password, balance) VALUES (?, ?, ?, ?)',
+                             (self.name, normalize_email(self.email), hash_password(self.password), self.balance))
             print(" Пользователь успешно зарегистрирован!")
         except sqlite3.IntegrityError:
             print("⚠️ Пользователь с таким email уже существует.")
 def login(db, email, password):
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM users WHERE email = ? AND password = ?', (email, password))
-    user = cursor.fetchone()
-    if user:
-        print(f" Добро пожаловать, {user[1]}!")
-        return user
+    user_id = get_authenticator(db).verify(email, password)
+    if user_id is not None:
+        print(f" Добро пожаловать, {email}!")
+        return user_id
     else:
         print(" Неверный email или пароль.")
         return None
 
 
 def run():
-    db = sqlite3.connect('chocolate.db')
+    db = get_db()
     print("=== Добро пожаловать в ChocolateHeaven ===")
 
     while True:
@@ -163,58 +407,422 @@ def run():
 
 
 
-class DatabaseManager:
-    def __init__(self, db_file: str = 'chocolate.db'):
-        self.conn = sqlite3.connect(db_file)
-        self.conn.row_factory = sqlite3.Row
-        self._create_tables()
+# Пул соединений к chocolate.db со схемой MIGRATIONS (см. db_pool.ConnectionPool)
+class DatabaseManager(ConnectionPool):
+    default_file = DB_FILE
+    migrations = MIGRATIONS
+
+    # Массовая загрузка платежей, заказов и позиций: на время одной транзакции
+    # триггеры сводок снимаются, после загрузки сводки пересчитываются одним
+    # INSERT ... SELECT ... GROUP BY на таблицу и триггеры ставятся обратно.
+    # При ошибке откатываются и данные, и снятие триггеров.
+    @contextmanager
+    def bulk_load(self):
+        with self.transaction() as conn:
+            for name in ROLLUP_TRIGGERS:
+                conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+            yield conn
+            for sql in ROLLUP_REBUILD:
+                conn.execute(sql)
+            for sql in ROLLUP_TRIGGERS.values():
+                conn.execute(sql)
+
+_db = None
+_db_lock = threading.Lock()
 
-    def _create_tables(self):
-        cur = self.conn.cursor()
+def get_db():
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = DatabaseManager()
+    return _db
 
-cursor.execute("INSERT INTO discounts (name, discount_percent, valid_from, valid_to, is_active, applies_to, target_value) VALUES (?, ?, ?, ?, ?, ?, ?)",
-('Summer Sale', 15.0, '2024-06-01', '2024-06-30', 1, 'category', 'chocolate'))
+def _day(value):
+    return value[:10] if value else None
 
-conn.commit()
+def _next_day(value):
+    return (date.fromisoformat(value) + timedelta(days=1)).isoformat()
 
+def _money(value):
+    return round(value, 2)
+
+# Скидка из таблицы discounts. product — строка products (id, category, price,
+# discount_id); order — список пар (product, quantity).
 class Discount:
-    def __init__(self):
-        pass
+    def __init__(self, id, name, discount_percent, valid_from=None, valid_to=None, is_active=1,
+                 applies_to='global', target_value=None):
+        self.id = id
+        self.name = name
+        self.discount_percent = discount_percent or 0
+        self.valid_from = _day(valid_from)
+        self.valid_to = _day(valid_to)
+        self.is_active = is_active
+        self.applies_to = applies_to
+        self.target_value = target_value
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row['id'], row['name'], row['discount_percent'], row['valid_from'], row['valid_to'],
+                   row['is_active'], row['applies_to'], row['target_value'])
 
-    def is_valid(self):
-        pass
-    
-    def apply_product(self, product):
-        self.product = product
-        pass
+    def is_valid(self, day=None):
+        day = day or date.today().isoformat()
+        return (bool(self.is_active)
+                and (self.valid_from is None or self.valid_from <= day)
+                and (self.valid_to is None or day <= self.valid_to))
 
-    def apply_order(self, order):
-        self.order = order
-        pass
+    def key(self):
+        if self.applies_to == 'product':
+            value = self.target_value
+            return ('product', int(value) if str(value).isdigit() else value)
+        if self.applies_to == 'category':
+            return ('category', self.target_value)
+        return ('global', None)
 
+    def applies_to_product(self, product):
+        if product['discount_id'] == self.id:
+            return True
+        kind, value = self.key()
+        if kind == 'product':
+            return product['id'] == value
+        if kind == 'category':
+            return product['category'] == value
+        return True
+
+    def apply_product(self, product, day=None):
+        if self.is_valid(day) and self.applies_to_product(product):
+            return _money(product['price'] * (100 - self.discount_percent) / 100)
+        return product['price']
+
+    def apply_order(self, order, day=None):
+        return _money(sum(self.apply_product(product, day) * quantity for product, quantity in order))
+
+# Купон из таблицы coupons: действует на сумму заказа целиком.
 class Coupon:
-    def __init__(self):
-        pass
-
-    def is_valid(self):
-        pass
-    
-    def apply_product(self, product):
-        self.product = product
-        pass
-
-    def apply_order(self, order):
-        self.order = order
-        pass
-# Для админимистратора: получение общей выручки за указанный период
-def get_total_revenue(period: str):
-    conn = sqlite3.connect('chocolate.db')
-    cursor = conn.cursor()
-    query = '''
-    SELECT SUM(amount) as total_revenue
-    FROM payments
-    WHERE status = 'success' AND payment_date >= date('now', ?)
-    '''
+    def __init__(self, id, code, discount_percent, valid_from=None, valid_to=None, usage_limit=None,
+                 used_count=0, is_active=1):
+        self.id = id
+        self.code = code
+        self.discount_percent = discount_percent or 0
+        self.valid_from = _day(valid_from)
+        self.valid_to = _day(valid_to)
+        self.usage_limit = usage_limit
+        self.used_count = used_count or 0
+        self.is_active = is_active
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row['id'], row['code'], row['discount_percent'], row['valid_from'], row['valid_to'],
+                   row['usage_limit'], row['used_count'], row['is_active'])
+
+    def is_valid(self, day=None):
+        day = day or date.today().isoformat()
+        return (bool(self.is_active)
+                and (self.usage_limit is None or self.used_count < self.usage_limit)
+                and (self.valid_from is None or self.valid_from <= day)
+                and (self.valid_to is None or day <= self.valid_to))
+
+    def apply_product(self, product, day=None):
+        if self.is_valid(day):
+            return _money(product['price'] * (100 - self.discount_percent) / 100)
+        return product['price']
+
+    def apply_order(self, order, day=None):
+        if self.is_valid(day):
+            return _money(order * (100 - self.discount_percent) / 100)
+        return order
+
+
+# Индекс активных скидок. Даты разбиты на отрезки, внутри которых набор
+# действующих скидок не меняется; для каждого отрезка хранится лучшая скидка
+# по ключу ('product', id) / ('category', name) / ('global', None) и по id.
+# Индекс перестраивается, только когда триггеры на discounts увеличили
+# table_versions.version.
+class DiscountEngine:
+    def __init__(self, db=None):
+        self.db = db or get_db()
+        self._lock = threading.Lock()
+        self._version = None
+        self._timelines = {}
+        self.reloads = 0
+
+    def _table_version(self, conn):
+        row = conn.execute("SELECT version FROM table_versions WHERE name = 'discounts'").fetchone()
+        return row[0] if row else 0
+
+    def _refresh(self, conn):
+        version = self._table_version(conn)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            rows = conn.execute('SELECT * FROM discounts WHERE is_active = 1').fetchall()
+            self._timelines = self._build([Discount.from_row(r) for r in rows])
+            self._version = version
+            self.reloads += 1
+
+    @staticmethod
+    def _build(discounts):
+        # Скидка действует на [valid_from, valid_to + 1 день). Для каждого ключа
+        # (товар, категория, вся витрина, discount_id) — своя шкала: границы
+        # по возрастанию и лучшая скидка на отрезке от границы до следующей.
+        # Границы ключа проходятся по порядку с кучей активных скидок этого
+        # ключа, активный набор на каждой границе не копируется.
+        spans = {}
+        for order, d in enumerate(discounts):
+            span = (d.valid_from or '', _next_day(d.valid_to) if d.valid_to else None, order, d)
+            spans.setdefault(d.key(), []).append(span)
+            spans.setdefault(('id', d.id), []).append(span)
+
+        timelines = {}
+        for key, items in spans.items():
+            items.sort(key=lambda span: span[0])
+            points = sorted({''} | {span[0] for span in items} | {span[1] for span in items if span[1]})
+            heap, bounds, values = [], [], []
+            i = 0
+            for point in points:
+                while i < len(items) and items[i][0] <= point:
+                    start, end, order, d = items[i]
+                    heapq.heappush(heap, (-d.discount_percent, order, end, d))
+                    i += 1
+                while heap and heap[0][2] is not None and heap[0][2] <= point:
+                    heapq.heappop(heap)
+                best = heap[0][3] if heap else None
+                if not values or values[-1] is not best:
+                    bounds.append(point)
+                    values.append(best)
+            timelines[key] = (bounds, values)
+        return timelines
+
+    def best_discount(self, product, day=None, conn=None):
+        day = day or date.today().isoformat()
+        if conn is None:
+            with self.db.connection() as conn:
+                self._refresh(conn)
+        else:
+            self._refresh(conn)
+        return self._best(self._timelines, day, product)
+
+    @staticmethod
+    def _best(timelines, day, product):
+        found = None
+        for key in (('product', product['id']), ('category', product['category']),
+                    ('global', None), ('id', product['discount_id'])):
+            timeline = timelines.get(key)
+            if timeline is None:
+                continue
+            bounds, values = timeline
+            d = values[bisect_right(bounds, day) - 1]
+            if d is not None and (found is None or d.discount_percent > found.discount_percent):
+                found = d
+        return found
+
+    # cart — словарь {product_id: quantity} или список пар (product_id, quantity).
+    # Товары и купон читаются двумя запросами на весь заказ.
+    def price_order(self, cart, coupon_code=None, day=None, conn=None):
+        if conn is None:
+            with self.db.connection() as conn:
+                return self.price_order(cart, coupon_code, day, conn)
+
+        day = day or date.today().isoformat()
+        quantities = {}
+        for product_id, quantity in (cart.items() if isinstance(cart, dict) else cart):
+            if quantity <= 0:
+                raise ValueError(f"Некорректное количество товара {product_id}: {quantity}")
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        if not quantities:
+            raise ValueError("Корзина пуста")
+
+        self._refresh(conn)
+        timelines = self._timelines
+        marks = ', '.join('?' * len(quantities))
+        products = {row['id']: row for row in conn.execute(
+            f'SELECT id, name, category, price, quantity, discount_id FROM products WHERE id IN ({marks})',
+            list(quantities))}
+
+        lines = []
+        subtotal = 0.0
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                raise ValueError(f"Товар {product_id} не найден")
+            discount = self._best(timelines, day, product)
+            price = product['price']
+            if discount is not None:
+                price = _money(price * (100 - discount.discount_percent) / 100)
+            lines.append({'product_id': product_id, 'name': product['name'], 'quantity': quantity,
+                          'base_price': product['price'], 'price': price,
+                          'discount_id': discount.id if discount else None, 'stock': product['quantity']})
+            subtotal += price * quantity
+        subtotal = _money(subtotal)
+
+        coupon = None
+        total = subtotal
+        if coupon_code:
+            row = conn.execute('SELECT * FROM coupons WHERE code = ?', (coupon_code,)).fetchone()
+            coupon = Coupon.from_row(row) if row else None
+            if coupon is None or not coupon.is_valid(day):
+                raise InvalidCouponError(f"Купон {coupon_code} недействителен")
+            total = coupon.apply_order(subtotal, day)
+        return {'lines': lines, 'subtotal': subtotal, 'coupon': coupon, 'total': total}
+
+
+_engines = {}
+
+def get_discount_engine(db=None):
+    db = db or get_db()
+    engine = _engines.get(db.db_file)
+    if engine is None:
+        engine = _engines.setdefault(db.db_file, DiscountEngine(db))
+    return engine
+
+_authenticators = {}
+
+def get_authenticator(db=None):
+    db = db or get_db()
+    authenticator = _authenticators.get(db.db_file)
+    if authenticator is None:
+        authenticator = _authenticators.setdefault(db.db_file, Authenticator(db))
+    return authenticator
+
+
+# Возвращает на склад просроченные резервы stock_holds (всех товаров или
+# только product_ids) в транзакции conn; возвращает число снятых резервов.
+def release_expired_holds(conn, now=None, product_ids=None):
+    where, params = 'expires_at <= ?', [time.time() if now is None else now]
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        where += f" AND product_id IN ({', '.join('?' * len(product_ids))})"
+        params += product_ids
+    expired = conn.execute(f'SELECT product_id, SUM(quantity) AS quantity, COUNT(*) AS holds '
+                           f'FROM stock_holds WHERE {where} GROUP BY product_id', params).fetchall()
+    if not expired:
+        return 0
+    conn.executemany('UPDATE products SET quantity = quantity + ?, version = version + 1 WHERE id = ?',
+                     [(row['quantity'], row['product_id']) for row in expired])
+    conn.execute(f'DELETE FROM stock_holds WHERE {where}', params)
+    return sum(row['holds'] for row in expired)
+
+
+# Списывает резервы hold_ids покупателя user_id в транзакции conn:
+# {product_id: quantity}. Истёкший или чужой резерв — ReservationConflictError.
+def _consume_holds(conn, hold_ids, user_id, now):
+    held = {}
+    for hold_id in hold_ids:
+        row = conn.execute('DELETE FROM stock_holds WHERE id = ? AND holder = ? AND expires_at > ? '
+                           'RETURNING product_id, quantity',
+                           (hold_id, str(user_id), now)).fetchone()
+        if row is None:
+            raise ReservationConflictError(f"Резерв {hold_id} истёк или не найден")
+        held[row['product_id']] = held.get(row['product_id'], 0) + row['quantity']
+    return held
+
+
+# Оформление заказа одной транзакцией BEGIN IMMEDIATE: либо списаны деньги,
+# товар, купон и записаны заказ с оплатой, либо не изменилось ничего.
+# hold_ids — резервы StockReservations этого user_id под заказ: зарезервированный
+# товар уже снят со склада, поэтому списывается только недостающее сверх
+# резерва (излишек резерва возвращается на склад). Просроченные резервы
+# товаров корзины снимаются в той же транзакции.
+def checkout(user_id, cart, coupon_code=None, db=None, hold_ids=()):
+    db = db or get_db()
+    engine = get_discount_engine(db)
+    with db.transaction() as conn:
+        priced = engine.price_order(cart, coupon_code, conn=conn)
+        lines = priced['lines']
+        total = priced['total']
+        now = time.time()
+        held = _consume_holds(conn, hold_ids, user_id, now)
+        stranger = set(held) - {line['product_id'] for line in lines}
+        if stranger:
+            raise ValueError(f"Резерв на товар не из корзины: {', '.join(map(str, sorted(stranger)))}")
+        if release_expired_holds(conn, now, [line['product_id'] for line in lines]):
+            for line in lines:
+                line['stock'] = conn.execute('SELECT quantity FROM products WHERE id = ?',
+                                             (line['product_id'],)).fetchone()[0]
+
+        debited = conn.execute('UPDATE users SET balance = balance - ? WHERE id = ? AND balance >= ?',
+                               (total, user_id, total)).rowcount
+        if not debited:
+            if conn.execute('SELECT 1 FROM users WHERE id = ?', (user_id,)).fetchone() is None:
+                raise ValueError(f"Пользователь {user_id} не найден")
+            raise InsufficientBalanceError(f"Недостаточно средств для оплаты {total}")
+
+        needed = [(line['quantity'] - held.get(line['product_id'], 0), line) for line in lines]
+        reserved = conn.executemany('UPDATE products SET quantity = quantity - ?, version = version + 1 '
+                                    'WHERE id = ? AND quantity >= ?',
+                                    [(need, line['product_id'], need) for need, line in needed]).rowcount
+        if reserved != len(lines):
+            missing = [line['name'] for need, line in needed if (line['stock'] or 0) < need]
+            raise OutOfStockError(f"Недостаточно товара на складе: {', '.join(map(str, missing))}")
+
+        coupon = priced['coupon']
+        if coupon is not None:
+            used = conn.execute('UPDATE coupons SET used_count = used_count + 1 '
+                                'WHERE id = ? AND (usage_limit IS NULL OR used_count < usage_limit)',
+                                (coupon.id,)).rowcount
+            if not used:
+                raise InvalidCouponError(f"Купон {coupon.code} исчерпан")
+
+        order_id = conn.execute("INSERT INTO orders (user_id, total_price, coupon_id, created_at, status) "
+                                "VALUES (?, ?, ?, datetime('now'), 'paid')",
+                                (user_id, total, coupon.id if coupon else None)).lastrowid
+        conn.executemany('INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)',
+                         [(order_id, line['product_id'], line['quantity'], line['price']) for line in lines])
+        conn.execute("INSERT INTO payments (order_id, user_id, amount, status, payment_date) "
+                     "VALUES (?, ?, ?, 'success', datetime('now'))",
+                     (order_id, user_id, total))
+    priced['order_id'] = order_id
+    return priced
+
+TOTAL_REVENUE_SQL = '''
+SELECT SUM(amount) as total_revenue
+FROM revenue_daily
+WHERE day >= date('now', ?)
+'''
+
+TOP_PRODUCTS_SQL = '''
+SELECT p.id, p.name, t.units as total_sold
+FROM product_sales_total t
+JOIN products p ON p.id = t.product_id
+WHERE t.units > 0
+ORDER BY t.units DESC
+LIMIT ?
+'''
+
+COUPON_USAGE_SQL = '''
+SELECT c.code, COUNT(o.id) as usage_count
+FROM coupons c
+LEFT JOIN orders o ON c.id = o.coupon_id
+GROUP BY c.id, c.code
+ORDER BY usage_count DESC
+'''
+
+DISCOUNT_PERFORMANCE_SQL = '''
+SELECT d.id, d.name, COUNT(DISTINCT oi.order_id) as orders_count,
+       COALESCE(SUM(oi.quantity), 0) as units_sold,
+       COALESCE(SUM(oi.quantity * oi.price), 0) as revenue
+FROM discounts d
+LEFT JOIN products p ON p.discount_id = d.id
+LEFT JOIN order_items oi ON oi.product_id = p.id
+GROUP BY d.id, d.name
+ORDER BY revenue DESC
+'''
+
+# Все отчёты: имя -> (SQL, пример параметров, псевдонимы таблиц, которые отчёт
+# обязан прочитать целиком). Проверяется тестами tests/test_query_plans.py.
+REPORT_QUERIES = {
+    'get_total_revenue': (TOTAL_REVENUE_SQL, ('-1 day',), ()),
+    'get_top_products': (TOP_PRODUCTS_SQL, (3,), ()),
+    'get_coupon_usage': (COUPON_USAGE_SQL, (), ('c',)),
+    'discount_perfomance': (DISCOUNT_PERFORMANCE_SQL, (), ('d',)),
+}
+
+# Для админимистратора: получение общей выручки за указанный период.
+# Читает сводку revenue_daily — не больше 366 строк при любом объёме платежей.
+def get_total_revenue(period: str, db=None):
     if period == 'daily':
         time_frame = '-1 day'
     elif period == 'monthly':
@@ -223,50 +831,24 @@ def get_total_revenue(period: str):
         time_frame = '-1 year'
     else:
         raise ValueError("Invalid period. Choose from 'daily', 'monthly', 'yearly'.")
-    
-    cursor.execute(query, (time_frame,))
-    result = cursor.fetchone()
-    conn.close()
+
+    with (db or get_db()).connection() as conn:
+        result = conn.execute(TOTAL_REVENUE_SQL, (time_frame,)).fetchone()
     return result['total_revenue'] if result['total_revenue'] is not None else 0
 
-def get_top_products(limit=3):
-    conn = sqlite3.connect('chocolate.db')
-    cursor = conn.cursor()
-    query = '''
-    SELECT p.id, p.name, SUM(oi.quantity) as total_sold
-    FROM order_items oi
-    JOIN products p ON oi.product_id = p.id
-    JOIN orders o ON oi.order_id = o.id
-    WHERE o.status IN ('paid', 'shipped', 'completed')
-    GROUP BY p.id, p.name
-    ORDER BY total_sold DESC
-    LIMIT 
-    '''
-    cursor.execute(query, (limit,))
-    results = cursor.fetchall()
-    conn.close()
-    return results
-
-def get_coupon_usage():
-    conn = sqlite3.connect('chocolate.db')
-    cursor = conn.cursor()
-    query = '''
-    SELECT c.code, COUNT(o.id) as usage_count
-    FROM coupons c
-    LEFT JOIN orders o ON c.id = o.coupon_id
-    GROUP BY c.id, c.code
-    ORDER BY usage_count DESC
-    '''
-    cursor.execute(query)
-    results = cursor.fetchall()
-    conn.close()
-    return results
-
-def discount_perfomance():
-    conn = sqlite3.connect('chocolate.db')
-    cursor = conn.cursor()
-    
-    results = cursor.fetchall()
-    return results
-
-print(run())
+# Самые продаваемые товары за всё время: первые limit строк индекса по units
+def get_top_products(limit=3, db=None):
+    with (db or get_db()).connection() as conn:
+        return conn.execute(TOP_PRODUCTS_SQL, (limit,)).fetchall()
+
+def get_coupon_usage(db=None):
+    with (db or get_db()).connection() as conn:
+        return conn.execute(COUPON_USAGE_SQL).fetchall()
+
+# Сколько продано товаров, к которым привязана каждая скидка
+def discount_perfomance(db=None):
+    with (db or get_db()).connection() as conn:
+        return conn.execute(DISCOUNT_PERFORMANCE_SQL).fetchall()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,133 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Хеширование паролей (PBKDF2-SHA256 с солью) и проверка входа с кэшем.
+# Формат хеша: pbkdf2_sha256$<итерации>$<соль hex>$<хеш hex>.
+# Старые пароли в открытом виде принимаются и при первом входе перехешируются.
+
+ALGORITHM = 'pbkdf2_sha256'
+DEFAULT_ITERATIONS = 600_000
+# Пароли из массового импорта хешируются дёшево: needs_rehash видит чужое
+# число итераций, и при первом входе хеш пересчитывается с DEFAULT_ITERATIONS.
+IMPORT_ITERATIONS = 1_000
+
+
+# Единый вид email для регистрации, входа и импорта
+def normalize_email(email):
+    return email.strip().lower() if email is not None else None
+
+
+def hash_password(password, iterations=DEFAULT_ITERATIONS, salt=None):
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+    return f'{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}'
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(ALGORITHM + '$')
+
+
+def verify_password(password, stored):
+    if not stored:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, iterations, salt, digest = stored.split('$')
+    candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(candidate, bytes.fromhex(digest))
+
+
+def needs_rehash(stored, iterations=DEFAULT_ITERATIONS):
+    return not is_hashed(stored) or int(stored.split('$')[1]) != iterations
+
+
+# Проверка email + пароля. Успешные проверки кладутся в LRU-кэш с TTL:
+# ключ — HMAC от email и пароля на секрете процесса, так что сам пароль в
+# памяти не хранится, а повторный запрос обходится без PBKDF2.
+# Смена пароля через set_password сбрасывает записи пользователя сразу,
+# смена в другом процессе — по истечении ttl.
+class Authenticator:
+    def __init__(self, db, cache_size=10_000, ttl=300.0, iterations=DEFAULT_ITERATIONS):
+        self.db = db
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.iterations = iterations
+        self._secret = os.urandom(32)
+        self._cache = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'failures': 0}
+
+    def _key(self, email, password):
+        return hmac.new(self._secret, f'{email}\0{password}'.encode(), hashlib.sha256).digest()
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            user_id, expires = entry
+            if expires < time.monotonic():
+                self._forget(key, user_id)
+                return None
+            self._cache.move_to_end(key)
+            return user_id
+
+    def _remember(self, key, user_id):
+        with self._lock:
+            self._cache[key] = (user_id, time.monotonic() + self.ttl)
+            self._cache.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._cache) > self.cache_size:
+                old_key, (old_user, _) = self._cache.popitem(last=False)
+                self._forget(old_key, old_user)
+
+    def _forget(self, key, user_id):
+        self._cache.pop(key, None)
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
+
+    def verify(self, email, password):
+        email = normalize_email(email)
+        key = self._key(email, password)
+        user_id = self._cached(key)
+        with self._lock:
+            self.stats['hits' if user_id is not None else 'misses'] += 1
+        if user_id is not None:
+            return user_id
+
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT id, password FROM users WHERE email = ?', (email,)).fetchone()
+        if row is None or not verify_password(password, row[1]):
+            with self._lock:
+                self.stats['failures'] += 1
+            return None
+        if needs_rehash(row[1], self.iterations):
+            self._store(row[0], password)
+        self._remember(key, row[0])
+        return row[0]
+
+    def _store(self, user_id, password):
+        with self.db.connection() as conn:
+            conn.execute('UPDATE users SET password = ? WHERE id = ?',
+                         (hash_password(password, self.iterations), user_id))
+
+    def set_password(self, user_id, password):
+        self._store(user_id, password)
+        self.invalidate(user_id)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            for key in self._by_user.pop(user_id, ()):
+                self._cache.pop(key, None)
+
+    def hit_rate(self):
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
@@ -5,7 +5,12 @@ class InsufficientFundsError(Exception):
 class LoanOverpaymentError(Exception): 
     pass
 
+# __slots__ у моделей — их в памяти миллионы. Общий баланс клиента
+# суммируется по его счетам: счетов у клиента единицы, а отдельный счётчик
+# пришлось бы сверять при каждой смене владельца счёта.
 class Account:
+    __slots__ = ('account_number', 'owner', 'balance')
+
     def __init__(self, num, owner = None):
         self.account_number, self.owner, self.balance = num, owner, 0.0
 
@@ -15,17 +20,28 @@ class Account:
 
     def withdraw(self, amount):
         if amount < 0: raise NegativeAmountError
-        if amount > self.balance: raise InsufficientFundsError
+        screener = self._screener()
+        if amount > self.balance:
+            if screener is not None: screener.observe_declined(self.account_number, amount)
+            raise InsufficientFundsError
+        if screener is not None: screener.observe(self.account_number, amount)
         self.balance -= amount
 
+    # Проверка операций банка владельца (screening.Screener), если она подключена
+    def _screener(self):
+        bank = self.owner.bank if self.owner is not None else None
+        return bank.screener if bank is not None else None
+
     def __str__(self): 
         return f"Account №{self.account_number}, баланс: {self.balance:.2f}"
 
 
 class CheckingAccount(Account): 
-    pass
+    __slots__ = ()
 
 class SavingsAccount(Account):
+    __slots__ = ('interest_rate_percent',)
+
     def __init__(self, num, rate, owner = None):
         super().__init__(num, owner); self.interest_rate_percent = rate
     def add_interest(self): 
@@ -35,26 +51,44 @@ class SavingsAccount(Account):
 
 
 class Loan:
+    __slots__ = ('amount', 'months', 'rate', 'remaining_debt', 'borrower')
+
     def __init__(self, amount, months, rate, borrower = None):
         if amount <= 0 or months <= 0: raise ValueError
         self.amount, self.months, self.rate, self.remaining_debt, self.borrower = amount, months, rate, amount, borrower
 
     def monthly_interest_rate(self):
         return self.rate / 12 / 100
+    # Аннуитетный платёж; при нулевой ставке долг просто делится на месяцы
     def calculate_monthly_payment(self): 
-        return self.amount / self.months + self.amount * self.rate / 100 / 12
+        r = self.monthly_interest_rate()
+        if r == 0: return self.amount / self.months
+        return self.amount * r / (1 - (1 + r) ** -self.months)
+    # Строки (месяц, платёж, проценты, тело, остаток); последний платёж гасит остаток целиком
+    def amortization_schedule(self):
+        r, payment, remaining, rows = self.monthly_interest_rate(), self.calculate_monthly_payment(), self.amount, []
+        for month in range(1, self.months + 1):
+            interest = remaining * r
+            principal = remaining if month == self.months else payment - interest
+            remaining -= principal
+            rows.append((month, payment if month < self.months else interest + principal, interest, principal, remaining))
+        return rows
     def make_payment(self, amount):
         if amount < 0: raise NegativeAmountError
         if amount > self.remaining_debt: raise LoanOverpaymentError
-        self.remaining_debt = amount
+        self.remaining_debt -= amount
     def __str__(self): 
         return f"Loan {self.amount}, {self.rate}%, остаток {self.remaining_debt:.2f}"
 
 class ConsumerLoan(Loan):
+    __slots__ = ()
+
     def __init__(self, amount, months, borrower = None): 
         super().__init__(amount, months, 15, borrower)
 
 class AutoLoan(Loan):
+    __slots__ = ('car_model',)
+
     def __init__(self, amount, months, car, borrower = None):
         super().__init__(amount, months, 10, borrower); self.car_model = car
     def __str__(self): 
@@ -62,6 +96,8 @@ class AutoLoan(Loan):
 
 
 class MortgageLoan(Loan):
+    __slots__ = ('property_value',)
+
     def __init__(self, amount, months, prop_value, borrower = None):
         super().__init__(amount, months, 7, borrower); self.property_value = prop_value
     def __str__(self): 
@@ -69,30 +105,52 @@ class MortgageLoan(Loan):
 
 
 class Customer:
+    __slots__ = ('name', 'age', 'accounts', 'loans', 'bank')
+
     def __init__(self, name, age):
-        self.name, self.age, self.accounts, self.loans = name, age, [], []
+        self.name, self.age, self.accounts, self.loans, self.bank = name, age, [], [], None
 
     def open_account(self, acc): 
+        if self.bank is not None: self.bank._index_account(acc)
         acc.owner = self; self.accounts.append(acc)
     def take_loan(self, loan): 
         loan.borrower = self; self.loans.append(loan)
     def get_total_balance(self): 
-        return sum(a.balance for a in self.accounts)
+        return sum(acc.balance for acc in self.accounts)
     def __str__(self): 
         return f"Customer {self.name} ({self.age}), счетов: {len(self.accounts)}, кредитов: {len(self.loans)}"
 
 
+# Клиенты ищутся по имени (первый добавленный с таким именем) и по номеру
+# любого из их счетов через словари, а не перебором списка
 class Bank:
-    def __init__(self, name): 
-        self.name, self.customers = name, []
+    def __init__(self, name, screener = None): 
+        self.name, self.customers, self.screener = name, [], screener
+        self._by_name, self._by_account = {}, {}
+    def _index_account(self, acc):
+        if acc.account_number in self._by_account: raise ValueError(f"Счёт №{acc.account_number} уже существует")
+        self._by_account[acc.account_number] = acc
     def add_customer(self, c): 
-        self.customers.append(c)
+        if c.bank is not None: raise ValueError(f"Клиент {c.name} уже обслуживается в банке {c.bank.name}")
+        nums = {acc.account_number for acc in c.accounts}
+        if len(nums) < len(c.accounts) or any(n in self._by_account for n in nums):
+            raise ValueError(f"У клиента {c.name} есть счета с уже занятыми номерами")
+        self._by_account.update((acc.account_number, acc) for acc in c.accounts)
+        c.bank = self; self.customers.append(c); self._by_name.setdefault(c.name, c)
     def find_customer(self, name): 
-        return next((x for x in self.customers if x.name == name), None)
+        return self._by_name.get(name)
+    def find_account(self, num):
+        return self._by_account.get(num)
+    def find_customer_by_account(self, num):
+        acc = self._by_account.get(num)
+        return acc.owner if acc is not None else None
     def transfer(self, from_acc, to_acc, amount):
         if amount < 0: raise NegativeAmountError
-        if from_acc.balance < amount: raise InsufficientFundsError
-        from_acc.withdraw(amount); to_acc.deposit(amount)
+        if from_acc.balance < amount:
+            if self.screener is not None: self.screener.observe_declined(from_acc.account_number, amount)
+            raise InsufficientFundsError
+        if self.screener is not None: self.screener.observe(from_acc.account_number, amount, kind='transfer')
+        from_acc.balance -= amount; to_acc.deposit(amount)
     def show_all_customers(self):
         if not self.customers: return "Нет клиентов"
         return "\n".join([f"{self.name}:" + "\n".join(str(c) for c in self.customers)])
@@ -0,0 +1,74 @@
+import numpy as np
+
+# Пакетный расчёт конца месяца для bank.py. Балансы, ставки и суммы кредитов
+# лежат в массивах numpy, и каждая операция — один проход по всем счетам
+# сразу. Арифметика повторяет SavingsAccount.add_interest и
+# Loan.amortization_schedule шаг в шаг, поэтому результаты совпадают с
+# расчётом по объектам.
+
+
+class SavingsBatch:
+    def __init__(self, balances, rates):
+        self.balances = np.asarray(balances, dtype=np.float64).copy()
+        self.rates = np.asarray(rates, dtype=np.float64)
+        if self.balances.shape != self.rates.shape: raise ValueError("balances и rates разной длины")
+
+    @classmethod
+    def from_accounts(cls, accounts):
+        return cls(np.fromiter((a.balance for a in accounts), np.float64, len(accounts)),
+                   np.fromiter((a.interest_rate_percent for a in accounts), np.float64, len(accounts)))
+
+    def add_interest(self, months=1):
+        for _ in range(months):
+            self.balances += self.balances * self.rates / 100
+        return self.balances
+
+    # balance — обычный слот счёта; общий баланс клиента get_total_balance
+    # считает суммой по счетам, поэтому ничего больше обновлять не нужно
+    def write_back(self, accounts):
+        for acc, balance in zip(accounts, self.balances.tolist()):
+            acc.balance = balance
+
+
+class LoanBatch:
+    def __init__(self, amounts, months, rates):
+        self.amounts = np.asarray(amounts, dtype=np.float64)
+        self.months = np.asarray(months, dtype=np.int64)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        if not self.amounts.shape == self.months.shape == self.rates.shape:
+            raise ValueError("amounts, months и rates разной длины")
+        if (self.amounts <= 0).any() or (self.months <= 0).any(): raise ValueError
+
+    @classmethod
+    def from_loans(cls, loans):
+        return cls(np.fromiter((l.amount for l in loans), np.float64, len(loans)),
+                   np.fromiter((l.months for l in loans), np.int64, len(loans)),
+                   np.fromiter((l.rate for l in loans), np.float64, len(loans)))
+
+    def monthly_interest_rate(self):
+        return self.rates / 12 / 100
+
+    def monthly_payment(self):
+        r = self.monthly_interest_rate()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annuity = self.amounts * r / (1 - (1 + r) ** -self.months.astype(np.float64))
+        return np.where(r == 0, self.amounts / self.months, annuity)
+
+    # По месяцу за проход: (месяц, платёж, проценты, тело, остаток) массивами по
+    # всем кредитам; у уже погашенных кредитов нули
+    def schedule(self):
+        r, payment, remaining = self.monthly_interest_rate(), self.monthly_payment(), self.amounts.copy()
+        zeros = np.zeros_like(remaining)
+        for month in range(1, int(self.months.max(initial=0)) + 1):
+            active, last = self.months >= month, self.months == month
+            interest = np.where(active, remaining * r, zeros)
+            principal = np.where(last, remaining, np.where(active, payment - interest, zeros))
+            remaining = remaining - principal
+            paid = np.where(last, interest + principal, np.where(active, payment, zeros))
+            yield month, paid, interest, principal, remaining
+
+    def total_interest(self):
+        total = np.zeros_like(self.amounts)
+        for _, _, interest, _, _ in self.schedule():
+            total += interest
+        return total
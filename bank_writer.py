@@ -0,0 +1,190 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from ledger import Ledger
+
+# Групповая запись операций bank.db. Вызывающие кладут пополнения, снятия и
+# переводы в очередь и получают Future; один поток-писатель собирает до
+# max_batch операций (или всё, что пришло за max_delay секунд после первой)
+# и проводит их одной транзакцией с одним fsync на commit. Каждая операция
+# идёт в своей точке сохранения: отказ (нехватка денег, неизвестный клиент)
+# завершает с ошибкой только её Future, остальные операции пачки проходят.
+# Future получает txn_id уже после COMMIT с synchronous=FULL, то есть когда
+# запись надёжно на диске. Если поток-писатель упал, все ждущие Future
+# завершаются с WriterClosedError, новые операции не принимаются.
+
+_STOP = object()
+
+
+class WriterClosedError(Exception):
+    pass
+
+
+class GroupCommitWriter:
+    def __init__(self, ledger=None, max_batch=128, max_delay=0.005):
+        self.ledger = ledger or Ledger()
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._error = None
+        self.stats = {'ops': 0, 'failed': 0, 'batches': 0, 'commit_seconds': 0.0}
+        self._thread = threading.Thread(target=self._run, name='bank-writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, kind, *args):
+        future = Future()
+        # Ошибки в аргументах видны сразу, не дожидаясь писателя
+        try:
+            entries = self.ledger.entries(kind, *args)
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        with self._lock:
+            if self._closed:
+                raise WriterClosedError("писатель остановлен") from self._error
+            self._queue.put((future, kind, entries))
+        return future
+
+    def deposit(self, client_id, amount):
+        return self.submit('deposit', client_id, amount)
+
+    def withdraw(self, client_id, amount):
+        return self.submit('withdraw', client_id, amount)
+
+    def transfer(self, from_id, to_id, amount):
+        return self.submit('transfer', from_id, to_id, amount)
+
+    # Дописывает всё, что уже в очереди, и останавливает поток
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['avg_batch'] = stats['ops'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        batch = []
+        try:
+            with self.ledger.db.connection() as conn:
+                conn.execute('PRAGMA synchronous=FULL')
+                try:
+                    stop = False
+                    while not stop:
+                        batch, stop = self._next_batch()
+                        if batch:
+                            self._write(conn, batch)
+                finally:
+                    conn.execute('PRAGMA synchronous=NORMAL')
+        except BaseException as e:
+            self._abort(e, batch)
+            raise
+
+    # Писатель упал: очередь закрывается, незавершённые операции текущей
+    # пачки и всё, что ждало в очереди, получают WriterClosedError
+    def _abort(self, error, batch):
+        with self._lock:
+            self._closed = True
+            self._error = error
+        futures = [future for future, _, _ in batch]
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                futures.append(item[0])
+        failure = WriterClosedError(f"писатель остановлен из-за ошибки: {error!r}")
+        failure.__cause__ = error
+        failed = 0
+        for future in futures:
+            if not future.done():
+                future.set_exception(failure)
+                failed += 1
+        with self._lock:
+            self.stats['failed'] += failed
+
+    def _write(self, conn, batch):
+        # Отменённые до записи операции выбрасываются, остальные переводятся в
+        # running до BEGIN: если не удастся вся пачка, ошибку получит каждая
+        batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results = []
+        started = time.perf_counter()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for future, kind, entries in batch:
+                    conn.execute('SAVEPOINT op')
+                    try:
+                        results.append((future, self.ledger.post(conn, kind, entries), None))
+                        conn.execute('RELEASE op')
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO op')
+                        conn.execute('RELEASE op')
+                        results.append((future, None, e))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        except Exception as e:
+            # Не удалась вся пачка (например, база занята дольше timeout)
+            failed = 0
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+                    failed += 1
+            with self._lock:
+                self.stats['failed'] += failed
+            return
+
+        failed = 0
+        txn_ids = []
+        for future, txn_id, error in results:
+            if error is None:
+                txn_ids.append(txn_id)
+                future.set_result(txn_id)
+            else:
+                failed += 1
+                future.set_exception(error)
+        with self._lock:
+            self.stats['ops'] += len(results)
+            self.stats['failed'] += failed
+            self.stats['batches'] += 1
+            self.stats['commit_seconds'] += time.perf_counter() - started
+        if txn_ids:
+            self.ledger.maybe_snapshot(max(txn_ids), min(txn_ids) - 1)
@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from arscode import DatabaseManager
+from auth import DEFAULT_ITERATIONS, Authenticator, hash_password
+
+# Скорость входа: доля повторных запросов обслуживается из кэша, остальные
+# проходят PBKDF2 с боевым числом итераций. Печатает входы в секунду и hit rate.
+
+
+def run(users=20, requests=2000, iterations=DEFAULT_ITERATIONS):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_auth.db')
+    db = DatabaseManager(path)
+    started = time.perf_counter()
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO users (name, email, password, role) VALUES (?, ?, ?, 'client')",
+                         [(f'user{i}', f'user{i}@example.com', hash_password(f'secret{i}', iterations))
+                          for i in range(users)])
+    print(f"хеш {users} паролей: {(time.perf_counter() - started) / users * 1000:.1f} мс на пароль "
+          f"({iterations} итераций)")
+
+    auth = Authenticator(db, iterations=iterations)
+    rnd = random.Random(1)
+    # Распределение близкое к реальному: немногие пользователи дают большую часть запросов
+    weights = [1 / (i + 1) for i in range(users)]
+    picks = rnd.choices(range(users), weights, k=requests)
+
+    started = time.perf_counter()
+    for i in picks:
+        assert auth.verify(f'user{i}@example.com', f'secret{i}') is not None
+    elapsed = time.perf_counter() - started
+
+    print(f"{requests} входов за {elapsed:.2f} с: {requests / elapsed:.0f} входов/с, "
+          f"hit rate {auth.hit_rate():.1%}, {auth.stats}")
+
+    started = time.perf_counter()
+    for i in picks:
+        auth.verify(f'user{i}@example.com', f'secret{i}')
+    print(f"только из кэша: {requests / (time.perf_counter() - started):.0f} входов/с")
+
+    cold = Authenticator(db, cache_size=0, iterations=iterations)
+    started = time.perf_counter()
+    for i in picks[:20]:
+        cold.verify(f'user{i}@example.com', f'secret{i}')
+    print(f"без кэша: {20 / (time.perf_counter() - started):.1f} входов/с")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
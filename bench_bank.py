@@ -0,0 +1,93 @@
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from bank import Bank, CheckingAccount, Customer, SavingsAccount
+
+# Память и скорость поиска модели bank.py против прежней: списки без
+# индексов, объекты с __dict__, общий баланс суммированием по счетам.
+# Прежняя модель повторена здесь ровно в том виде, в каком была в bank.py.
+
+
+class LegacyAccount:
+    def __init__(self, num, owner = None):
+        self.account_number, self.owner, self.balance = num, owner, 0.0
+
+    def deposit(self, amount):
+        self.balance += amount
+
+
+class LegacySavingsAccount(LegacyAccount):
+    def __init__(self, num, rate, owner = None):
+        super().__init__(num, owner); self.interest_rate_percent = rate
+
+
+class LegacyCustomer:
+    def __init__(self, name, age):
+        self.name, self.age, self.accounts, self.loans = name, age, [], []
+
+    def open_account(self, acc):
+        acc.owner = self; self.accounts.append(acc)
+    def get_total_balance(self):
+        return sum(a.balance for a in self.accounts)
+
+
+class LegacyBank:
+    def __init__(self, name):
+        self.name, self.customers = name, []
+    def add_customer(self, c):
+        self.customers.append(c)
+    def find_customer(self, name):
+        return next((x for x in self.customers if x.name == name), None)
+
+
+MODELS = {
+    'прежняя': (LegacyBank, LegacyCustomer, LegacyAccount, LegacySavingsAccount),
+    'новая': (Bank, Customer, CheckingAccount, SavingsAccount),
+}
+
+
+def build(model, customers):
+    bank_cls, customer_cls, checking_cls, savings_cls = MODELS[model]
+    bank = bank_cls("Bench Bank")
+    for i in range(customers):
+        c = customer_cls(f"client{i}", 18 + i % 60)
+        acc = checking_cls(f"C{i}"); acc.deposit(100.0 + i % 1000); c.open_account(acc)
+        sav = savings_cls(f"S{i}", 3); sav.deposit(50.0); c.open_account(sav)
+        bank.add_customer(c)
+    return bank
+
+
+def measure(model, customers, lookups):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    bank = build(model, customers)
+    built = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    names = [f"client{i}" for i in random.Random(1).choices(range(customers), k=lookups)]
+    started = time.perf_counter()
+    found = [bank.find_customer(name) for name in names]
+    find = (time.perf_counter() - started) / lookups
+    started = time.perf_counter()
+    totals = [c.get_total_balance() for c in found]
+    total = (time.perf_counter() - started) / lookups
+    indexes = sum(sys.getsizeof(index) for index in vars(bank).values() if isinstance(index, dict))
+    print(f"{model}: {memory / customers:.0f} байт на клиента (индексы {indexes / customers:.0f}), создание {built:.2f} с, "
+          f"find_customer {find * 1e6:.2f} мкс, get_total_balance {total * 1e6:.3f} мкс")
+    return totals
+
+
+def run(customers=200_000, lookups=200):
+    print(f"{customers} клиентов, по 2 счёта; {lookups} поисков по имени")
+    legacy = measure('прежняя', customers, lookups)
+    current = measure('новая', customers, lookups)
+    assert legacy == current, 'балансы расходятся'
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,61 @@
+import random
+import sys
+import time
+
+import numpy as np
+
+from bank import Loan, SavingsAccount
+from bank_batch import LoanBatch, SavingsBatch
+
+# Конец месяца по объектам bank.py и пакетом bank_batch: начисление процентов
+# по вкладам и полные графики аннуитетных платежей. Печатает счета в секунду
+# и проверяет, что оба способа дают одинаковый результат.
+
+
+def generate(accounts, loans, seed=1):
+    rnd = random.Random(seed)
+    savings = []
+    for i in range(accounts):
+        acc = SavingsAccount(f"S{i}", rnd.choice([0, 1, 2.5, 3, 5.5]))
+        acc.deposit(round(rnd.uniform(0, 100_000), 2))
+        savings.append(acc)
+    credits = [Loan(rnd.randint(10_000, 5_000_000), rnd.choice([12, 24, 36, 60, 120, 240, 360]),
+                    rnd.choice([0, 7, 10, 15, 19.9])) for _ in range(loans)]
+    return savings, credits
+
+
+def timed(label, count, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"  {label}: {elapsed:.2f} с, {count / elapsed:,.0f} в секунду")
+    return result
+
+
+def run(accounts=1_000_000, loans=100_000, check=2000):
+    savings, credits = generate(accounts, loans)
+    print(f"проценты за месяц, {accounts} вкладов:")
+    savings_batch = timed("загрузка в массивы", accounts, lambda: SavingsBatch.from_accounts(savings))
+    batch = timed("пакет", accounts, savings_batch.add_interest)
+
+    def per_object():
+        for acc in savings:
+            acc.add_interest()
+        return [acc.balance for acc in savings]
+    assert batch.tolist() == timed("по объектам", accounts, per_object), 'балансы расходятся'
+
+    print(f"графики платежей, {loans} кредитов:")
+    loan_batch = timed("загрузка в массивы", loans, lambda: LoanBatch.from_loans(credits))
+    totals = timed("пакет", loans, loan_batch.total_interest)
+    expected = timed("по объектам", loans, lambda: [sum(row[2] for row in loan.amortization_schedule())
+                                                   for loan in credits])
+    assert np.allclose(totals, expected, rtol=1e-9, atol=1e-6), 'графики расходятся'
+
+    sample = credits[:check]
+    payments = LoanBatch.from_loans(sample).monthly_payment()
+    assert np.allclose(payments, [loan.calculate_monthly_payment() for loan in sample], rtol=1e-12, atol=0)
+    print(f"суммарные проценты по кредитам: {totals.sum():,.2f}")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,70 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from shop_pricing import CartPricer, ShopDatabase, apply_percent
+
+# Расчёт корзины из cart_items позиций на каталогах растущего размера:
+# CartPricer (один запрос с JOIN, скидки категорий и общая из кэша) против
+# расчёта «в лоб» — по запросу к products, categories и globals на позицию.
+# Время CartPricer не должно зависеть от размера каталога.
+
+
+def generate(db, products, categories=200, users=100, cart_items=100, seed=1):
+    rnd = random.Random(seed)
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO categories (name, discount) VALUES (?, ?)",
+                         ((f"Категория {i}", rnd.choice((0, 0, 5, 10, 15))) for i in range(categories)))
+        conn.executemany("INSERT INTO products (name, category_id, price, stock, discount) VALUES (?, ?, ?, ?, ?)",
+                         ((f"Товар {i}", rnd.randint(1, categories), rnd.randint(50, 5000), rnd.randint(0, 100),
+                           rnd.choice((0, 0, 0, 5, 10))) for i in range(products)))
+        conn.execute("UPDATE globals SET global_discount = 5 WHERE id = 1")
+        conn.executemany("INSERT INTO carts (user_id, product_id, quantity) VALUES (?, ?, ?)",
+                         ((user, product, rnd.randint(1, 5))
+                          for user in range(1, users + 1)
+                          for product in rnd.sample(range(1, products + 1), cart_items)))
+
+
+def naive_total(conn, user_id):
+    total = 0
+    for product_id, quantity in conn.execute("SELECT product_id, quantity FROM carts WHERE user_id = ?",
+                                             (user_id,)).fetchall():
+        price, discount, category_id = conn.execute("SELECT price, discount, category_id FROM products WHERE id = ?",
+                                                    (product_id,)).fetchone()
+        category = conn.execute("SELECT discount FROM categories WHERE id = ?", (category_id,)).fetchone()
+        global_discount = conn.execute("SELECT global_discount FROM globals WHERE id = 1").fetchone()[0]
+        unit = price
+        for percent in (discount, category[0] if category else 0, global_discount):
+            unit = apply_percent(unit, percent or 0)
+        total += unit * quantity
+    return total
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for i in range(repeat):
+        result = fn(i)
+    return (time.perf_counter() - started) / repeat, result
+
+
+def run(sizes=(1_000, 10_000, 100_000, 1_000_000), users=100, cart_items=100, repeat=500):
+    for size in sizes:
+        path = os.path.join(tempfile.mkdtemp(), 'bench_shop.db')
+        db = ShopDatabase(path)
+        generate(db, size, users=users, cart_items=cart_items)
+        pricer = CartPricer(db)
+        with db.connection() as conn:
+            pricer.price_cart(1, conn=conn)
+            cached_time, priced = timed(lambda i: pricer.price_cart(i % users + 1, conn=conn), repeat)
+            naive_time, naive = timed(lambda i: naive_total(conn, i % users + 1), repeat)
+            assert naive_total(conn, users) == pricer.price_cart(users, conn=conn)['total_cents']
+        print(f"каталог {size:>9}: корзина из {len(priced['lines'])} позиций — CartPricer "
+              f"{cached_time * 1e6:7.0f} мкс, по запросу на позицию {naive_time * 1e6:7.0f} мкс "
+              f"(перечитываний кэша: {pricer.reloads})")
+        db.close()
+
+
+if __name__ == "__main__":
+    run(tuple(int(arg) for arg in sys.argv[1:]) or (1_000, 10_000, 100_000, 1_000_000))
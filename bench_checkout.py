@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from arscode import (DatabaseManager, InsufficientBalanceError, OutOfStockError,
+                     checkout)
+
+# Нагрузочный тест checkout: несколько покупателей одновременно разбирают
+# ограниченный склад. Печатает заказы в секунду и проверяет, что товара
+# продано ровно столько, сколько было на складе.
+
+
+def run(buyers=8, orders_per_buyer=200, products=50, stock=100):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_checkout.db')
+    db = DatabaseManager(path, pool_size=buyers)
+    with db.transaction() as conn:
+        conn.executemany('INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                         [(f'Шоколад {i}', 'chocolate', 10.0, stock) for i in range(products)])
+        conn.executemany("INSERT INTO users (name, email, password, balance, role) VALUES (?, ?, ?, ?, 'client')",
+                         [(f'buyer{i}', f'buyer{i}@example.com', 'x', 1e9) for i in range(buyers)])
+
+    results = {'ok': 0, 'out_of_stock': 0, 'no_money': 0}
+    lock = threading.Lock()
+
+    def buyer(user_id):
+        for n in range(orders_per_buyer):
+            cart = {(user_id * 7 + n + k) % products + 1: 1 + k for k in range(3)}
+            try:
+                checkout(user_id, cart, db=db)
+                key = 'ok'
+            except OutOfStockError:
+                key = 'out_of_stock'
+            except InsufficientBalanceError:
+                key = 'no_money'
+            with lock:
+                results[key] += 1
+
+    threads = [threading.Thread(target=buyer, args=(i + 1,)) for i in range(buyers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with db.connection() as conn:
+        sold = conn.execute('SELECT COALESCE(SUM(quantity), 0) FROM order_items').fetchone()[0]
+        left = conn.execute('SELECT SUM(quantity), MIN(quantity) FROM products').fetchone()
+    assert sold + left[0] == products * stock and left[1] >= 0, 'склад разошёлся с заказами'
+
+    print(f"покупателей: {buyers}, попыток: {buyers * orders_per_buyer}, {results}")
+    print(f"{results['ok'] / elapsed:.0f} заказов/с, {elapsed:.2f} с, продано {sold} шт.")
+    print("пул:", db.metrics())
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
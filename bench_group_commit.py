@@ -0,0 +1,107 @@
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from bank_writer import GroupCommitWriter
+from ledger import BankDatabase, Ledger
+
+# Групповая запись против commit на каждую операцию. producers потоков
+# подают по ops переводов через GroupCommitWriter при разных max_batch;
+# для сравнения те же переводы идут через Ledger.transfer с
+# synchronous=FULL, по одному commit на перевод. Печатает операции в
+# секунду и задержку от submit до надёжной записи (медиана и p99).
+
+
+def fresh_ledger(clients):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_group_commit.db')
+    ledger = Ledger(BankDatabase(path, pool_size=8), snapshot_every=0)
+    ids = [ledger.open_client(f'client{i}', 10 ** 6) for i in range(clients)]
+    return ledger, ids
+
+
+def report(label, latencies, elapsed, extra=''):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {label}: {len(latencies) / elapsed:8.0f} оп/с, медиана {statistics.median(latencies) * 1000:6.2f} мс, "
+          f"p99 {p99 * 1000:6.2f} мс{extra}")
+
+
+def run_writer(max_batch, producers, ops, clients, max_delay=0.002):
+    ledger, ids = fresh_ledger(clients)
+    latencies = []
+    lock = threading.Lock()
+
+    with GroupCommitWriter(ledger, max_batch=max_batch, max_delay=max_delay) as writer:
+        def producer(seed):
+            rnd = random.Random(seed)
+            # Окно из 64 операций в полёте на поток, как у пачки запросов от клиентов
+            pending = []
+            for _ in range(ops):
+                a, b = rnd.sample(ids, 2)
+                pending.append((time.perf_counter(), writer.transfer(a, b, rnd.randint(1, 100))))
+                if len(pending) == 64:
+                    collect(pending)
+            collect(pending)
+
+        def collect(pending):
+            done = []
+            for submitted, future in pending:
+                future.result()
+                done.append(time.perf_counter() - submitted)
+            pending.clear()
+            with lock:
+                latencies.extend(done)
+
+        threads = [threading.Thread(target=producer, args=(seed,)) for seed in range(producers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        metrics = writer.metrics()
+    assert not ledger.unbalanced() and not ledger.recover()
+    report(f"max_batch={max_batch:<4}", latencies, elapsed, f", в среднем {metrics['avg_batch']:.1f} оп. на commit")
+
+
+def run_direct(producers, ops, clients):
+    ledger, ids = fresh_ledger(clients)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        done = []
+        with ledger.db.connection() as conn:
+            conn.execute('PRAGMA synchronous=FULL')
+            for _ in range(ops):
+                a, b = rnd.sample(ids, 2)
+                submitted = time.perf_counter()
+                ledger.transfer(a, b, rnd.randint(1, 100))
+                done.append(time.perf_counter() - submitted)
+            conn.execute('PRAGMA synchronous=NORMAL')
+        with lock:
+            latencies.extend(done)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(producers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report("commit на операцию", latencies, time.perf_counter() - started)
+
+
+def run(producers=4, ops=1000, clients=1000):
+    print(f"{producers} потоков по {ops} переводов:")
+    run_direct(producers, ops, clients)
+    for max_batch in (1, 8, 64, 256):
+        run_writer(max_batch, producers, ops, clients)
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
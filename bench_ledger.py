@@ -0,0 +1,62 @@
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from bank import InsufficientFundsError
+from ledger import BankDatabase, Ledger
+
+# Конкурентные переводы через Ledger: threads потоков по transfers переводов
+# между случайными клиентами на общей базе. Печатает переводы в секунду,
+# затем проверяет, что деньги не появились и не исчезли, каждая операция
+# сходится в ноль, а остатки совпадают с журналом.
+
+
+def run(threads=8, transfers=500, clients=1000):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_ledger.db')
+    db = BankDatabase(path, pool_size=threads)
+    ledger = Ledger(db, snapshot_every=1000)
+    ids = [ledger.open_client(f'client{i}', 1000) for i in range(clients)]
+    with db.connection() as conn:
+        total = conn.execute('SELECT SUM(balance) FROM clients').fetchone()[0]
+
+    counts = {'ok': 0, 'declined': 0}
+    lock = threading.Lock()
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        ok = declined = 0
+        for _ in range(transfers):
+            a, b = rnd.sample(ids, 2)
+            try:
+                ledger.transfer(a, b, rnd.randint(1, 300))
+                ok += 1
+            except InsufficientFundsError:
+                declined += 1
+        with lock:
+            counts['ok'] += ok
+            counts['declined'] += declined
+
+    pool = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done = threads * transfers
+    print(f"{threads} потоков, {done} переводов за {elapsed:.2f} с: {done / elapsed:.0f} переводов/с, "
+          f"успешно {counts['ok']}, отказов {counts['declined']}")
+
+    with db.connection() as conn:
+        assert conn.execute('SELECT SUM(balance) FROM clients').fetchone()[0] == total, 'сумма остатков изменилась'
+    assert not ledger.unbalanced(), 'есть несходящиеся операции'
+    started = time.perf_counter()
+    assert not ledger.recover(), 'остатки расходятся с журналом'
+    print(f"сверка с журналом: {(time.perf_counter() - started) * 1000:.1f} мс, пул {db.metrics()}")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
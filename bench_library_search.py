@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+import library
+from library import Library
+
+# Поиск по сгенерированному каталогу из books книг: LIKE '%слово%' по books
+# и authors против запроса к индексу books_search (FTS5). Индекс
+# заполняется теми же триггерами, что и в library.db.
+
+SYLLABLES = ['ка', 'ли', 'мо', 'ра', 'ве', 'ст', 'но', 'ди', 'ор', 'ан', 'ми', 'ту', 'ле', 'за', 'по', 'ри']
+COUNTRIES = ['Россия', 'Франция', 'Англия', 'Германия', 'Италия', 'Испания', 'Япония', 'США', 'Казахстан']
+
+
+def words(rnd, count):
+    vocabulary = set()
+    while len(vocabulary) < count:
+        vocabulary.add(''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))))
+    return sorted(vocabulary)
+
+
+def generate(conn, books, authors, seed=1):
+    rnd = random.Random(seed)
+    vocabulary = words(rnd, 20_000)
+    # Частоты слов убывают как у живого языка: немногие встречаются часто
+    cum_weights = list(accumulate(1 / (i + 1) for i in range(len(vocabulary))))
+    with conn:
+        conn.executemany("INSERT INTO authors (name, country) VALUES (?, ?)",
+                         ((f"{rnd.choice(vocabulary).capitalize()} {rnd.choice(vocabulary).capitalize()}",
+                           rnd.choice(COUNTRIES)) for _ in range(authors)))
+        conn.executemany("INSERT INTO books (title, author_id, year, available) VALUES (?, ?, ?, 1)",
+                         ((' '.join(rnd.choices(vocabulary, cum_weights=cum_weights, k=rnd.randint(2, 5))).capitalize(),
+                           rnd.randint(1, authors), rnd.randint(1800, 2024)) for _ in range(books)))
+    return vocabulary
+
+
+def timed(fn, repeat=3):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def like_scan(conn, term, limit):
+    pattern = f'%{term}%'
+    return conn.execute("SELECT b.id, b.title, a.name, a.country FROM books b LEFT JOIN authors a ON a.id = b.author_id "
+                        "WHERE b.title LIKE ? OR a.name LIKE ? OR a.country LIKE ? LIMIT ?",
+                        (pattern, pattern, pattern, limit)).fetchall()
+
+
+def run(books=1_000_000, authors=20_000, limit=20):
+    library.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench_library.db')
+    conn = library.get_conn()
+    started = time.perf_counter()
+    vocabulary = generate(conn, books, authors)
+    print(f"каталог: {books} книг, {authors} авторов за {time.perf_counter() - started:.1f} с "
+          f"(индекс books_search заполнен триггерами)")
+    lib = Library(conn)
+
+    queries = [vocabulary[0], vocabulary[500], vocabulary[-1], vocabulary[-1][:4], 'Япония']
+    for term in queries:
+        like_time, like_rows = timed(lambda: like_scan(conn, term, limit))
+        fts_time, fts_rows = timed(lambda: lib.search(term, limit, max_candidates=10_000))
+        full_time, _ = timed(lambda: lib.search(term, limit), 1)
+        miss_time, _ = timed(lambda: like_scan(conn, term + 'щщ', limit), 1)
+        matches = conn.execute("SELECT count(*) FROM books_search WHERE books_search MATCH ?",
+                               (f'"{term.lower()}"*',)).fetchone()[0]
+        print(f"  {term!r:14} ({matches} совп.): LIKE {like_time * 1000:7.1f} мс, без совпадений "
+              f"{miss_time * 1000:7.1f} мс; FTS5 до 10000 кандидатов {fts_time * 1000:6.2f} мс, все {full_time * 1000:7.1f} мс")
+
+    lib.fulltext = False
+    fallback_time, _ = timed(lambda: lib.search(queries[2], limit), 1)
+    print(f"  запасной поиск без FTS5 ({queries[2]!r}): {fallback_time * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,78 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import carprogramm
+from carprogramm import BookingConflictError, RentalService
+
+# Бронирование на сгенерированной истории аренд: cars машин, у каждой
+# rents_per_car непересекающихся аренд подряд. Сравнивает поиск свободных
+# машин через индекс rents_car_end с наивным запросом по всей таблице rents.
+
+
+def generate(conn, cars, rents_per_car, seed=1):
+    rnd = random.Random(seed)
+    origin = date(2000, 1, 1)
+    conn.executemany("INSERT INTO cars (brand, model, year, available) VALUES (?, ?, ?, 1)",
+                     [('Toyota', f'Model {i}', 2000 + i % 25) for i in range(cars)])
+
+    def rows():
+        for car_id in range(1, cars + 1):
+            day = origin + timedelta(days=rnd.randint(0, 30))
+            for _ in range(rents_per_car):
+                days = rnd.randint(1, 14)
+                end = day + timedelta(days=days)
+                yield (f'client{rnd.randint(1, 10 ** 5)}', car_id, days, days * 50.0, day.isoformat(), end.isoformat())
+                day = end + timedelta(days=rnd.randint(0, 20))
+
+    conn.executemany("INSERT INTO rents (customer_name, car_id, days, total_price, start_date, end_date) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", rows())
+    conn.commit()
+
+
+def timed(label, fn, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"  {label}: {elapsed * 1000:.1f} мс")
+    return result
+
+
+def run(cars=10_000, rents_per_car=100, bookings=2000):
+    carprogramm.DB_FILE = os.path.join(tempfile.mkdtemp(), 'bench_rentals.db')
+    conn = carprogramm.get_conn()
+    started = time.perf_counter()
+    generate(conn, cars, rents_per_car)
+    print(f"история: {cars * rents_per_car} аренд за {time.perf_counter() - started:.1f} с")
+
+    service = RentalService(conn)
+    start, end = '2002-03-01', '2002-03-08'
+    print(f"свободные машины {start} — {end}:")
+    free = timed("индекс rents_car_end", lambda: [car[0] for car in service.iter_free_cars(start, end, 1000)], 3)
+    naive = timed("просмотр всей rents", lambda: [row[0] for row in conn.execute(
+        "SELECT id FROM cars WHERE id NOT IN "
+        "(SELECT car_id FROM rents NOT INDEXED WHERE start_date < ? AND end_date > ?) ORDER BY id",
+        (end, start))], 3)
+    assert free == naive, 'результаты расходятся'
+    print(f"  свободно {len(free)} из {cars}")
+
+    rnd = random.Random(2)
+    ok = conflicts = 0
+    started = time.perf_counter()
+    for _ in range(bookings):
+        day = date(2000, 1, 1) + timedelta(days=rnd.randint(0, 4000))
+        try:
+            service.book('bench', rnd.randint(1, cars), day, day + timedelta(days=rnd.randint(1, 7)), 50.0)
+            ok += 1
+        except BookingConflictError:
+            conflicts += 1
+    elapsed = time.perf_counter() - started
+    print(f"бронирование: {bookings / elapsed:.0f} попыток/с, успешно {ok}, конфликтов {conflicts}")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
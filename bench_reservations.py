@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from arscode import DatabaseManager, InsufficientBalanceError, OutOfStockError
+from reservations import ReservationConflictError, StockReservations
+
+# Стресс-тест резервов: несколько процессов одновременно резервируют товар
+# в одном файле SQLite. Часть резервов подтверждается, часть отменяется, часть
+# бросается и истекает. Подтверждение оформляет заказ через checkout(). В конце
+# проверяется, что товара не продано больше, чем было:
+# остаток + активные резервы + проданное по заказам = начальный запас.
+
+
+def buyer(path, seed, products, results):
+    db = DatabaseManager(path, pool_size=1, timeout=30)
+    holds = StockReservations(db, ttl=0.05)
+    rnd = random.Random(seed)
+    user_id = seed + 1
+    confirmed = done = out = conflicts = 0
+    while out < 50:
+        product_id = rnd.randint(1, products)
+        try:
+            hold_id = holds.hold(product_id, rnd.randint(1, 3), holder=user_id)
+        except OutOfStockError:
+            out += 1
+            continue
+        except ReservationConflictError:
+            conflicts += 1
+            continue
+        done += 1
+        action = rnd.random()
+        if action < 0.6:
+            try:
+                order = holds.confirm(hold_id, user_id)
+                confirmed += sum(line['quantity'] for line in order['lines'])
+            except (ReservationConflictError, OutOfStockError, InsufficientBalanceError):
+                pass
+        elif action < 0.8:
+            holds.release(hold_id)
+        # иначе резерв брошен и вернётся на склад после ttl
+    results.put((confirmed, done, conflicts, holds.stats))
+
+
+def run(processes=8, products=5, stock=300):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_reservations.db')
+    db = DatabaseManager(path)
+    with db.transaction() as conn:
+        conn.executemany('INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                         [(f'Шоколад {i}', 'chocolate', 10.0, stock) for i in range(products)])
+        conn.executemany("INSERT INTO users (name, email, password, balance, role) VALUES (?, ?, 'x', ?, 'client')",
+                         [(f'buyer{i}', f'buyer{i}@example.com', 10.0 * products * stock) for i in range(processes)])
+
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=buyer, args=(path, i, products, results)) for i in range(processes)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    collected = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    confirmed = sum(r[0] for r in collected)
+    holds = sum(r[1] for r in collected)
+    attempts = sum(r[3]['attempts'] for r in collected)
+    conflicts = sum(r[3]['conflicts'] for r in collected)
+    with db.connection() as conn:
+        left, lowest = conn.execute('SELECT SUM(quantity), MIN(quantity) FROM products').fetchone()
+        held = conn.execute('SELECT COALESCE(SUM(quantity), 0) FROM stock_holds').fetchone()[0]
+        sold = conn.execute('SELECT COALESCE(SUM(quantity), 0) FROM order_items').fetchone()[0]
+    assert sold == confirmed, 'подтверждённые резервы не совпадают с заказами'
+    assert lowest >= 0, 'отрицательный остаток'
+    assert left + held + confirmed == products * stock, 'продано больше, чем было на складе'
+
+    print(f"процессов: {processes}, резервов: {holds} за {elapsed:.2f} с ({holds / elapsed:.0f} резервов/с)")
+    print(f"попыток CAS: {attempts}, конфликтов: {conflicts} ({conflicts / max(attempts, 1):.1%})")
+    print(f"подтверждено {confirmed}, в резерве {held}, на складе {left} из {products * stock}")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
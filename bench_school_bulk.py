@@ -0,0 +1,70 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from migrations import migrate
+from school import MIGRATIONS, Students
+
+# Массовые изменения в students: BD2.py-стиль (UPDATE ... WHERE name = ? и
+# commit на каждое имя) против Students.update_many / delete_many /
+# advance_year. Построчный вариант гоняется на sample строках и
+# пересчитывается на размер пачки.
+
+
+def generate(conn, students, seed=1):
+    rnd = random.Random(seed)
+    migrate(conn, MIGRATIONS[:1])
+    with conn:
+        conn.executemany("INSERT INTO students (name, age, email, grade) VALUES (?, ?, ?, ?)",
+                         ((f"Ученик {i}", rnd.randint(6, 18), f"student{i}@example.com", rnd.randint(1, 11))
+                          for i in range(students)))
+
+
+def per_name(conn, pairs):
+    started = time.perf_counter()
+    for name, grade in pairs:
+        conn.execute("UPDATE students SET grade = ? WHERE name = ?", (grade, name))
+        conn.commit()
+    return time.perf_counter() - started
+
+
+def run(students=1_000_000, batch=100_000, sample=200):
+    directory = tempfile.mkdtemp()
+    conn = sqlite3.connect(os.path.join(directory, 'school_v2.db'))
+    generate(conn, students)
+    rnd = random.Random(2)
+    names = [f"Ученик {i}" for i in rnd.sample(range(students), batch)]
+    pairs = [(name, rnd.randint(1, 11)) for name in names]
+
+    no_index = per_name(conn, pairs[:sample]) / sample
+    migrate(conn, MIGRATIONS)
+    indexed = per_name(conn, pairs[:sample]) / sample
+    print(f"по одному UPDATE с commit: без индекса {no_index * 1000:.1f} мс/строка "
+          f"(~{no_index * batch:.0f} с на {batch}), с индексом {indexed * 1000:.2f} мс/строка "
+          f"(~{indexed * batch:.1f} с на {batch})")
+
+    table = Students(conn)
+    report = table.update_many((name, {'grade': grade}) for name, grade in pairs)
+    print(f"update_many: {report['rows']} строк за {report['seconds']:.2f} с "
+          f"({report['rows'] / report['seconds']:.0f} строк/с)")
+    expected = dict(pairs)
+    sample_rows = conn.execute("SELECT name, grade FROM students WHERE name IN ({})".format(
+        ', '.join('?' * sample)), names[-sample:]).fetchall()
+    assert all(expected[name] == grade for name, grade in sample_rows)
+
+    report = table.update_many((name, {'grade': 11, 'email': name.replace(' ', '') + '@school.kz'})
+                               for name in names)
+    print(f"update_many, два столбца: {report['rows']} строк за {report['seconds']:.2f} с")
+    report = table.advance_year(drop_below=8)
+    print(f"advance_year: +1 год {report['updated']} строк, удалено {report['deleted']} "
+          f"за {report['seconds']:.2f} с")
+    report = table.delete_many(names)
+    print(f"delete_many: {report['rows']} строк за {report['seconds']:.2f} с "
+          f"({report['rows'] / report['seconds']:.0f} строк/с)")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,74 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from migrations import migrate
+from school import LEGACY_MIGRATIONS, MIGRATIONS, StudentRepository
+
+# StudentRepository на двух сгенерированных базах: school.db и school_v2.db
+# по students строк, половина почт school.db уже есть в school_v2.db.
+# Поиск по email и id с кэшем и без него (cache_size=0) и перенос
+# school.db в school_v2.db.
+
+
+def generate(directory, students, seed=1):
+    rnd = random.Random(seed)
+    legacy = sqlite3.connect(os.path.join(directory, 'school.db'))
+    migrate(legacy, LEGACY_MIGRATIONS)
+    with legacy:
+        legacy.executemany("INSERT INTO students (name, age, email) VALUES (?, ?, ?)",
+                           ((f"Ученик {i}", rnd.randint(6, 18), f"student{i}@example.com")
+                            for i in range(students)))
+    legacy.close()
+    current = sqlite3.connect(os.path.join(directory, 'school_v2.db'))
+    migrate(current, MIGRATIONS)
+    with current:
+        current.executemany("INSERT INTO students (name, age, email, grade) VALUES (?, ?, ?, ?)",
+                            ((f"Ученик {i}", rnd.randint(6, 18), f"student{i}@example.com", rnd.randint(1, 11))
+                             for i in range(students // 2, students // 2 + students)))
+    current.close()
+
+
+def timed(fn, keys):
+    started = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter() - started) / len(keys)
+
+
+def run(students=1_000_000, lookups=100_000, hot=1_000):
+    directory = tempfile.mkdtemp()
+    started = time.perf_counter()
+    generate(directory, students)
+    print(f"school.db и school_v2.db по {students} учеников за {time.perf_counter() - started:.1f} с")
+    files = (os.path.join(directory, 'school_v2.db'), os.path.join(directory, 'school.db'))
+
+    rnd = random.Random(2)
+    hot_emails = [f"student{i}@example.com" for i in rnd.sample(range(students * 3 // 2), hot)]
+    emails = [rnd.choice(hot_emails) for _ in range(lookups)]
+    ids = [rnd.randint(1, students) for _ in range(lookups)]
+    for title, cache_size in (('без кэша', 0), ('с кэшем', 4096)):
+        repo = StudentRepository(*files, cache_size=cache_size)
+        by_email = timed(repo.get_by_email, emails)
+        by_id = timed(repo.get, ids[:hot] * (lookups // hot))
+        print(f"  {title:9}: get_by_email {by_email * 1e6:6.1f} мкс, get {by_id * 1e6:6.1f} мкс "
+              f"(попаданий {repo.stats['hits']}, промахов {repo.stats['misses']})")
+        repo.close()
+
+    repo = StudentRepository(*files)
+    count_time = time.perf_counter()
+    merged = repo.count()
+    count_time = time.perf_counter() - count_time
+    print(f"объединённый список: {merged} учеников, count() за {count_time:.2f} с")
+    report = repo.backfill(chunk_size=50_000)
+    print(f"backfill: прочитано {report['read']}, перенесено {report['written']} за {report['seconds']:.2f} с "
+          f"({report['rows_per_second']:.0f} строк/с)")
+    assert repo.count() == merged
+    repo.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,79 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bank import Bank, CheckingAccount, Customer, InsufficientFundsError
+from ledger import MIGRATIONS
+from migrations import migrate
+from screening import Screener, replay
+
+# Скорость Screener: events списаний по accounts счетам с шагом времени около
+# секунды. Печатает событий в секунду, память на счёт, цену проверки внутри
+# Account.withdraw и скорость replay по таблице transactions.
+
+
+def events_stream(events, accounts, seed=1):
+    rnd = random.Random(seed)
+    t = 1_700_000_000.0
+    for _ in range(events):
+        t += rnd.expovariate(1.0)
+        yield rnd.randrange(accounts), rnd.randint(1, 5000), t
+
+
+def run(events=500_000, accounts=10_000):
+    stream = list(events_stream(events, accounts))
+
+    screener = Screener()
+    started = time.perf_counter()
+    for account, amount, t in stream:
+        screener.observe(account, amount, t)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    sample = Screener()
+    for account in range(1000):
+        sample.observe(account, 1, 0.0)
+    memory = tracemalloc.get_traced_memory()[0] / 1000
+    tracemalloc.stop()
+    print(f"Screener: {events / elapsed:,.0f} событий/с ({elapsed / events * 1e6:.2f} мкс на событие), "
+          f"{memory:.0f} байт на счёт, правил сработало {screener.stats['alerts']}")
+
+    def withdraw_all(bank):
+        customer = Customer("bench", 30)
+        accounts_ = [CheckingAccount(str(i)) for i in range(accounts)]
+        for acc in accounts_:
+            customer.open_account(acc)
+            acc.deposit(10 ** 9)
+        bank.add_customer(customer)
+        started = time.perf_counter()
+        for account, amount, _ in stream:
+            try:
+                accounts_[account].withdraw(amount)
+            except InsufficientFundsError:
+                pass
+        return (time.perf_counter() - started) / events
+
+    plain = withdraw_all(Bank("plain"))
+    screened = withdraw_all(Bank("screened", Screener()))
+    print(f"Account.withdraw: {plain * 1e6:.2f} мкс без проверки, {screened * 1e6:.2f} мкс с проверкой "
+          f"(+{(screened - plain) * 1e6:.2f} мкс)")
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench_screening.db')
+    conn = sqlite3.connect(path)
+    migrate(conn, MIGRATIONS)
+    conn.executemany("INSERT INTO transactions (client_name, amount, type, client_id, created_at) "
+                     "VALUES (?, ?, 'withdraw', ?, ?)",
+                     ((f'client{account}', amount, account, t) for account, amount, t in stream))
+    conn.commit()
+    started = time.perf_counter()
+    screener, alerts = replay(conn)
+    elapsed = time.perf_counter() - started
+    print(f"replay transactions: {screener.stats['events'] / elapsed:,.0f} событий/с, правил сработало {len(alerts)}")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
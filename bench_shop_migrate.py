@@ -0,0 +1,92 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from arscode import DatabaseManager
+from shop_migrate import migrate_shop
+from shop_pricing import ShopDatabase
+
+# Перенос сгенерированной chocolate.db (orders заказов по две позиции,
+# каждый десятый email и каждый пятый товар — дубли) в пустую arscode.db.
+# Источник заполняется через bulk_load — без построчных триггеров сводок.
+# Второй прогон пачками не больше четверти позиций заказов прерывается на
+# половине позиций и запускается заново: результат должен совпасть с первым.
+
+CATEGORIES = ['Молочный шоколад', 'Белый шоколад', 'Горький шоколад', 'Конфеты', 'Батончики', 'Подарочные наборы']
+
+
+def generate(path, orders, seed=1):
+    rnd = random.Random(seed)
+    users, products = max(orders // 5, 1), max(orders // 10, 1)
+    source = DatabaseManager(path)
+    with source.bulk_load() as conn:
+        conn.executemany("INSERT INTO users (name, email, password, balance, role) VALUES (?, ?, ?, ?, 'client')",
+                         ((f"Клиент {i}", f"client{i}@choco.com" if i % 10 else f" Client{i // 10 + 1}@Choco.com ",
+                           'x', round(rnd.uniform(0, 500), 2)) for i in range(users)))
+        conn.executemany("INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)",
+                         ((f"Товар {i % (products * 4 // 5)}", rnd.choice(CATEGORIES), round(rnd.uniform(0.5, 40), 2),
+                           rnd.randint(0, 100)) for i in range(products)))
+        conn.executemany("INSERT INTO coupons (code, discount_percent, valid_to, usage_limit) VALUES (?, ?, ?, 100)",
+                         ((f"CODE{i}", rnd.choice((5, 10, 15)), '2030-01-01') for i in range(100)))
+        conn.executemany("INSERT INTO orders (user_id, total_price, coupon_id, created_at, status) "
+                         "VALUES (?, ?, ?, datetime('now'), 'paid')",
+                         ((rnd.randint(1, users), round(rnd.uniform(1, 200), 2),
+                           rnd.randint(1, 100) if rnd.random() < 0.1 else None) for _ in range(orders)))
+        conn.executemany("INSERT INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
+                         ((order_id, rnd.randint(1, products), rnd.randint(1, 5), round(rnd.uniform(0.5, 40), 2))
+                          for order_id in range(1, orders + 1) for _ in range(2)))
+    source.close()
+
+
+class Interrupted(Exception):
+    pass
+
+
+def snapshot(db):
+    with db.connection() as conn:
+        return tuple(conn.execute(f"SELECT COUNT(*), TOTAL({column}) FROM {table}").fetchone()
+                     for table, column in (('users', 'balance'), ('categories', 'discount'), ('products', 'price'),
+                                           ('coupons', 'discount'), ('orders', 'total'),
+                                           ('order_items', 'price_at_purchase')))
+
+
+def run(orders=500_000, chunk_size=50_000):
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, 'chocolate.db')
+    started = time.perf_counter()
+    generate(source, orders)
+    print(f"chocolate.db: {orders} заказов за {time.perf_counter() - started:.1f} с")
+
+    db = ShopDatabase(os.path.join(directory, 'arscode.db'))
+    started = time.perf_counter()
+    reports = migrate_shop(source, db, chunk_size)
+    elapsed = time.perf_counter() - started
+    for step, report in reports.items():
+        print(f"  {step:12}: {report['read']:>8} строк -> {report['written']:>8} "
+              f"за {report['seconds']:6.2f} с ({report['rows_per_second']:>9.0f} строк/с)")
+    total = sum(report['read'] for report in reports.values())
+    print(f"всего {total} строк за {elapsed:.2f} с ({total / elapsed:.0f} строк/с)")
+
+    items = reports['order_items']['read']
+    resume_chunk = max(min(chunk_size, items // 4), 1)
+
+    def interrupt(step, report):
+        if step == 'order_items' and report['read'] >= items // 2:
+            raise Interrupted
+
+    resumed = ShopDatabase(os.path.join(directory, 'arscode_resumed.db'))
+    try:
+        migrate_shop(source, resumed, resume_chunk, progress=interrupt)
+    except Interrupted:
+        pass
+    else:
+        raise AssertionError("перенос не прервался")
+    migrate_shop(source, resumed, resume_chunk)
+    assert snapshot(resumed) == snapshot(db)
+    print("перенос с обрывом и продолжением дал тот же результат")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
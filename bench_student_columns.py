@@ -0,0 +1,86 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from student_columns import StudentColumns, export_students
+
+# Вопросы BD2.py (10 класс, старше 15 лет, имена и почты) и группировка по
+# классам на сгенерированной таблице students: запросы SQLite к таблице без
+# индексов, как в school_v2.db, против колоночного снимка.
+
+NAMES = ['Азамат', 'Малика', 'Тимур', 'Алина', 'Айгуль', 'Медина', 'Али', 'Айнура', 'Дана', 'Ерлан',
+         'Жанна', 'Ильяс', 'Камила', 'Нурлан', 'Сабина', 'Руслан', 'Аружан', 'Данияр', 'Мадина', 'Арман']
+
+
+def generate(conn, students, seed=1):
+    rnd = random.Random(seed)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        age INTEGER,
+        email TEXT,
+        grade INTEGER
+    )
+    ''')
+    with conn:
+        conn.executemany("INSERT INTO students (name, age, email, grade) VALUES (?, ?, ?, ?)",
+                         ((f"{rnd.choice(NAMES)} {i // 1000}", rnd.randint(6, 18), f"student{i}@example.com",
+                           rnd.randint(1, 11)) for i in range(students)))
+
+
+def timed(fn, repeat=3):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def run(students=1_000_000):
+    directory = tempfile.mkdtemp()
+    conn = sqlite3.connect(os.path.join(directory, 'school_v2.db'))
+    started = time.perf_counter()
+    generate(conn, students)
+    print(f"students: {students} строк за {time.perf_counter() - started:.1f} с")
+
+    path = os.path.join(directory, 'students.col')
+    export_time, _ = timed(lambda: export_students(conn, path), 1)
+    print(f"выгрузка: {export_time:.2f} с, файл {os.path.getsize(path) / 2 ** 20:.1f} МБ "
+          f"(база {os.path.getsize(os.path.join(directory, 'school_v2.db')) / 2 ** 20:.1f} МБ)")
+    open_time, table = timed(lambda: StudentColumns(path))
+
+    checks = [
+        ('10 класс, число',
+         lambda: conn.execute("SELECT COUNT(*) FROM students WHERE grade = 10").fetchone()[0],
+         lambda: table.count(table.where(grade=10))),
+        ('старше 15 лет, число',
+         lambda: conn.execute("SELECT COUNT(*) FROM students WHERE age > 15").fetchone()[0],
+         lambda: table.count(table.where(age_above=15))),
+        ('10 класс, строки',
+         lambda: conn.execute("SELECT id, name, age, email, grade FROM students WHERE grade = 10").fetchall(),
+         lambda: table.select(table.where(grade=10))),
+        ('имена и почты 11 класса старше 17',
+         lambda: conn.execute("SELECT name, email FROM students WHERE grade = 11 AND age > 17").fetchall(),
+         lambda: table.select(table.where(grade=11, age_above=17), ('name', 'email'))),
+        ('по классам: число и средний возраст',
+         lambda: {grade: (count, mean) for grade, count, mean in conn.execute(
+             "SELECT grade, COUNT(*), AVG(age) FROM students GROUP BY grade")},
+         lambda: table.group_by('grade')),
+    ]
+    print(f"открытие снимка: {open_time * 1000:.2f} мс")
+    for title, sql, columnar in checks:
+        sql_time, expected = timed(sql)
+        columnar_time, result = timed(columnar)
+        if isinstance(expected, dict):
+            assert expected.keys() == result.keys() and all(
+                expected[k][0] == result[k][0] and abs(expected[k][1] - result[k][1]) < 1e-9 for k in expected)
+        else:
+            assert [tuple(row) for row in expected] == result if isinstance(expected, list) else expected == result
+        print(f"  {title:36}: SQLite {sql_time * 1000:8.1f} мс, снимок {columnar_time * 1000:8.1f} мс")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
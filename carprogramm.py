@@ -1,8 +1,12 @@
 import sqlite3
-conn = sqlite3.connect('rental.db')
-cursor = conn.cursor()
+from datetime import date, timedelta
 
-cursor.execute('''
+from migrations import migrate
+from rental_reports import iter_rent_history, print_dashboard
+
+MIGRATIONS = [
+(1, [
+'''
 CREATE TABLE IF NOT EXISTS cars (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 brand TEXT,
@@ -10,11 +14,8 @@ model TEXT,
 year INTEGER,
 available BOOLEAN
 )
-''')
-
-conn.commit()
-
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS rents (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 customer_name TEXT,
@@ -23,9 +24,150 @@ days INTEGER,
 total_price REAL,
 FOREIGN KEY (car_id) REFERENCES cars(id)
 )
-''')
+''',
+]),
+# Частичный индекс по флагу available, который ведут rent и return_car.
+# Списки свободных машин считают доступность по rents (FREE_TODAY) и его не используют.
+(2, [
+'CREATE INDEX IF NOT EXISTS cars_available ON cars(id) WHERE available = 1',
+]),
+# Аренда — интервал дат [start_date, end_date). Текущие аренды старого
+# формата получают даты от сегодняшнего дня.
+(3, [
+'ALTER TABLE rents ADD COLUMN start_date TEXT',
+'ALTER TABLE rents ADD COLUMN end_date TEXT',
+'''
+UPDATE rents SET start_date = date('now'), end_date = date('now', '+' || days || ' days')
+WHERE id IN (SELECT MAX(id) FROM rents WHERE car_id IN (SELECT id FROM cars WHERE available = 0) GROUP BY car_id)
+''',
+'CREATE INDEX IF NOT EXISTS rents_car_end ON rents(car_id, end_date, start_date)',
+]),
+# Сводки для rental_reports.py: по машинам и по клиентам, ведутся триггерами на rents
+(4, [
+'''
+CREATE TABLE IF NOT EXISTS car_stats (
+car_id INTEGER PRIMARY KEY,
+rents INTEGER NOT NULL DEFAULT 0,
+rented_days REAL NOT NULL DEFAULT 0,
+revenue REAL NOT NULL DEFAULT 0,
+first_start TEXT,
+last_end TEXT
+)
+''',
+'''
+CREATE TABLE IF NOT EXISTS customer_stats (
+customer_name TEXT PRIMARY KEY,
+rents INTEGER NOT NULL DEFAULT 0,
+rented_days REAL NOT NULL DEFAULT 0,
+total_spent REAL NOT NULL DEFAULT 0
+)
+''',
+'CREATE INDEX IF NOT EXISTS car_stats_revenue ON car_stats(revenue)',
+'CREATE INDEX IF NOT EXISTS customer_stats_total_spent ON customer_stats(total_spent)',
+'''
+INSERT INTO car_stats (car_id, rents, rented_days, revenue, first_start, last_end)
+SELECT r.car_id, COUNT(*), SUM(COALESCE(julianday(r.end_date) - julianday(r.start_date), r.days, 0)), SUM(COALESCE(r.total_price, 0)), MIN(r.start_date), MAX(r.end_date)
+FROM rents r GROUP BY r.car_id
+''',
+'''
+INSERT INTO customer_stats (customer_name, rents, rented_days, total_spent)
+SELECT r.customer_name, COUNT(*), SUM(COALESCE(julianday(r.end_date) - julianday(r.start_date), r.days, 0)), SUM(COALESCE(r.total_price, 0))
+FROM rents r WHERE r.customer_name IS NOT NULL GROUP BY r.customer_name
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS rent_stats_insert AFTER INSERT ON rents
+BEGIN
+    INSERT INTO car_stats (car_id, rents, rented_days, revenue, first_start, last_end)
+    VALUES (NEW.car_id, 1, COALESCE(julianday(NEW.end_date) - julianday(NEW.start_date), NEW.days, 0), COALESCE(NEW.total_price, 0), NEW.start_date, NEW.end_date)
+    ON CONFLICT(car_id) DO UPDATE SET
+        rents = rents + 1,
+        rented_days = rented_days + excluded.rented_days,
+        revenue = revenue + excluded.revenue,
+        first_start = MIN(COALESCE(first_start, excluded.first_start), COALESCE(excluded.first_start, first_start)),
+        last_end = MAX(COALESCE(last_end, excluded.last_end), COALESCE(excluded.last_end, last_end));
+    INSERT INTO customer_stats (customer_name, rents, rented_days, total_spent)
+    SELECT NEW.customer_name, 1, COALESCE(julianday(NEW.end_date) - julianday(NEW.start_date), NEW.days, 0), COALESCE(NEW.total_price, 0) WHERE NEW.customer_name IS NOT NULL
+    ON CONFLICT(customer_name) DO UPDATE SET
+        rents = rents + 1,
+        rented_days = rented_days + excluded.rented_days,
+        total_spent = total_spent + excluded.total_spent;
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS rent_stats_delete AFTER DELETE ON rents
+BEGIN
+    UPDATE car_stats SET
+        rents = rents - 1,
+        rented_days = rented_days - COALESCE(julianday(OLD.end_date) - julianday(OLD.start_date), OLD.days, 0),
+        revenue = revenue - COALESCE(OLD.total_price, 0),
+        first_start = (SELECT MIN(start_date) FROM rents WHERE car_id = OLD.car_id),
+        last_end = (SELECT MAX(end_date) FROM rents WHERE car_id = OLD.car_id)
+    WHERE car_id = OLD.car_id;
+    UPDATE customer_stats SET
+        rents = rents - 1,
+        rented_days = rented_days - COALESCE(julianday(OLD.end_date) - julianday(OLD.start_date), OLD.days, 0),
+        total_spent = total_spent - COALESCE(OLD.total_price, 0)
+    WHERE customer_name = OLD.customer_name;
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS rent_stats_update AFTER UPDATE ON rents
+BEGIN
+    UPDATE car_stats SET
+        rents = rents - 1,
+        rented_days = rented_days - COALESCE(julianday(OLD.end_date) - julianday(OLD.start_date), OLD.days, 0),
+        revenue = revenue - COALESCE(OLD.total_price, 0)
+    WHERE car_id = OLD.car_id;
+    UPDATE customer_stats SET
+        rents = rents - 1,
+        rented_days = rented_days - COALESCE(julianday(OLD.end_date) - julianday(OLD.start_date), OLD.days, 0),
+        total_spent = total_spent - COALESCE(OLD.total_price, 0)
+    WHERE customer_name = OLD.customer_name;
+    INSERT INTO car_stats (car_id, rents, rented_days, revenue)
+    VALUES (NEW.car_id, 1, COALESCE(julianday(NEW.end_date) - julianday(NEW.start_date), NEW.days, 0), COALESCE(NEW.total_price, 0))
+    ON CONFLICT(car_id) DO UPDATE SET
+        rents = rents + 1,
+        rented_days = rented_days + excluded.rented_days,
+        revenue = revenue + excluded.revenue;
+    INSERT INTO customer_stats (customer_name, rents, rented_days, total_spent)
+    SELECT NEW.customer_name, 1, COALESCE(julianday(NEW.end_date) - julianday(NEW.start_date), NEW.days, 0), COALESCE(NEW.total_price, 0) WHERE NEW.customer_name IS NOT NULL
+    ON CONFLICT(customer_name) DO UPDATE SET
+        rents = rents + 1,
+        rented_days = rented_days + excluded.rented_days,
+        total_spent = total_spent + excluded.total_spent;
+    UPDATE car_stats SET
+        first_start = (SELECT MIN(start_date) FROM rents WHERE car_id = car_stats.car_id),
+        last_end = (SELECT MAX(end_date) FROM rents WHERE car_id = car_stats.car_id)
+    WHERE car_id IN (OLD.car_id, NEW.car_id);
+END
+''',
+]),
+]
+
+PAGE_SIZE = 20
+
+# Начало ближайшей аренды машины, которая заканчивается после даты-параметра.
+# Аренды одной машины не пересекаются, поэтому машина свободна на [start, end),
+# если это начало не раньше end (или аренды нет) — один поиск по rents_car_end
+# вместо просмотра всей истории.
+NEXT_RENT_START = '''COALESCE((SELECT r.start_date FROM rents r
+    WHERE r.car_id = {car} AND r.end_date > ? ORDER BY r.end_date LIMIT 1), '9999-12-31')'''
+
+# Машина свободна сегодня: свободна на [сегодня, завтра). Параметры — сегодня и завтра.
+FREE_TODAY = NEXT_RENT_START + ' >= ?'
+
+DB_FILE = 'rental.db'
 
-conn.commit()
+_conn = None
+
+# Соединение с rental.db открывается и мигрируется при первом обращении,
+# а не при импорте модуля.
+def get_conn():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_FILE)
+        migrate(_conn, MIGRATIONS)
+    return _conn
 
 class Car:
     def __init__(self, brand, model, year, available=True):
@@ -39,105 +181,178 @@ class Car:
     def mark_available(self):
         self.available = True
     
+class BookingConflictError(Exception):
+    pass
+
+def _iso(day):
+    return day.isoformat() if isinstance(day, date) else date.fromisoformat(day).isoformat()
+
 class RentalService:
+    def __init__(self, connection=None):
+        self.conn = connection or get_conn()
+
     def add_car(self, car: Car):
         try:
-            cursor.execute(
+            self.conn.execute(
                 "INSERT INTO cars (brand, model, year, available) VALUES (?, ?, ?, ?)",
                 (car.brand, car.model, car.year, car.available)
             )
-            conn.commit()
+            self.conn.commit()
             print(f"Машина {car.brand} {car.model} добавлена.")
         except Exception as e:
             print("Ошибка при добавлении машины:", e)
     
+    # Страница машин после after_id по возрастанию id (keyset-пагинация):
+    # возвращает (машины, id для следующей страницы или None). Пятое поле и
+    # фильтр available — свободна ли машина сегодня по таблице rents.
+    def car_page(self, available=None, after_id=0, page_size=PAGE_SIZE):
+        today = (date.today().isoformat(), (date.today() + timedelta(days=1)).isoformat())
+        free_today = FREE_TODAY.format(car='c.id')
+        query = f"SELECT c.id, c.brand, c.model, c.year, {free_today} FROM cars c WHERE c.id > ?"
+        params = [*today, after_id]
+        if available is not None:
+            query += f" AND {'' if available else 'NOT '}{free_today}"
+            params += today
+        cars = self.conn.execute(query + " ORDER BY c.id LIMIT ?", params + [page_size]).fetchall()
+        next_after_id = cars[-1][0] if len(cars) == page_size else None
+        return cars, next_after_id
+
+    # Все машины страницами; в памяти одновременно не больше page_size строк
+    def iter_car_pages(self, available=None, after_id=0, page_size=PAGE_SIZE):
+        while after_id is not None:
+            cars, after_id = self.car_page(available, after_id, page_size)
+            if cars:
+                yield cars
+
+    def iter_cars(self, available=None, after_id=0, page_size=PAGE_SIZE):
+        for page in self.iter_car_pages(available, after_id, page_size):
+            yield from page
+
+    def _print_pages(self, available, empty_message):
+        shown = False
+        for page in self.iter_car_pages(available):
+            if shown and input("Enter — следующая страница, q — назад: ").strip().lower() == 'q':
+                return
+            for car in page:
+                status = "Доступна" if car[4] else "Занята"
+                print(f"{car[0]} | {car[1]} {car[2]} ({car[3]}) | {status}")
+            shown = True
+        if not shown:
+            print(empty_message)
+
     def show_all_cars(self):
-        cursor.execute("SELECT * FROM cars")
-        cursor.fetchall()
-        if not cursor.fetchall():
-            print("Список машин пуст.")
-            return
-        for car in cursor.fetchall():
-            if car[4]:
-             print("Доступно")
-            else:
-             print("Занята")
-            print(f"{car[0]} | {car[1]} {car[2]} ({car[3]}) | {cursor.fetchall()}")
-        
+        self._print_pages(None, "Список машин пуст.")
+
     def show_available_cars(self):
-        cursor.execute("SELECT * FROM cars WHERE available=1")
-        cars = cursor.fetchall()
-        if not cars:
-            print('Свободных машин нет')
-        
-        for car in cars:
-            print(print(f"{car[0]} | {car[1]} {car[2]} ({car[3]}) | Доступна"))
-            
+        self._print_pages(True, "Свободных машин нет")
+
+    # Бронь машины на [start, end) одним условным INSERT: строка появится,
+    # только если машина есть и ни с одной её арендой нет пересечения.
+    def book(self, customer_name, car_id, start, end, daily_price):
+        start, end = _iso(start), _iso(end)
+        days = (date.fromisoformat(end) - date.fromisoformat(start)).days
+        if days <= 0:
+            raise ValueError("Дата окончания должна быть позже даты начала")
+        total_price = days * daily_price
+        today = date.today().isoformat()
+        with self.conn:
+            inserted = self.conn.execute(
+                "INSERT INTO rents (customer_name, car_id, days, total_price, start_date, end_date) "
+                "SELECT ?, id, ?, ?, ?, ? FROM cars WHERE id = ? AND "
+                + NEXT_RENT_START.format(car='?') + " >= ?",
+                (customer_name, days, total_price, start, end, car_id, car_id, start, end)
+            )
+            if not inserted.rowcount:
+                if self.conn.execute("SELECT 1 FROM cars WHERE id=?", (car_id,)).fetchone() is None:
+                    raise ValueError("Машина с таким номером не найдена.")
+                raise BookingConflictError(f"Машина {car_id} уже занята с {start} по {end}.")
+            if start <= today < end:
+                self.conn.execute("UPDATE cars SET available=0 WHERE id=?", (car_id,))
+        return inserted.lastrowid
+
+    def is_free(self, car_id, start, end):
+        row = self.conn.execute("SELECT " + NEXT_RENT_START.format(car='?') + " >= ?",
+                                (car_id, _iso(start), _iso(end))).fetchone()
+        return bool(row[0])
+
+    # Свободные на [start, end) машины страницами по id
+    def free_cars_page(self, start, end, after_id=0, page_size=PAGE_SIZE):
+        cars = self.conn.execute(
+            "SELECT c.id, c.brand, c.model, c.year, c.available FROM cars c WHERE c.id > ? AND "
+            + NEXT_RENT_START.format(car='c.id') + " >= ? ORDER BY c.id LIMIT ?",
+            (after_id, _iso(start), _iso(end), page_size)
+        ).fetchall()
+        next_after_id = cars[-1][0] if len(cars) == page_size else None
+        return cars, next_after_id
+
+    def iter_free_cars(self, start, end, page_size=PAGE_SIZE):
+        after_id = 0
+        while after_id is not None:
+            cars, after_id = self.free_cars_page(start, end, after_id, page_size)
+            yield from cars
+
     def rent_car(self, customer_name, car_id, days, daily_price):
+        start = date.today()
         try:
-            cursor.execute("SELECT available, brand, model FROM cars WHERE id=?", (car_id))
-            car = cursor.fetchall()
-            if not car:
-                print("Машина с таким номером не найдена.")
-                return
-            if not car[0]:
-                print("Машина уже арендована.")
-                return
-            total_price = days * daily_price
-            cursor.execute(
-                "INSERT INTO rents (customer_name, car_id, days, total_price) VALUES (?, ?, ?, ?)",
-                (customer_name, car_id, days, total_price)
-            )
-            cursor.execute(
-                "UPDATE cars SET available=0 WHERE id=?",
-                (car_id)
-            )
-            conn.commit()
-            print(f"{customer_name} арендовал {car[1]} {car[2]} на {days} дней. Цена: {total_price}")
+            self.book(customer_name, car_id, start, start + timedelta(days=days), daily_price)
+            car = self.conn.execute("SELECT brand, model FROM cars WHERE id=?", (car_id,)).fetchone()
+            print(f"{customer_name} арендовал {car[0]} {car[1]} на {days} дней. Цена: {days * daily_price}")
+        except BookingConflictError:
+            print("Машина уже арендована.")
         except Exception as car:
             print("Ошибка при аренде машины:", car)
 
-     
+    # Возврат закрывает текущую аренду сегодняшним днём: дни и цена
+    # пересчитываются по фактическому сроку (оплачиваются минимум сутки),
+    # флаг available — по оставшимся арендам
     def return_car(self, car_id):
         try:
-            cursor.execute("SELECT brand, model, available FROM cars WHERE id=?", (car_id,))
-            car = cursor.fetchall()
+            car = self.conn.execute("SELECT brand, model FROM cars WHERE id=?", (car_id,)).fetchone()
             if not car:
                 print("Машина с таким ID не найдена.")
                 return
-            if car[2]:
+            today = date.today().isoformat()
+            tomorrow = (date.today() + timedelta(days=1)).isoformat()
+            with self.conn:
+                closed = self.conn.execute(
+                    "UPDATE rents SET end_date = ?1, "
+                    "days = MAX(1, CAST(julianday(?1) - julianday(start_date) AS INTEGER)), "
+                    "total_price = CASE WHEN days > 0 "
+                    "THEN total_price * MAX(1, CAST(julianday(?1) - julianday(start_date) AS INTEGER)) / days "
+                    "ELSE total_price END "
+                    "WHERE car_id = ?2 AND end_date > ?1 AND start_date <= ?1",
+                    (today, car_id)
+                ).rowcount
+                self.conn.execute("UPDATE cars SET available = (" + FREE_TODAY.format(car='cars.id') + ") WHERE id = ?",
+                                  (today, tomorrow, car_id))
+            if not closed:
                 print("Машина уже свободна.")
                 return
-            cursor.execute("UPDATE cars SET available=1 WHERE id=?", (car_id,))
-            conn.commit()
             print(f"Машина {car[0]} {car[1]} возвращена и теперь доступна.")
         except Exception as car2:
             print('Ошибка:', car2)
 
     def delete_car(self, car_id):
         try:
-            cursor.execute("SELECT brand, model FROM cars WHERE id=?", (car_id,))
-            car = cursor.fetchall()
+            car = self.conn.execute("SELECT brand, model FROM cars WHERE id=?", (car_id,)).fetchone()
             if not car:
                 print("Машина с таким ID не найдена.")
                 return
-            cursor.execute("DELETE FROM cars WHERE id=?", (car_id,))
-            conn.commit()
+            self.conn.execute("DELETE FROM cars WHERE id=?", (car_id,))
+            self.conn.commit()
             print(f"Машина {car[0]} {car[1]} удалена из базы.")
         except Exception as car3:
             print("Ошибка при удалении машины:", car3)
 
     def show_all_rents(self):
         try:
-            cursor.execute("""SELECT r.id, r.customer_name, c.brand, c.model, r.total_price, r.days
-            FROM rents r
-            """)
-            rents = cursor.fetchall()
-            if not rents:
+            found = False
+            for rent in iter_rent_history(self.conn):
+                print(f"ID: {rent[0]} | Клиент: {rent[1]} | Машина: {rent[2]} {rent[3]} | "
+                      f"С {rent[4]} по {rent[5]} | Дней: {rent[6]} | Цена: {rent[7]}")
+                found = True
+            if not found:
                 print("Записей об аренде нет.")
-                return
-            for rent in rents:
-                print(f"ID: {rent[0]} | Клиент: {rent[1]} | Машина: {rent[2]} {rent[3]} | Дней: {rent[5]} | Цена: {rent[4]}")
         except Exception as car4:
             print("Ошибка при выводе аренд:", car4)
 
@@ -152,7 +367,10 @@ class RentalService:
 5. Вернуть машину
 6. Удалить машину
 7. Показать все аренды
-8. Выйти
+8. Забронировать машину на даты
+9. Свободные машины на даты
+10. Отчёт по автопарку
+11. Выйти
         """)
         choice = input("Выберите действие: ")
 
@@ -181,9 +399,32 @@ class RentalService:
         elif choice == "7":
             service.show_all_rents()
         elif choice == "8":
+            customer = input("Имя клиента: ")
+            car_id = int(input("ID машины: "))
+            start = input("С (ГГГГ-ММ-ДД): ")
+            end = input("По (ГГГГ-ММ-ДД, не включая): ")
+            daily_price = float(input("Цена в день: "))
+            try:
+                rent_id = service.book(customer, car_id, start, end, daily_price)
+                print(f"Бронь №{rent_id} создана.")
+            except (BookingConflictError, ValueError) as e:
+                print("Ошибка при бронировании:", e)
+        elif choice == "9":
+            start = input("С (ГГГГ-ММ-ДД): ")
+            end = input("По (ГГГГ-ММ-ДД, не включая): ")
+            found = False
+            for car in service.iter_free_cars(start, end):
+                print(f"{car[0]} | {car[1]} {car[2]} ({car[3]})")
+                found = True
+            if not found:
+                print("Свободных машин нет")
+        elif choice == "10":
+            print_dashboard(service.conn)
+        elif choice == "11":
             print("Выход из программы...")
             break
         else:
             print("Неверный выбор. Попробуйте снова.")
 
-print(RentalService.car())
\ No newline at end of file
+if __name__ == "__main__":
+    RentalService.car()
@@ -0,0 +1,121 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from migrations import migrate
+
+# Общий пул соединений SQLite для всех *.db приложений. Подкласс задаёт
+# файл по умолчанию (default_file) и свои миграции (migrations), которые
+# применяются при создании пула.
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+# Пул соединений: не больше pool_size соединений на файл, поток держит одно
+# соединение на всё время работы (вложенные connection() его переиспользуют).
+# Соединения в режиме autocommit: одиночные запросы фиксируются сразу,
+# несколько операций группируются через transaction().
+class ConnectionPool:
+    default_file = None
+    migrations = []
+
+    def __init__(self, db_file: str = None, pool_size: int = 5, timeout: float = 10.0,
+                 cached_statements: int = 256):
+        self.db_file = db_file or self.default_file
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._created = 0
+        self.stats = {'checkouts': 0, 'hits': 0, 'waits': 0, 'created': 0}
+        self._create_tables()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            self.stats['checkouts'] += 1
+            try:
+                conn = self._idle.get_nowait()
+                self.stats['hits'] += 1
+                return conn
+            except queue.Empty:
+                pass
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+                self.stats['created'] += 1
+            else:
+                self.stats['waits'] += 1
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(f"Нет свободных соединений к {self.db_file} за {self.timeout} с")
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, size=self._created, idle=self._idle.qsize())
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+
+    def _create_tables(self):
+        with self.connection() as conn:
+            migrate(conn, self.migrations)
@@ -0,0 +1,6 @@
+# Исключения, общие для модулей магазина (arscode.py, shop_pricing.py),
+# чтобы расчёт корзины не зависел от arscode.
+
+
+class InvalidCouponError(Exception):
+    pass
@@ -0,0 +1,295 @@
+import time
+
+from bank import InsufficientFundsError, NegativeAmountError
+from db_pool import ConnectionPool
+
+# Журнал операций bank.db по двойной записи. Каждая операция — строка в
+# ledger_transactions и проводки в ledger_entries с суммой ноль: перевод
+# списывает у одного клиента и зачисляет другому, пополнение и снятие
+# проводятся против кассы банка (client_id = 0). Журнал только дописывается,
+# clients.balance меняется в той же транзакции, что и проводки. Раз в
+# snapshot_every операций остатки сохраняются в snapshot_balances, и
+# recover() после перезапуска досчитывает только хвост журнала.
+
+DB_FILE = 'bank.db'
+CASH = 0
+
+MIGRATIONS = [
+(1, [
+"""
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    balance INTEGER
+)
+""",
+"""
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_name TEXT,
+    amount INTEGER,
+    type TEXT  -- 'deposit' или 'withdraw'
+)
+""",
+"""
+INSERT INTO clients (name, balance)
+SELECT name, balance FROM (
+    SELECT 'Али' AS name, 10000 AS balance
+    UNION ALL SELECT 'Малика', 5000
+    UNION ALL SELECT 'Тимур', 7000
+) AS seed
+WHERE NOT EXISTS (SELECT 1 FROM clients WHERE clients.name = seed.name)
+""",
+]),
+(2, [
+"CREATE INDEX IF NOT EXISTS clients_name ON clients(name)",
+"""
+CREATE TABLE ledger_transactions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL CHECK (kind IN ('opening', 'deposit', 'withdraw', 'transfer')),
+    created_at REAL NOT NULL
+)
+""",
+"""
+CREATE TABLE ledger_entries (
+    id INTEGER PRIMARY KEY,
+    txn_id INTEGER NOT NULL REFERENCES ledger_transactions(id),
+    client_id INTEGER NOT NULL,
+    amount INTEGER NOT NULL
+)
+""",
+"CREATE INDEX ledger_entries_txn ON ledger_entries(txn_id)",
+"CREATE INDEX ledger_entries_client ON ledger_entries(client_id, id)",
+"""
+CREATE TRIGGER ledger_transactions_no_update BEFORE UPDATE ON ledger_transactions
+BEGIN SELECT RAISE(ABORT, 'журнал операций только дописывается'); END
+""",
+"""
+CREATE TRIGGER ledger_transactions_no_delete BEFORE DELETE ON ledger_transactions
+BEGIN SELECT RAISE(ABORT, 'журнал операций только дописывается'); END
+""",
+"""
+CREATE TRIGGER ledger_entries_no_update BEFORE UPDATE ON ledger_entries
+BEGIN SELECT RAISE(ABORT, 'журнал операций только дописывается'); END
+""",
+"""
+CREATE TRIGGER ledger_entries_no_delete BEFORE DELETE ON ledger_entries
+BEGIN SELECT RAISE(ABORT, 'журнал операций только дописывается'); END
+""",
+"""
+CREATE TABLE balance_snapshots (
+    id INTEGER PRIMARY KEY,
+    last_entry_id INTEGER NOT NULL,
+    created_at REAL NOT NULL
+)
+""",
+"""
+CREATE TABLE snapshot_balances (
+    snapshot_id INTEGER NOT NULL,
+    client_id INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, client_id)
+) WITHOUT ROWID
+""",
+"ALTER TABLE transactions ADD COLUMN client_id INTEGER",
+"ALTER TABLE transactions ADD COLUMN created_at REAL",
+"UPDATE transactions SET client_id = (SELECT id FROM clients WHERE clients.name = transactions.client_name)",
+"CREATE INDEX transactions_client ON transactions(client_id, id)",
+# Текущие остатки переносятся в журнал вводными операциями против кассы
+"""
+INSERT INTO ledger_transactions (id, kind, created_at)
+SELECT id, 'opening', (julianday('now') - 2440587.5) * 86400.0 FROM clients WHERE COALESCE(balance, 0) != 0
+""",
+"""
+INSERT INTO ledger_entries (txn_id, client_id, amount)
+SELECT id, id, balance FROM clients WHERE COALESCE(balance, 0) != 0
+UNION ALL
+SELECT id, 0, -balance FROM clients WHERE COALESCE(balance, 0) != 0
+""",
+"UPDATE clients SET balance = 0 WHERE balance IS NULL",
+]),
+]
+
+SNAPSHOT_SQL = '''
+INSERT INTO snapshot_balances (snapshot_id, client_id, balance)
+SELECT ?, client_id, SUM(amount) FROM (
+    SELECT client_id, balance AS amount FROM snapshot_balances WHERE snapshot_id = ?
+    UNION ALL
+    SELECT client_id, amount FROM ledger_entries WHERE id > ? AND id <= ?
+)
+GROUP BY client_id
+'''
+
+
+class UnknownClientError(Exception):
+    pass
+
+
+class BankDatabase(ConnectionPool):
+    default_file = DB_FILE
+    migrations = MIGRATIONS
+
+
+def _amount(amount):
+    if not isinstance(amount, int):
+        raise TypeError(f"Сумма должна быть целым числом: {amount!r}")
+    if amount < 0:
+        raise NegativeAmountError(amount)
+    if amount == 0:
+        raise ValueError("Сумма должна быть больше нуля")
+    return amount
+
+
+class Ledger:
+    def __init__(self, db=None, snapshot_every=1000, keep_snapshots=3):
+        self.db = db or BankDatabase()
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+
+    def client_id(self, name):
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT id FROM clients WHERE name = ? ORDER BY id LIMIT 1', (name,)).fetchone()
+        if row is None:
+            raise UnknownClientError(name)
+        return row[0]
+
+    def balance(self, client_id):
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT balance FROM clients WHERE id = ?', (client_id,)).fetchone()
+        if row is None:
+            raise UnknownClientError(client_id)
+        return row[0]
+
+    def open_client(self, name, balance=0):
+        with self.db.transaction() as conn:
+            client_id = conn.execute('INSERT INTO clients (name, balance) VALUES (?, 0)', (name,)).lastrowid
+            if balance:
+                self.post(conn, 'opening', [(client_id, _amount(balance)), (CASH, -balance)])
+        return client_id
+
+    # Проводки операции kind ('deposit', 'withdraw', 'transfer') с её аргументами
+    def entries(self, kind, *args):
+        if kind == 'deposit':
+            client_id, amount = args[0], _amount(args[1])
+            return [(client_id, amount), (CASH, -amount)]
+        if kind == 'withdraw':
+            client_id, amount = args[0], _amount(args[1])
+            return [(client_id, -amount), (CASH, amount)]
+        if kind == 'transfer':
+            from_id, to_id, amount = args[0], args[1], _amount(args[2])
+            if from_id == to_id:
+                raise ValueError("Перевод самому себе")
+            return [(from_id, -amount), (to_id, amount)]
+        raise ValueError(f"Неизвестная операция: {kind}")
+
+    def execute(self, kind, *args):
+        entries = self.entries(kind, *args)
+        with self.db.transaction() as conn:
+            txn_id = self.post(conn, kind, entries)
+        self.maybe_snapshot(txn_id)
+        return txn_id
+
+    def deposit(self, client_id, amount):
+        return self.execute('deposit', client_id, amount)
+
+    def withdraw(self, client_id, amount):
+        return self.execute('withdraw', client_id, amount)
+
+    def transfer(self, from_id, to_id, amount):
+        return self.execute('transfer', from_id, to_id, amount)
+
+    # Проводки одной операции: сначала меняются остатки (списание — только
+    # при достаточном балансе), затем дописывается журнал. Вызывается внутри
+    # транзакции, так что при ошибке не остаётся ничего.
+    def post(self, conn, kind, entries, now=None):
+        now = time.time() if now is None else now
+        for client_id, amount in sorted(entries, key=lambda entry: entry[1]):
+            if client_id == CASH:
+                continue
+            if amount < 0:
+                updated = conn.execute('UPDATE clients SET balance = balance + ? WHERE id = ? AND balance >= ?',
+                                       (amount, client_id, -amount)).rowcount
+            else:
+                updated = conn.execute('UPDATE clients SET balance = balance + ? WHERE id = ?',
+                                       (amount, client_id)).rowcount
+            if not updated:
+                if conn.execute('SELECT 1 FROM clients WHERE id = ?', (client_id,)).fetchone() is None:
+                    raise UnknownClientError(client_id)
+                raise InsufficientFundsError(client_id)
+        txn_id = conn.execute('INSERT INTO ledger_transactions (kind, created_at) VALUES (?, ?)',
+                              (kind, now)).lastrowid
+        conn.executemany('INSERT INTO ledger_entries (txn_id, client_id, amount) VALUES (?, ?, ?)',
+                         [(txn_id, client_id, amount) for client_id, amount in entries])
+        # Та же операция в прежней таблице transactions, по строке на клиента
+        conn.executemany("INSERT INTO transactions (client_name, amount, type, client_id, created_at) "
+                         "SELECT name, ?, ?, id, ? FROM clients WHERE id = ?",
+                         [(abs(amount), 'deposit' if amount > 0 else 'withdraw', now, client_id)
+                          for client_id, amount in entries if client_id != CASH])
+        return txn_id
+
+    def history(self, client_id, after_id=0, limit=100):
+        with self.db.connection() as conn:
+            return conn.execute('SELECT e.id, e.txn_id, t.kind, e.amount, t.created_at '
+                                'FROM ledger_entries e JOIN ledger_transactions t ON t.id = e.txn_id '
+                                'WHERE e.client_id = ? AND e.id > ? ORDER BY e.id LIMIT ?',
+                                (client_id, after_id, limit)).fetchall()
+
+    # Снимок, если с операции after_id по txn_id пересечена граница snapshot_every
+    def maybe_snapshot(self, txn_id, after_id=None):
+        after_id = txn_id - 1 if after_id is None else after_id
+        if self.snapshot_every and txn_id // self.snapshot_every > after_id // self.snapshot_every:
+            self.snapshot()
+
+    def _latest_snapshot(self, conn):
+        row = conn.execute('SELECT id, last_entry_id FROM balance_snapshots ORDER BY id DESC LIMIT 1').fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    # Новый снимок = предыдущий снимок + проводки после него
+    def snapshot(self):
+        with self.db.transaction() as conn:
+            previous, after = self._latest_snapshot(conn)
+            last = conn.execute('SELECT COALESCE(MAX(id), 0) FROM ledger_entries').fetchone()[0]
+            if previous is not None and last == after:
+                return previous
+            snapshot_id = conn.execute('INSERT INTO balance_snapshots (last_entry_id, created_at) VALUES (?, ?)',
+                                       (last, time.time())).lastrowid
+            conn.execute(SNAPSHOT_SQL, (snapshot_id, previous, after, last))
+            old = conn.execute('SELECT id FROM balance_snapshots ORDER BY id DESC LIMIT -1 OFFSET ?',
+                               (self.keep_snapshots,)).fetchall()
+            if old:
+                conn.executemany('DELETE FROM snapshot_balances WHERE snapshot_id = ?', old)
+                conn.executemany('DELETE FROM balance_snapshots WHERE id = ?', old)
+        return snapshot_id
+
+    # Остатки по журналу: последний снимок плюс проводки после него
+    def journal_balances(self, conn=None):
+        if conn is None:
+            with self.db.connection() as conn:
+                return self.journal_balances(conn)
+        snapshot_id, after = self._latest_snapshot(conn)
+        balances = dict(conn.execute('SELECT client_id, balance FROM snapshot_balances WHERE snapshot_id = ?',
+                                     (snapshot_id,)))
+        for client_id, amount in conn.execute('SELECT client_id, SUM(amount) FROM ledger_entries '
+                                              'WHERE id > ? GROUP BY client_id', (after,)):
+            balances[client_id] = balances.get(client_id, 0) + amount
+        return balances
+
+    # После перезапуска: сверяет clients.balance с журналом и исправляет
+    # расхождения. Возвращает {client_id: (было, стало)}.
+    def recover(self):
+        with self.db.transaction() as conn:
+            balances = self.journal_balances(conn)
+            fixed = {}
+            for client_id, balance in conn.execute('SELECT id, balance FROM clients').fetchall():
+                expected = balances.get(client_id, 0)
+                if balance != expected:
+                    fixed[client_id] = (balance, expected)
+            conn.executemany('UPDATE clients SET balance = ? WHERE id = ?',
+                             [(expected, client_id) for client_id, (_, expected) in fixed.items()])
+        return fixed
+
+    # Операции, у которых проводки не сходятся в ноль (должно быть пусто)
+    def unbalanced(self):
+        with self.db.connection() as conn:
+            return conn.execute('SELECT txn_id, SUM(amount) FROM ledger_entries '
+                                'GROUP BY txn_id HAVING SUM(amount) != 0').fetchall()
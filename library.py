@@ -1,16 +1,20 @@
+import heapq
+import re
 import sqlite3
-conn = sqlite3.connect('library.db')
-cursor = conn.cursor()
-cursor.execute('''
+from datetime import date, timedelta
+
+from migrations import migrate
+
+MIGRATIONS = [
+(1, [
+'''
 CREATE TABLE IF NOT EXISTS authors (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 name TEXT,
 country TEXT
 )
-''')
-conn.commit()
-
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS books (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 title TEXT,
@@ -18,21 +22,15 @@ author_id INTEGER,
 year INTEGER,
 available BOOLEAN
 )
-''')
-
-conn.commit()
-
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS readers (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 name TEXT,
 phone — TEXT
 )
-''')
-
-conn.commit()
-
-cursor.execute('''
+''',
+'''
 CREATE TABLE IF NOT EXISTS borrows (
 id INTEGER PRIMARY KEY AUTOINCREMENT,
 book_id INTEGER,
@@ -41,13 +39,333 @@ date_borrowed TEXT,
 date_due TEXT,
 returned BOOLEAN
 )
-''')    
-conn.commit()
+''',
+]),
+# Выдачи: невозвращённые по сроку, по книге (одна открытая выдача на книгу)
+# и по читателю
+(2, [
+"UPDATE books SET available = 1 WHERE available IS NULL",
+"UPDATE borrows SET returned = 0 WHERE returned IS NULL",
+"CREATE INDEX IF NOT EXISTS borrows_returned_due ON borrows(returned, date_due)",
+"CREATE UNIQUE INDEX IF NOT EXISTS borrows_open_book ON borrows(book_id) WHERE returned = 0",
+"CREATE INDEX IF NOT EXISTS borrows_reader ON borrows(reader_id, returned)",
+]),
+(3, [
+"CREATE INDEX IF NOT EXISTS books_author ON books(author_id)",
+lambda conn: create_search_index(conn),
+]),
+]
+
+# Полнотекстовый поиск по названию книги, имени автора и стране. Индекс
+# books_search (FTS5, rowid = books.id) обновляют триггеры на books и
+# authors. Если SQLite собран без FTS5, индекса нет, и search() перебирает
+# books и authors подстрокой.
+SEARCH_INDEX_SQL = [
+'''
+CREATE VIRTUAL TABLE books_search USING fts5(
+    title, author, country,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3 4'
+)
+''',
+'''
+INSERT INTO books_search (rowid, title, author, country)
+SELECT b.id, b.title, a.name, a.country FROM books b LEFT JOIN authors a ON a.id = b.author_id
+''',
+'''
+CREATE TRIGGER books_search_insert AFTER INSERT ON books BEGIN
+    INSERT INTO books_search (rowid, title, author, country)
+    SELECT new.id, new.title, a.name, a.country FROM (SELECT 1) LEFT JOIN authors a ON a.id = new.author_id;
+END
+''',
+'''
+CREATE TRIGGER books_search_delete AFTER DELETE ON books BEGIN
+    DELETE FROM books_search WHERE rowid = old.id;
+END
+''',
+'''
+CREATE TRIGGER books_search_update AFTER UPDATE OF id, title, author_id ON books BEGIN
+    DELETE FROM books_search WHERE rowid = old.id;
+    INSERT INTO books_search (rowid, title, author, country)
+    SELECT new.id, new.title, a.name, a.country FROM (SELECT 1) LEFT JOIN authors a ON a.id = new.author_id;
+END
+''',
+'''
+CREATE TRIGGER authors_search_insert AFTER INSERT ON authors BEGIN
+    UPDATE books_search SET author = new.name, country = new.country
+    WHERE rowid IN (SELECT id FROM books WHERE author_id = new.id);
+END
+''',
+'''
+CREATE TRIGGER authors_search_update AFTER UPDATE OF id, name, country ON authors BEGIN
+    UPDATE books_search SET author = NULL, country = NULL
+    WHERE rowid IN (SELECT id FROM books WHERE author_id = old.id);
+    UPDATE books_search SET author = new.name, country = new.country
+    WHERE rowid IN (SELECT id FROM books WHERE author_id = new.id);
+END
+''',
+'''
+CREATE TRIGGER authors_search_delete AFTER DELETE ON authors BEGIN
+    UPDATE books_search SET author = NULL, country = NULL
+    WHERE rowid IN (SELECT id FROM books WHERE author_id = old.id);
+END
+''',
+]
+
+# Вес совпадения в названии, имени автора и стране задаётся в bm25(). Строки
+# лучших limit книг читаются по rowid без повторного MATCH: highlight()
+# потребовал бы MATCH на каждую строку, а для префикса это новый перебор
+# всех подходящих слов. Подсветка делается в Python (_highlight).
+SEARCH_SQL = '''
+SELECT s.rowid, s.title, s.author, s.country
+FROM (
+    SELECT id, score FROM (
+        SELECT rowid AS id, bm25(books_search, 10.0, 5.0, 1.0) AS score
+        FROM books_search WHERE books_search MATCH ?1 LIMIT ?3
+    ) ORDER BY score LIMIT ?2
+) top
+JOIN books_search s ON s.rowid = top.id
+ORDER BY top.score
+'''
+
+
+def has_fts5(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("DROP TABLE temp.fts5_probe")
+    return True
+
+
+def create_search_index(conn):
+    if not has_fts5(conn) or conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'books_search'").fetchone() is not None:
+        return False
+    for step in SEARCH_INDEX_SQL:
+        conn.execute(step)
+    return True
+
+LOAN_DAYS = 14
+REMIND_EVERY_DAYS = 3
+
+DB_FILE = 'library.db'
+
+_conn = None
+
+# Соединение с library.db открывается и мигрируется при первом обращении,
+# а не при импорте модуля.
+def get_conn():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_FILE)
+        migrate(_conn, MIGRATIONS)
+    return _conn
 
 def authors(name, country):
+    conn = get_conn()
+    cursor = conn.cursor()
     cursor.execute("INSERT INTO authors (name, country) VALUES (?, ?)", (name, country))
-def books(title, author_id, year, avilable):
-    cursor.execute("INSERT INTO books (title, author_id, year, available) VALUES (?, ?, ?, ?)", (title, author_id, year, avilable)
-               ('1984', 1, 1949, True)) 
-conn.commit()
-print('Книга добавлена')
\ No newline at end of file
+    conn.commit()
+    return cursor.lastrowid
+def books(title, author_id, year, avilable=True):
+    conn = get_conn()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO books (title, author_id, year, available) VALUES (?, ?, ?, ?)",
+                   (title, author_id, year, avilable))
+    conn.commit()
+    return cursor.lastrowid
+
+
+class BookNotAvailableError(Exception):
+    pass
+
+
+def _iso(day):
+    return day.isoformat() if isinstance(day, date) else date.fromisoformat(day).isoformat()
+
+
+def _terms(text):
+    return re.findall(r'\w+', text.lower())
+
+
+# Запрос FTS5 из слов пользователя: каждое слово в кавычках (никакого
+# синтаксиса FTS от пользователя), последнее — префиксом для автодополнения
+def _match_query(terms, prefix):
+    quoted = [f'"{term}"' for term in terms]
+    if prefix:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _highlight(text, terms, prefix, start='[', end=']'):
+    if not text:
+        return text
+    pattern = '|'.join(re.escape(term) + (r'\w*' if prefix and i == len(terms) - 1 else r'\b')
+                       for i, term in enumerate(terms))
+    return re.sub(rf'\b({pattern})', lambda m: start + m.group(0) + end, text, flags=re.IGNORECASE)
+
+
+# Сроки возврата открытых выдач в куче (date_due, borrow_id). Возвращённые
+# выдачи удаляются лениво: запись остаётся в куче, пока не всплывёт наверх.
+class DueHeap:
+    def __init__(self, rows=()):
+        self._due = dict(rows)
+        self._heap = [(due, borrow_id) for borrow_id, due in self._due.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._due)
+
+    def push(self, borrow_id, date_due):
+        self._due[borrow_id] = date_due
+        heapq.heappush(self._heap, (date_due, borrow_id))
+
+    def discard(self, borrow_id):
+        self._due.pop(borrow_id, None)
+
+    def _top(self):
+        heap = self._heap
+        while heap and self._due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    # Снимает с кучи выдачи со сроком раньше day
+    def pop_before(self, day):
+        result = []
+        top = self._top()
+        while top is not None and top[0] < day:
+            heapq.heappop(self._heap)
+            del self._due[top[1]]
+            result.append((top[1], top[0]))
+            top = self._top()
+        return result
+
+
+class Library:
+    def __init__(self, connection=None):
+        self.conn = connection or get_conn()
+        # Очередь напоминаний: срок следующего напоминания по каждой открытой
+        # выдаче. Живёт в памяти, после перезапуска строится заново по date_due.
+        self.reminders = DueHeap(self.conn.execute(
+            "SELECT id, date_due FROM borrows WHERE returned = 0"
+        ).fetchall())
+        self.fulltext = self._search_index()
+
+    # Миграция 3 не создаёт индекс, если SQLite тогда был собран без FTS5, —
+    # пробуем снова при каждом запуске. Таблица и её заполнение создаются
+    # одной транзакцией, так что недостроенного индекса не остаётся.
+    def _search_index(self):
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'books_search'").fetchone() is not None:
+            return True
+        with self.conn:
+            if not self.conn.in_transaction:
+                self.conn.execute('BEGIN IMMEDIATE')
+            return create_search_index(self.conn)
+
+    def add_reader(self, name, phone=None):
+        with self.conn:
+            return self.conn.execute('INSERT INTO readers (name, phone) VALUES (?, ?)', (name, phone)).lastrowid
+
+    def add_book(self, title, author_id=None, year=None):
+        with self.conn:
+            return self.conn.execute('INSERT INTO books (title, author_id, year, available) VALUES (?, ?, ?, 1)',
+                                     (title, author_id, year)).lastrowid
+
+    # Выдача одной транзакцией: книга помечается выданной, только если она
+    # была на месте, и тут же записывается выдача
+    def checkout(self, book_id, reader_id, days=LOAN_DAYS, today=None):
+        today = date.fromisoformat(_iso(today or date.today()))
+        date_due = (today + timedelta(days=days)).isoformat()
+        with self.conn:
+            taken = self.conn.execute("UPDATE books SET available = 0 WHERE id = ? AND available = 1",
+                                      (book_id,)).rowcount
+            if not taken:
+                if self.conn.execute("SELECT 1 FROM books WHERE id = ?", (book_id,)).fetchone() is None:
+                    raise ValueError(f"Книга {book_id} не найдена")
+                raise BookNotAvailableError(f"Книга {book_id} уже выдана")
+            if self.conn.execute("SELECT 1 FROM readers WHERE id = ?", (reader_id,)).fetchone() is None:
+                raise ValueError(f"Читатель {reader_id} не найден")
+            borrow_id = self.conn.execute(
+                "INSERT INTO borrows (book_id, reader_id, date_borrowed, date_due, returned) VALUES (?, ?, ?, ?, 0)",
+                (book_id, reader_id, today.isoformat(), date_due)
+            ).lastrowid
+        self.reminders.push(borrow_id, date_due)
+        return borrow_id
+
+    def return_book(self, book_id):
+        with self.conn:
+            row = self.conn.execute("UPDATE borrows SET returned = 1 WHERE book_id = ? AND returned = 0 RETURNING id",
+                                    (book_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Книга {book_id} сейчас не выдана")
+            self.conn.execute("UPDATE books SET available = 1 WHERE id = ?", (book_id,))
+        self.reminders.discard(row[0])
+        return row[0]
+
+    # Просроченные на day выдачи по индексу (returned, date_due): читается
+    # ровно столько строк, сколько выдач просрочено
+    def overdue(self, day=None, limit=None):
+        return self.conn.execute(
+            "SELECT b.id, b.book_id, k.title, b.reader_id, r.name, b.date_due "
+            "FROM borrows b JOIN books k ON k.id = b.book_id JOIN readers r ON r.id = b.reader_id "
+            "WHERE b.returned = 0 AND b.date_due < ? ORDER BY b.date_due LIMIT ?",
+            (_iso(day or date.today()), -1 if limit is None else limit)
+        ).fetchall()
+
+    # Книги по словам из названия, имени автора и страны, лучшие первыми.
+    # Строки: (id, название, автор, страна, название и автор с [подсветкой]).
+    # prefix=True ищет последнее слово как начало слова — для автодополнения.
+    # По умолчанию ранжируются все совпадения; max_candidates ограничивает
+    # их число первыми по индексу — для очень частых слов это держит время
+    # ответа в десятках миллисекунд ценой точности ранжирования.
+    def search(self, text, limit=20, prefix=True, max_candidates=None):
+        terms = _terms(text)
+        if not terms:
+            return []
+        if self.fulltext:
+            rows = self.conn.execute(SEARCH_SQL, (_match_query(terms, prefix), limit,
+                                                  -1 if max_candidates is None else max_candidates)).fetchall()
+        else:
+            rows = self._search_like(terms, limit)
+        return [(book_id, title, author, country,
+                 _highlight(title, terms, prefix), _highlight(author, terms, prefix))
+                for book_id, title, author, country in rows]
+
+    # Без FTS5: каждое слово должно встретиться в названии, авторе или стране;
+    # совпадения в названии выше. Регистр сравнивается через Python, потому
+    # что встроенные LIKE и lower() в SQLite понимают только латиницу.
+    def _search_like(self, terms, limit):
+        self.conn.create_function('lower_text', 1, lambda text: text.lower() if text else text, deterministic=True)
+        contains = "instr(lower_text({}), ?) > 0"
+        where = ' AND '.join(f"({contains.format('b.title')} OR {contains.format('a.name')} OR "
+                             f"{contains.format('a.country')})" for _ in terms)
+        title_hits = ' + '.join(f"({contains.format('b.title')})" for _ in terms)
+        params = [term for term in terms for _ in range(3)] + terms
+        return self.conn.execute(
+            "SELECT b.id, b.title, a.name, a.country FROM books b LEFT JOIN authors a ON a.id = b.author_id "
+            f"WHERE {where} ORDER BY {title_hits} DESC, b.id LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+
+    # Пакет напоминаний: снимает с кучи выдачи, которым пора напомнить,
+    # вызывает remind(borrow_id, date_due) и ставит следующее напоминание
+    # через every_days. Работа пропорциональна числу напоминаний.
+    def send_reminders(self, remind, day=None, every_days=REMIND_EVERY_DAYS):
+        day = date.fromisoformat(_iso(day or date.today()))
+        next_time = (day + timedelta(days=every_days)).isoformat()
+        sent = 0
+        for borrow_id, _ in self.reminders.pop_before(day.isoformat()):
+            row = self.conn.execute("SELECT date_due FROM borrows WHERE id = ? AND returned = 0",
+                                    (borrow_id,)).fetchone()
+            if row is None:
+                continue
+            remind(borrow_id, row[0])
+            self.reminders.push(borrow_id, next_time)
+            sent += 1
+        return sent
+
+
+if __name__ == "__main__":
+    books('1984', 1, 1949, True)
+    print('Книга добавлена')
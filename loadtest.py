@@ -0,0 +1,106 @@
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from arscode import DatabaseManager
+from auth import hash_password
+from webapp import create_app
+
+# Локальный нагрузочный тест HTTP API: поднимает встроенный сервер Werkzeug
+# на временной базе и гоняет клиентов по сценарию «каталог, корзина, заказ».
+# Печатает запросы в секунду и задержки p50/p99 по каждому маршруту.
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+class Client:
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port)
+        self.cookie = None
+        self.etags = {}
+
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        if method == 'GET' and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        started = time.perf_counter()
+        self.conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = self.conn.getresponse()
+        response.read()
+        elapsed = time.perf_counter() - started
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        if response.getheader('ETag'):
+            self.etags[path] = response.getheader('ETag')
+        return response.status, elapsed
+
+
+def run(clients=8, rounds=100, products=1000):
+    path = os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+    db = DatabaseManager(path, pool_size=clients)
+    with db.transaction() as conn:
+        conn.executemany('INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                         [(f'Шоколад {i}', 'chocolate', 10.0, 10 ** 6) for i in range(products)])
+        password = hash_password('secret')
+        conn.executemany("INSERT INTO users (name, email, password, balance, role) VALUES (?, ?, ?, ?, 'client')",
+                         [(f'user{i}', f'user{i}@example.com', password, 1e9) for i in range(clients)])
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, create_app(db), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    timings = {}
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(n):
+        client = Client(port)
+        log = []
+        log.append(('login', client.request('POST', '/api/login',
+                                            {'email': f'user{n}@example.com', 'password': 'secret'})))
+        for i in range(rounds):
+            after_id = (i * 20) % products
+            log.append(('products', client.request('GET', f'/api/products?after_id={after_id}&limit=20')))
+            log.append(('product', client.request('GET', f'/api/products/{after_id + 1}')))
+            log.append(('cart', client.request('POST', '/api/cart', {'product_id': after_id + 1, 'quantity': 2})))
+            if i % 5 == 4:
+                log.append(('checkout', client.request('POST', '/api/checkout', {})))
+        with lock:
+            for route, (status, elapsed) in log:
+                timings.setdefault(route, []).append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    total = sum(len(v) for v in timings.values())
+    print(f"клиентов: {clients}, запросов: {total} за {elapsed:.2f} с — {total / elapsed:.0f} запросов/с")
+    print(f"коды ответов: {statuses}")
+    everything = [t for v in timings.values() for t in v]
+    for route, values in sorted(timings.items()) + [('все', everything)]:
+        print(f"  {route:10} n={len(values):6}  p50 {percentile(values, 0.5) * 1000:7.2f} мс"
+              f"  p99 {percentile(values, 0.99) * 1000:7.2f} мс")
+
+
+if __name__ == "__main__":
+    run(*(int(x) for x in sys.argv[1:]))
@@ -0,0 +1,56 @@
+import sqlite3
+
+# Версионированные миграции для всех *.db приложений.
+# Миграции задаются списком (версия, [шаг, ...]) по возрастанию версий;
+# шаг — строка SQL или функция, принимающая соединение.
+# migrate() применяет все недостающие версии одной транзакцией и записывает
+# номер в schema_version. Если база уже свежая, он только читает версию.
+
+
+def current_version(conn):
+    try:
+        row = conn.execute('SELECT version FROM schema_version WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def migrate(conn, migrations):
+    latest = migrations[-1][0] if migrations else 0
+    version = current_version(conn)
+    if version >= latest:
+        return version
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Другой процесс мог применить миграции, пока мы ждали блокировку
+            version = current_version(conn)
+            if version < latest:
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL,
+                    applied_at TEXT
+                )
+                ''')
+                for number, steps in migrations:
+                    if number <= version:
+                        continue
+                    for step in steps:
+                        if callable(step):
+                            step(conn)
+                        else:
+                            conn.execute(step)
+                conn.execute("INSERT OR REPLACE INTO schema_version (id, version, applied_at) VALUES (1, ?, datetime('now'))",
+                             (latest,))
+                version = latest
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.isolation_level = isolation_level
+    return version
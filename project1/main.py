@@ -35,9 +35,9 @@ conn.commit()
 
 cursor.execute('''
 CREATE TABLE IF NOT EXISTS books (
-ids INTEGER PRIMARY KEY AUTOINCREMENT,
+id INTEGER PRIMARY KEY AUTOINCREMENT,
 title TEXT,
-author_id INTEGER PRIMARY KEY AUTOINCREMENT,
+author_id INTEGER,
 year INTEGER,
 available BOOLEAN 
 )
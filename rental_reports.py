@@ -0,0 +1,86 @@
+# Отчёты по арендам rental.db. История читается страницами по rents.id с
+# JOIN на cars по первичному ключу; сводки по машинам и клиентам берутся из
+# таблиц car_stats и customer_stats, которые триггеры обновляют при каждой
+# записи в rents (миграция 4 в carprogramm.py).
+
+PAGE_SIZE = 500
+
+HISTORY_SQL = '''
+SELECT r.id, r.customer_name, c.brand, c.model, r.start_date, r.end_date, r.days, r.total_price
+FROM rents r
+JOIN cars c ON c.id = r.car_id
+WHERE r.id > ? {where}
+ORDER BY r.id
+LIMIT ?
+'''
+
+# Загрузка машины: доля дней в аренде между первой и последней арендой
+CAR_STATS_SQL = '''
+SELECT c.id, c.brand, c.model, s.rents, s.rented_days, s.revenue,
+       ROUND(100.0 * s.rented_days / MAX(julianday(s.last_end) - julianday(s.first_start), 1), 1) AS utilization
+FROM car_stats s
+JOIN cars c ON c.id = s.car_id
+'''
+
+FLEET_SQL = CAR_STATS_SQL + '''
+WHERE s.rents > 0
+ORDER BY s.revenue DESC
+LIMIT ?
+'''
+
+CUSTOMERS_SQL = '''
+SELECT customer_name, rents, rented_days, total_spent
+FROM customer_stats
+WHERE rents > 0
+ORDER BY total_spent DESC
+LIMIT ?
+'''
+
+
+def iter_rent_history(conn, car_id=None, customer_name=None, after_id=0, page_size=PAGE_SIZE):
+    where, params = '', []
+    if car_id is not None:
+        where += ' AND r.car_id = ?'
+        params.append(car_id)
+    if customer_name is not None:
+        where += ' AND r.customer_name = ?'
+        params.append(customer_name)
+    query = HISTORY_SQL.format(where=where)
+    while True:
+        rows = conn.execute(query, (after_id, *params, page_size)).fetchall()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1][0]
+
+
+def fleet_dashboard(conn, limit=20):
+    return conn.execute(FLEET_SQL, (limit,)).fetchall()
+
+
+def car_summary(conn, car_id):
+    return conn.execute(CAR_STATS_SQL + 'WHERE s.car_id = ?', (car_id,)).fetchone()
+
+
+def top_customers(conn, limit=20):
+    return conn.execute(CUSTOMERS_SQL, (limit,)).fetchall()
+
+
+def customer_summary(conn, customer_name):
+    return conn.execute('SELECT customer_name, rents, rented_days, total_spent FROM customer_stats '
+                        'WHERE customer_name = ?', (customer_name,)).fetchone()
+
+
+def print_dashboard(conn, limit=20):
+    print("=== Машины по выручке ===")
+    for car in fleet_dashboard(conn, limit):
+        print(f"{car[0]} | {car[1]} {car[2]} | аренд: {car[3]} | дней: {car[4]:.0f} | "
+              f"выручка: {car[5]:.2f} | загрузка: {car[6]}%")
+    print("\n=== Клиенты по сумме аренд ===")
+    for customer in top_customers(conn, limit):
+        print(f"{customer[0]} | аренд: {customer[1]} | дней: {customer[2]:.0f} | сумма: {customer[3]:.2f}")
+
+
+if __name__ == "__main__":
+    from carprogramm import get_conn
+    print_dashboard(get_conn())
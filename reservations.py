@@ -0,0 +1,93 @@
+import random
+import threading
+import time
+
+from arscode import OutOfStockError, ReservationConflictError, checkout, get_db, release_expired_holds
+
+# Временные резервы товара. Резерв сразу списывает quantity у товара
+# (сравнение с products.version, при конфликте — повтор с паузой) и живёт
+# ttl секунд: confirm() оформляет по резерву заказ через checkout(), который
+# снимает резерв в своей транзакции, release() возвращает товар на склад.
+# holder — id покупателя: подтвердить резерв может только он.
+# Просроченные резервы возвращаются release_expired(), а также сами — при
+# нехватке товара в hold() и при оформлении заказа на этот товар.
+
+
+class StockReservations:
+    def __init__(self, db=None, ttl=900.0, max_retries=50):
+        self.db = db or get_db()
+        self.ttl = ttl
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self.stats = {'holds': 0, 'attempts': 0, 'conflicts': 0, 'expired': 0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def hold(self, product_id, quantity, holder=None, ttl=None):
+        if quantity <= 0:
+            raise ValueError(f"Некорректное количество: {quantity}")
+        ttl = self.ttl if ttl is None else ttl
+        swept = False
+        with self.db.connection() as conn:
+            for attempt in range(self.max_retries):
+                self._count('attempts')
+                row = conn.execute('SELECT quantity, version FROM products WHERE id = ?', (product_id,)).fetchone()
+                if row is None:
+                    raise ValueError(f"Товар {product_id} не найден")
+                if row['quantity'] < quantity:
+                    # Сначала вернём на склад просроченные резервы, потом сдадимся
+                    if not swept and self.release_expired(product_id=product_id):
+                        swept = True
+                        continue
+                    raise OutOfStockError(f"Товара {product_id} осталось {row['quantity']}, нужно {quantity}")
+
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    updated = conn.execute('UPDATE products SET quantity = quantity - ?, version = version + 1 '
+                                           'WHERE id = ? AND version = ? AND quantity >= ?',
+                                           (quantity, product_id, row['version'], quantity)).rowcount
+                    hold_id = None
+                    if updated:
+                        hold_id = conn.execute('INSERT INTO stock_holds (product_id, quantity, holder, expires_at) '
+                                               'VALUES (?, ?, ?, ?)',
+                                               (product_id, quantity, None if holder is None else str(holder),
+                                                time.time() + ttl)).lastrowid
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                if hold_id is not None:
+                    self._count('holds')
+                    return hold_id
+
+                self._count('conflicts')
+                time.sleep(random.uniform(0, 0.001 * min(2 ** attempt, 64)))
+        raise ReservationConflictError(f"Не удалось зарезервировать товар {product_id} за {self.max_retries} попыток")
+
+    # Оформляет заказ user_id на зарезервированный товар; возвращает заказ
+    # checkout(). Истёкший или чужой резерв — ReservationConflictError.
+    def confirm(self, hold_id, user_id, coupon_code=None):
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT product_id, quantity FROM stock_holds WHERE id = ? AND holder = ?',
+                               (hold_id, str(user_id))).fetchone()
+        if row is None:
+            raise ReservationConflictError(f"Резерв {hold_id} истёк или не найден")
+        return checkout(user_id, {row['product_id']: row['quantity']}, coupon_code, self.db, hold_ids=(hold_id,))
+
+    def release(self, hold_id):
+        with self.db.transaction() as conn:
+            row = conn.execute('DELETE FROM stock_holds WHERE id = ? RETURNING product_id, quantity',
+                               (hold_id,)).fetchone()
+            if row is None:
+                return 0
+            conn.execute('UPDATE products SET quantity = quantity + ?, version = version + 1 WHERE id = ?',
+                         (row['quantity'], row['product_id']))
+        return row['quantity']
+
+    def release_expired(self, now=None, product_id=None):
+        with self.db.transaction() as conn:
+            count = release_expired_holds(conn, now, None if product_id is None else (product_id,))
+        self._count('expired', count)
+        return count
@@ -0,0 +1,326 @@
+import sqlite3
+import time
+from collections import OrderedDict
+from itertools import groupby
+
+from migrations import migrate
+
+# Ученики school.db (BD.py, без класса) и school_v2.db (BD2.py, основная).
+# Массовые изменения school_v2.db идут одной транзакцией:
+# пары (ключ, изменения) загружаются во временную таблицу, и все строки
+# меняются одним UPDATE ... FROM (или DELETE ... IN) по индексу ключа,
+# вместо отдельного UPDATE на каждое имя. Условие key IN (SELECT k ...)
+# заставляет планировщик идти от временной таблицы к индексу, а не
+# просматривать всю students. UPDATE ... FROM требует SQLite 3.33+.
+# StudentRepository читает обе базы как одну (см. ниже).
+
+LEGACY_MIGRATIONS = [
+(1, [
+'''
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    age INTEGER,
+    email TEXT
+)
+''',
+]),
+# Сведение с school_v2.db по email
+(2, [
+'CREATE INDEX IF NOT EXISTS students_email ON students(email)',
+]),
+]
+
+MIGRATIONS = [
+(1, [
+'''
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    age INTEGER,
+    email TEXT,
+    grade INTEGER
+)
+''',
+'''
+INSERT INTO students (name, age, email, grade)
+SELECT 'Айгуль', 15, 'aigul@example.com', 9
+WHERE NOT EXISTS (SELECT 1 FROM students WHERE email = 'aigul@example.com')
+''',
+]),
+# Поиск по имени для массовых изменений, фильтры по классу и возрасту
+(2, [
+'CREATE INDEX IF NOT EXISTS students_name ON students(name)',
+'CREATE INDEX IF NOT EXISTS students_grade ON students(grade)',
+'CREATE INDEX IF NOT EXISTS students_age ON students(age)',
+]),
+# Сведение с school.db: поиск по email и докуда перенесены её строки
+(3, [
+'CREATE INDEX IF NOT EXISTS students_email ON students(email)',
+'''
+CREATE TABLE IF NOT EXISTS student_backfill (
+    source TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0
+)
+''',
+]),
+]
+
+DB_FILE = 'school_v2.db'
+LEGACY_FILE = 'school.db'
+KEYS = ('id', 'name', 'email')
+COLUMNS = ('name', 'age', 'email', 'grade')
+
+
+def connect(db_file=DB_FILE):
+    conn = sqlite3.connect(db_file)
+    migrate(conn, MIGRATIONS)
+    return conn
+
+
+def _check(key, columns=()):
+    if key not in KEYS:
+        raise ValueError(f"ключ {key!r} не из {KEYS}")
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"неизвестные столбцы: {sorted(unknown)}")
+
+
+class Students:
+    def __init__(self, connection=None):
+        self.conn = connection or connect()
+
+    def _report(self, started, **rows):
+        return dict(rows, seconds=time.perf_counter() - started)
+
+    # pairs — пары (значение ключа, {столбец: новое значение}). Ключ name
+    # меняет всех учеников с этим именем, как UPDATE ... WHERE name = ?.
+    # Если ключ повторяется, действует последняя пара. Возвращает
+    # {'rows': изменено строк, 'seconds': время}.
+    def update_many(self, pairs, key='name'):
+        started = time.perf_counter()
+        latest = {}
+        for value, changes in pairs:
+            _check(key, changes)
+            if changes:
+                latest[value] = changes
+        by_columns = sorted(latest.items(), key=lambda pair: sorted(pair[1]))
+        rows = 0
+        with self.conn:
+            for columns, group in groupby(by_columns, key=lambda pair: sorted(pair[1])):
+                self.conn.execute('DROP TABLE IF EXISTS temp.bulk_changes')
+                self.conn.execute(f"CREATE TEMP TABLE bulk_changes (k PRIMARY KEY, {', '.join(columns)})")
+                self.conn.executemany(
+                    f"INSERT INTO temp.bulk_changes VALUES (?{', ?' * len(columns)})",
+                    ((value, *(changes[column] for column in columns)) for value, changes in group))
+                rows += self.conn.execute(
+                    f"UPDATE students SET {', '.join(f'{column} = c.{column}' for column in columns)} "
+                    f"FROM temp.bulk_changes c "
+                    f"WHERE students.{key} IN (SELECT k FROM temp.bulk_changes) AND students.{key} = c.k").rowcount
+            self.conn.execute('DROP TABLE IF EXISTS temp.bulk_changes')
+        return self._report(started, rows=rows)
+
+    # Удаляет учеников со значениями ключа из keys. {'rows', 'seconds'}
+    def delete_many(self, keys, key='name'):
+        _check(key)
+        started = time.perf_counter()
+        with self.conn:
+            self.conn.execute('DROP TABLE IF EXISTS temp.bulk_keys')
+            self.conn.execute('CREATE TEMP TABLE bulk_keys (k PRIMARY KEY)')
+            self.conn.executemany('INSERT OR IGNORE INTO temp.bulk_keys VALUES (?)', ((value,) for value in keys))
+            rows = self.conn.execute(f'DELETE FROM students WHERE {key} IN (SELECT k FROM temp.bulk_keys)').rowcount
+            self.conn.execute('DROP TABLE temp.bulk_keys')
+        return self._report(started, rows=rows)
+
+    # Переход в новый учебный год: возраст + years и, если задан
+    # drop_below, удаление тех, кто всё ещё младше — одной транзакцией.
+    # {'updated', 'deleted', 'seconds'}
+    def advance_year(self, years=1, drop_below=None):
+        started = time.perf_counter()
+        deleted = 0
+        with self.conn:
+            updated = self.conn.execute('UPDATE students SET age = age + ? WHERE age IS NOT NULL', (years,)).rowcount
+            if drop_below is not None:
+                deleted = self.conn.execute('DELETE FROM students WHERE age < ?', (drop_below,)).rowcount
+        return self._report(started, updated=updated, deleted=deleted)
+
+
+# Объединённый список: строки school_v2.db и те строки school.db, которых
+# нет в school_v2.db. Ученик с одним email считается одним: school_v2.db
+# главнее school.db, внутри одной базы — более поздняя запись. Строки
+# school.db, уже перенесённые backfill(), скрыты целиком.
+MERGED_SQL = {
+'school_v2': '''
+SELECT 'school_v2' AS source, s.id, s.name, s.age, s.email, s.grade
+FROM main.students s
+WHERE s.email IS NULL OR NOT EXISTS (SELECT 1 FROM main.students d WHERE d.email = s.email AND d.id > s.id)
+''',
+'school': '''
+SELECT 'school' AS source, l.id, l.name, l.age, l.email, NULL AS grade
+FROM legacy.students l
+WHERE l.id > COALESCE((SELECT last_id FROM main.student_backfill WHERE source = 'school'), 0)
+    AND (l.email IS NULL OR (
+        NOT EXISTS (SELECT 1 FROM main.students s WHERE s.email = l.email)
+        AND NOT EXISTS (SELECT 1 FROM legacy.students d WHERE d.email = l.email AND d.id > l.id)))
+''',
+}
+
+MERGED_VIEW_SQL = 'CREATE TEMP VIEW IF NOT EXISTS merged_students AS ' + 'UNION ALL'.join(MERGED_SQL.values())
+
+BACKFILL_SQL = '''
+INSERT INTO main.students (name, age, email, grade)
+SELECT l.name, l.age, l.email, NULL
+FROM legacy.students l
+WHERE l.id BETWEEN ? AND ?
+    AND (l.email IS NULL OR (
+        NOT EXISTS (SELECT 1 FROM main.students s WHERE s.email = l.email)
+        AND NOT EXISTS (SELECT 1 FROM legacy.students d WHERE d.email = l.email AND d.id > l.id)))
+ORDER BY l.id
+'''
+
+SOURCES = ('school_v2', 'school')
+
+
+# Одно соединение с school_v2.db, к которому через ATTACH подключена
+# school.db как legacy. Читает объединённый список (строки: источник, id,
+# имя, возраст, email, класс), пишет только в school_v2.db. Поиск по id и
+# email кэшируется (LRU на cache_size записей); кэш сбрасывается при записи
+# через репозиторий и когда другое соединение изменило любую из баз — это
+# видно по PRAGMA data_version без обращения к таблицам.
+class StudentRepository(Students):
+    def __init__(self, db_file=DB_FILE, legacy_file=LEGACY_FILE, cache_size=4096):
+        legacy = sqlite3.connect(legacy_file)
+        try:
+            migrate(legacy, LEGACY_MIGRATIONS)
+        finally:
+            legacy.close()
+        super().__init__(connect(db_file))
+        self.conn.execute('ATTACH DATABASE ? AS legacy', (legacy_file,))
+        self.conn.execute(MERGED_VIEW_SQL)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._versions = None
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def close(self):
+        self.conn.close()
+
+    def invalidate(self):
+        self._cache.clear()
+        self.stats['invalidations'] += 1
+
+    def _cached(self, key, load):
+        versions = (self.conn.execute('PRAGMA main.data_version').fetchone()[0],
+                    self.conn.execute('PRAGMA legacy.data_version').fetchone()[0])
+        if versions != self._versions:
+            if self._versions is not None:
+                self.invalidate()
+            self._versions = versions
+        try:
+            row = self._cache[key]
+        except KeyError:
+            self.stats['misses'] += 1
+            row = self._cache[key] = load()
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return row
+        self.stats['hits'] += 1
+        self._cache.move_to_end(key)
+        return row
+
+    # Ученик по id в базе source ('school_v2' или 'school'), даже если в
+    # объединённом списке его заслоняет запись с тем же email
+    def get(self, student_id, source='school_v2'):
+        if source not in SOURCES:
+            raise ValueError(f"источник {source!r} не из {SOURCES}")
+        schema, grade = ('main', 'grade') if source == 'school_v2' else ('legacy', 'NULL')
+        return self._cached(('id', source, student_id), lambda: self.conn.execute(
+            f"SELECT ?, id, name, age, email, {grade} FROM {schema}.students WHERE id = ?",
+            (source, student_id)).fetchone())
+
+    # Главная запись ученика с этим email по тем же правилам, что и merged_students
+    def get_by_email(self, email):
+        return self._cached(('email', email), lambda: self.conn.execute(
+            "SELECT source, id, name, age, email, grade FROM merged_students WHERE email = ?", (email,)).fetchone())
+
+    def _where(self, grade, age_above, age_below, name):
+        conditions, params = [], []
+        for condition, value in (('grade = ?', grade), ('age > ?', age_above), ('age < ?', age_below),
+                                 ('name = ?', name)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    # Объединённый список с фильтрами, school_v2.db первой, внутри — по id.
+    # after — последняя строка предыдущей страницы (или её первые два поля:
+    # источник и id). Каждый источник читается своим запросом по первичному
+    # ключу (id > ? ORDER BY id LIMIT ?), так что страница стоит limit строк,
+    # а не сортировку всего списка.
+    def find(self, grade=None, age_above=None, age_below=None, name=None, after=None, limit=None):
+        start, last_id = (SOURCES[0], 0) if after is None else (after[0], after[1])
+        if start not in SOURCES:
+            raise ValueError(f"источник {start!r} не из {SOURCES}")
+        rows = []
+        for source in SOURCES[SOURCES.index(start):]:
+            if limit is not None and len(rows) >= limit:
+                break
+            # в school.db нет классов: при фильтре по классу её строки не подходят
+            if source == 'school' and grade is not None:
+                continue
+            where, params = self._where(grade, age_above, age_below, name)
+            where += (' AND ' if where else ' WHERE ') + 'id > ?'
+            params += [last_id if source == start else 0, -1 if limit is None else limit - len(rows)]
+            rows += self.conn.execute(f"SELECT * FROM ({MERGED_SQL[source]}){where} ORDER BY id LIMIT ?",
+                                      params).fetchall()
+        return rows
+
+    def count(self, grade=None, age_above=None, age_below=None, name=None):
+        where, params = self._where(grade, age_above, age_below, name)
+        return self.conn.execute(f"SELECT COUNT(*) FROM merged_students{where}", params).fetchone()[0]
+
+    # Переносит строки school.db, которых нет в school_v2.db, пачками по
+    # chunk_size: каждая пачка — одна транзакция вместе с отметкой в
+    # student_backfill, так что прерванный перенос продолжается с места
+    # остановки. {'read', 'written', 'seconds', 'rows_per_second'}
+    def backfill(self, chunk_size=5000):
+        started = time.perf_counter()
+        report = {'read': 0, 'written': 0}
+        row = self.conn.execute("SELECT last_id FROM student_backfill WHERE source = 'school'").fetchone()
+        last_id = row[0] if row else 0
+        try:
+            while True:
+                with self.conn:
+                    hi, count = self.conn.execute(
+                        "SELECT MAX(id), COUNT(*) FROM (SELECT id FROM legacy.students WHERE id > ? ORDER BY id LIMIT ?)",
+                        (last_id, chunk_size)).fetchone()
+                    if not count:
+                        break
+                    report['written'] += self.conn.execute(BACKFILL_SQL, (last_id + 1, hi)).rowcount
+                    self.conn.execute("INSERT INTO student_backfill (source, last_id) VALUES ('school', ?) "
+                                      "ON CONFLICT(source) DO UPDATE SET last_id = excluded.last_id", (hi,))
+                report['read'] += count
+                last_id = hi
+        finally:
+            self.invalidate()
+        report['seconds'] = time.perf_counter() - started
+        report['rows_per_second'] = report['read'] / report['seconds'] if report['seconds'] else 0.0
+        return report
+
+    def update_many(self, pairs, key='name'):
+        try:
+            return super().update_many(pairs, key)
+        finally:
+            self.invalidate()
+
+    def delete_many(self, keys, key='name'):
+        try:
+            return super().delete_many(keys, key)
+        finally:
+            self.invalidate()
+
+    def advance_year(self, years=1, drop_below=None):
+        try:
+            return super().advance_year(years, drop_below)
+        finally:
+            self.invalidate()
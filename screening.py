@@ -0,0 +1,210 @@
+import sqlite3
+import sys
+import time
+from array import array
+from collections import deque
+
+# Потоковая проверка списаний на подозрительную частоту. У каждого счёта три
+# скользящих окна (минута, час, сутки), каждое — кольцевой буфер корзин с
+# суммой и числом списаний, плюс минутное окно отказов из-за нехватки денег.
+# Память на счёт постоянная, событие обновляет текущую корзину и обнуляет
+# только устаревшие, поэтому проверка стоит порядка десяти микросекунд.
+# Подключение: Bank(name, screener=Screener()); replay: python screening.py [bank.db]
+
+# окно: (длина в секундах, число корзин)
+WINDOWS = {
+    'minute': (60, 60),
+    'hour': (3600, 60),
+    'day': (86400, 24),
+}
+
+# окно: (макс. число списаний, макс. сумма); None — без ограничения
+DEFAULT_LIMITS = {
+    'minute': (5, None),
+    'hour': (20, 50_000),
+    'day': (50, 200_000),
+}
+
+DECLINED_WINDOW = (60, 6)
+DEFAULT_MAX_DECLINED = 3
+
+
+class SuspiciousTransactionError(Exception):
+    pass
+
+
+_ZEROS = {}
+
+
+def _zeros(size):
+    zeros = _ZEROS.get(size)
+    if zeros is None:
+        zeros = _ZEROS[size] = (array('d', [0.0]) * size, array('q', [0]) * size)
+    return zeros
+
+
+class RollingWindow:
+    __slots__ = ('width', 'size', 'head', 'sums', 'counts', 'total', 'count')
+
+    def __init__(self, span, buckets):
+        self.width = span / buckets
+        self.size = buckets
+        self.head = None
+        zero_sums, zero_counts = _zeros(buckets)
+        self.sums = array('d', zero_sums)
+        self.counts = array('q', zero_counts)
+        self.total = 0.0
+        self.count = 0
+
+    # Сдвигает окно к slot, обнуляя корзины, вышедшие за его пределы
+    def _advance(self, slot):
+        head = self.head
+        if head is None or slot - head >= self.size:
+            # Окно устарело целиком: новые корзины вместо обнуления по одной
+            if head is not None and self.count:
+                zero_sums, zero_counts = _zeros(self.size)
+                self.sums[:] = zero_sums
+                self.counts[:] = zero_counts
+                self.total, self.count = 0.0, 0
+            self.head = slot
+            return
+        for s in range(max(head + 1, slot - self.size + 1), slot + 1):
+            i = s % self.size
+            self.total -= self.sums[i]
+            self.count -= self.counts[i]
+            self.sums[i] = 0.0
+            self.counts[i] = 0
+        self.head = slot
+
+    def add(self, t, amount):
+        slot = int(t // self.width)
+        if self.head is None or slot > self.head:
+            self._advance(slot)
+        elif slot <= self.head - self.size:
+            return False  # событие старше окна
+        i = slot % self.size
+        self.sums[i] += amount
+        self.counts[i] += 1
+        self.total += amount
+        self.count += 1
+        return True
+
+    # Сумма и число событий в окне, заканчивающемся в момент t
+    def totals(self, t):
+        slot = int(t // self.width)
+        if self.head is not None and slot > self.head:
+            self._advance(slot)
+        return self.total, self.count
+
+
+class AccountActivity:
+    __slots__ = ('windows', 'declined')
+
+    def __init__(self):
+        self.windows = {name: RollingWindow(span, buckets) for name, (span, buckets) in WINDOWS.items()}
+        self.declined = RollingWindow(*DECLINED_WINDOW)
+
+
+class Screener:
+    def __init__(self, limits=None, max_declined=DEFAULT_MAX_DECLINED, block=False, on_alert=None,
+                 keep_alerts=1000, clock=time.time):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_declined = max_declined
+        self.block = block
+        self.on_alert = on_alert
+        self.clock = clock
+        self.alerts = deque(maxlen=keep_alerts)
+        self.accounts = {}
+        self.stats = {'events': 0, 'declined': 0, 'alerts': 0}
+
+    def activity(self, account):
+        activity = self.accounts.get(account)
+        if activity is None:
+            activity = self.accounts[account] = AccountActivity()
+        return activity
+
+    # Списание со счёта account. Возвращает список сработавших правил:
+    # (счёт, окно, 'count' или 'sum', значение, лимит, момент, вид операции).
+    # Лимиты проверяются до записи: при block=True отклонённое списание в
+    # окна не попадает и не съедает лимит последующих.
+    def observe(self, account, amount, t=None, kind='withdraw'):
+        t = self.clock() if t is None else t
+        windows = self.activity(account).windows
+        self.stats['events'] += 1
+        alerts = []
+        for name, (max_count, max_sum) in self.limits.items():
+            total, count = windows[name].totals(t)
+            total, count = total + amount, count + 1
+            if max_count is not None and count > max_count:
+                alerts.append((account, name, 'count', count, max_count, t, kind))
+            if max_sum is not None and total > max_sum:
+                alerts.append((account, name, 'sum', total, max_sum, t, kind))
+        if alerts and self.block:
+            self._flag(alerts)
+        for name in self.limits:
+            windows[name].add(t, amount)
+        if alerts:
+            self._flag(alerts)
+        return alerts
+
+    # Отказ из-за нехватки денег: частые попытки уйти в минус тоже сигнал
+    def observe_declined(self, account, amount, t=None):
+        t = self.clock() if t is None else t
+        window = self.activity(account).declined
+        window.add(t, amount)
+        self.stats['declined'] += 1
+        if self.max_declined is not None and window.count > self.max_declined:
+            alerts = [(account, 'declined', 'count', window.count, self.max_declined, t, 'declined')]
+            self._flag(alerts)
+            return alerts
+        return []
+
+    def _flag(self, alerts):
+        self.stats['alerts'] += len(alerts)
+        self.alerts.extend(alerts)
+        if self.on_alert is not None:
+            for alert in alerts:
+                self.on_alert(alert)
+        if self.block:
+            raise SuspiciousTransactionError(alerts)
+
+    def totals(self, account, t=None):
+        t = self.clock() if t is None else t
+        activity = self.accounts.get(account)
+        if activity is None:
+            return {name: (0.0, 0) for name in WINDOWS}
+        return {name: window.totals(t) for name, window in activity.windows.items()}
+
+
+# Прогон журнала transactions bank.db через Screener по порядку id.
+# У строк до появления created_at берётся время предыдущей строки.
+def replay(conn, screener=None, after_id=0, page_size=5000):
+    screener = screener or Screener()
+    alerts, t = [], 0.0
+    while True:
+        rows = conn.execute('SELECT id, COALESCE(client_id, client_name), amount, type, created_at '
+                            'FROM transactions WHERE id > ? ORDER BY id LIMIT ?', (after_id, page_size)).fetchall()
+        for row_id, account, amount, kind, created_at in rows:
+            t = created_at if created_at is not None else t
+            if kind == 'withdraw':
+                alerts.extend(screener.observe(account, amount or 0, t))
+        if len(rows) < page_size:
+            return screener, alerts
+        after_id = rows[-1][0]
+
+
+if __name__ == "__main__":
+    from ledger import MIGRATIONS
+    from migrations import migrate
+
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else 'bank.db')
+    migrate(conn, MIGRATIONS)
+    started = time.perf_counter()
+    screener, alerts = replay(conn)
+    elapsed = time.perf_counter() - started
+    events = screener.stats['events']
+    print(f"{events} списаний за {elapsed:.3f} с ({events / elapsed if elapsed else 0:.0f} событий/с), "
+          f"сработало правил: {len(alerts)}")
+    for account, window, rule, value, limit, t, kind in alerts[:50]:
+        print(f"  счёт {account}: окно {window}, {rule} = {value:g} > {limit} "
+              f"({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t))})")
@@ -0,0 +1,147 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from arscode import get_db
+from auth import IMPORT_ITERATIONS, hash_password, is_hashed, normalize_email
+
+# Потоковый импорт пользователей и товаров ChocolateHeaven из CSV или JSONL.
+# Файл читается построчно, строки проверяются и пишутся пачками по chunk_size
+# через executemany — одна транзакция на пачку, поэтому память не растёт с
+# размером файла. Повторный email обновляет существующего пользователя.
+# Битая строка JSONL отклоняется и попадает в отчёт, импорт идёт дальше.
+# Запуск: python shop_import.py users|products ФАЙЛ [размер пачки]
+
+MAX_ERRORS = 20
+
+# Пустые balance/role/password не затирают уже сохранённые значения
+USERS_SQL = '''
+INSERT INTO users (name, email, password, balance, role)
+VALUES (?1, ?2, ?3, COALESCE(?4, 0), COALESCE(?5, 'client'))
+ON CONFLICT(email) DO UPDATE SET
+    name = COALESCE(?1, users.name),
+    password = COALESCE(?3, users.password),
+    balance = COALESCE(?4, users.balance),
+    role = COALESCE(?5, users.role)
+'''
+
+PRODUCTS_SQL = '''
+INSERT INTO products (id, name, category, price, quantity, discount_id) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    name = excluded.name,
+    category = excluded.category,
+    price = excluded.price,
+    quantity = excluded.quantity,
+    discount_id = excluded.discount_id
+'''
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value, kind, field, required=True):
+    value = _text(value)
+    if value is None:
+        if required:
+            raise ValueError(f"нет поля {field}")
+        return None
+    number = kind(value)
+    if number < 0:
+        raise ValueError(f"{field} < 0")
+    return number
+
+
+def user_row(row):
+    email = normalize_email(_text(row.get('email')))
+    if not email or '@' not in email:
+        raise ValueError(f"некорректный email: {email!r}")
+    role = _text(row.get('role'))
+    if role not in (None, 'client', 'admin'):
+        raise ValueError(f"неизвестная роль: {role!r}")
+    password = _text(row.get('password'))
+    # Пароли в открытом виде хешируются с IMPORT_ITERATIONS и перехешируются
+    # при первом входе; уже готовые хеши пишутся как есть
+    if password is not None and not is_hashed(password):
+        password = hash_password(password, IMPORT_ITERATIONS)
+    return (_text(row.get('name')), email, password,
+            _number(row.get('balance'), float, 'balance', required=False), role)
+
+
+def product_row(row):
+    name = _text(row.get('name'))
+    if not name:
+        raise ValueError("нет названия товара")
+    product_id = _text(row.get('id'))
+    discount_id = _text(row.get('discount_id'))
+    return (int(product_id) if product_id else None, name, _text(row.get('category')),
+            _number(row.get('price'), float, 'price'),
+            _number(row.get('quantity'), int, 'quantity', required=False) or 0,
+            int(discount_id) if discount_id else None)
+
+
+KINDS = {
+    'users': (user_row, USERS_SQL),
+    'products': (product_row, PRODUCTS_SQL),
+}
+
+
+def read_rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            # строки JSONL разбираются в import_rows, чтобы ошибка разбора
+            # считалась отклонённой строкой
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def import_rows(kind, rows, chunk_size=5000, db=None):
+    validate, sql = KINDS[kind]
+    db = db or get_db()
+    report = {'read': 0, 'written': 0, 'rejected': 0, 'errors': []}
+    started = time.perf_counter()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        batch = []
+        for number, row in enumerate(chunk, report['read'] + 1):
+            try:
+                if isinstance(row, str):
+                    row = json.loads(row)
+                batch.append(validate(row))
+            except (ValueError, TypeError, AttributeError) as e:
+                report['rejected'] += 1
+                if len(report['errors']) < MAX_ERRORS:
+                    report['errors'].append((number, str(e)))
+        report['read'] += len(chunk)
+        if batch:
+            with db.transaction() as conn:
+                conn.executemany(sql, batch)
+            report['written'] += len(batch)
+    report['seconds'] = time.perf_counter() - started
+    report['rows_per_second'] = report['read'] / report['seconds'] if report['seconds'] else 0.0
+    return report
+
+
+def import_file(kind, path, chunk_size=5000, db=None):
+    return import_rows(kind, read_rows(path), chunk_size, db)
+
+
+if __name__ == "__main__":
+    kind, path = sys.argv[1], sys.argv[2]
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    report = import_file(kind, path, chunk_size)
+    print(f"прочитано {report['read']}, записано {report['written']}, отклонено {report['rejected']} "
+          f"за {report['seconds']:.2f} с ({report['rows_per_second']:.0f} строк/с)")
+    for number, error in report['errors']:
+        print(f"  строка {number}: {error}")
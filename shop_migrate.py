@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+
+from shop_pricing import ShopDatabase
+
+# Перенос каталога ChocolateHeaven из chocolate.db (схема arscode.py) в
+# arscode.db (схема shop_pricing.py). Обе базы подключаются к одному
+# соединению через ATTACH, строки переносятся пачками по chunk_size запросами
+# INSERT ... SELECT — данные не проходят через Python. Деньги из REAL
+# переводятся в целые копейки, текстовые категории товаров — в строки
+# categories. Дубли не создаются: пользователи сводятся по email, категории
+# по названию, купоны по коду, товары по названию и категории.
+# Каждая пачка фиксируется вместе с отметкой в import_progress, а
+# соответствие id источника и arscode.db пишется в import_map, поэтому
+# прерванный перенос продолжается с первой незафиксированной пачки.
+# Запуск: python shop_migrate.py [chocolate.db] [arscode.db] [размер пачки]
+
+SOURCE_FILE = 'chocolate.db'
+
+
+def _cents(column):
+    return f"CAST(ROUND(COALESCE({column}, 0) * 100) AS INTEGER)"
+
+
+USERS_SQL = [f'''
+INSERT INTO main.users (name, email, password, balance, is_admin)
+SELECT s.name, lower(trim(s.email)), s.password, {_cents('s.balance')}, COALESCE(s.role = 'admin', 0)
+FROM src.users s
+WHERE s.id BETWEEN :lo AND :hi AND instr(COALESCE(s.email, ''), '@') > 0
+ORDER BY s.id
+ON CONFLICT(email) DO NOTHING
+''', '''
+INSERT OR REPLACE INTO main.import_map (source, kind, source_id, target_id)
+SELECT :source, 'users', s.id, u.id
+FROM src.users s
+JOIN main.users u ON u.email = lower(trim(s.email))
+WHERE s.id BETWEEN :lo AND :hi
+''']
+
+# valid_to без времени — купон действует весь этот день
+COUPONS_SQL = ['''
+INSERT INTO main.coupons (code, discount, expires_at, usage_limit, used_count, active)
+SELECT trim(s.code), CAST(ROUND(COALESCE(s.discount_percent, 0)) AS INTEGER),
+    CASE WHEN length(s.valid_to) = 10 THEN date(s.valid_to, '+1 day') ELSE s.valid_to END,
+    s.usage_limit, COALESCE(s.used_count, 0), COALESCE(s.is_active, 1)
+FROM src.coupons s
+WHERE s.id BETWEEN :lo AND :hi AND COALESCE(trim(s.code), '') <> ''
+ORDER BY s.id
+ON CONFLICT(code) DO NOTHING
+''']
+
+# Скидка категории — наибольшая активная скидка discounts с applies_to = 'category'
+PRODUCTS_SQL = ['''
+INSERT INTO main.categories (name, discount)
+SELECT trim(s.category), COALESCE((
+    SELECT CAST(ROUND(MAX(d.discount_percent)) AS INTEGER) FROM src.discounts d
+    WHERE d.applies_to = 'category' AND d.is_active = 1 AND d.target_value = trim(s.category)), 0)
+FROM src.products s
+WHERE s.id BETWEEN :lo AND :hi AND COALESCE(trim(s.category), '') <> ''
+GROUP BY trim(s.category)
+ON CONFLICT(name) DO NOTHING
+''', f'''
+INSERT INTO main.products (name, category_id, price, stock, discount)
+SELECT s.name, s.category_id, s.price, s.stock, s.discount
+FROM (
+    SELECT s.id, trim(s.name) AS name, c.id AS category_id, {_cents('s.price')} AS price,
+        COALESCE(s.quantity, 0) AS stock, COALESCE(CAST(ROUND(d.discount_percent) AS INTEGER), 0) AS discount,
+        row_number() OVER (PARTITION BY trim(s.name), c.id ORDER BY s.id) AS n
+    FROM src.products s
+    LEFT JOIN main.categories c ON c.name = trim(s.category)
+    LEFT JOIN src.discounts d ON d.id = s.discount_id AND d.is_active = 1
+    WHERE s.id BETWEEN :lo AND :hi AND COALESCE(trim(s.name), '') <> ''
+) s
+WHERE s.n = 1 AND NOT EXISTS (
+    SELECT 1 FROM main.products p WHERE p.name = s.name AND p.category_id IS s.category_id)
+ORDER BY s.id
+''', '''
+INSERT OR REPLACE INTO main.import_map (source, kind, source_id, target_id)
+SELECT :source, 'products', s.id, (
+    SELECT p.id FROM main.products p
+    WHERE p.name = trim(s.name) AND p.category_id IS (SELECT id FROM main.categories WHERE name = trim(s.category))
+    ORDER BY p.id LIMIT 1)
+FROM src.products s
+WHERE s.id BETWEEN :lo AND :hi AND COALESCE(trim(s.name), '') <> ''
+''']
+
+# Заказы получают id подряд после последнего заказа arscode.db; {pk} — d
+# в chocolate.db до миграции 2 arscode.py и id после неё
+ORDERS_SQL = ['''
+INSERT INTO main.import_map (source, kind, source_id, target_id)
+SELECT :source, 'orders', s.{pk}, :base + row_number() OVER (ORDER BY s.{pk})
+FROM src.orders s
+WHERE s.{pk} BETWEEN :lo AND :hi
+''', f'''
+INSERT INTO main.orders (id, user_id, total, coupon_code, created_at, status)
+SELECT m.target_id, u.target_id, {_cents('s.total_price')}, trim(c.code), s.created_at, s.status
+FROM src.orders s
+JOIN main.import_map m ON m.source = :source AND m.kind = 'orders' AND m.source_id = s.{{pk}}
+LEFT JOIN main.import_map u ON u.source = :source AND u.kind = 'users' AND u.source_id = s.user_id
+LEFT JOIN src.coupons c ON c.id = s.coupon_id
+WHERE s.{{pk}} BETWEEN :lo AND :hi
+ORDER BY s.{{pk}}
+''']
+
+# Позиции заказов, не попавших в arscode.db, пропускаются
+ORDER_ITEMS_SQL = [f'''
+INSERT INTO main.order_items (order_id, product_id, quantity, price_at_purchase)
+SELECT o.target_id, p.target_id, s.quantity, {_cents('s.price')}
+FROM src.order_items s
+JOIN main.import_map o ON o.source = :source AND o.kind = 'orders' AND o.source_id = s.order_id
+LEFT JOIN main.import_map p ON p.source = :source AND p.kind = 'products' AND p.source_id = s.product_id
+WHERE s.id BETWEEN :lo AND :hi
+ORDER BY s.id
+''']
+
+# шаг: (таблица источника, запросы, номер запроса, чьи строки считаются
+# записанными) — в порядке зависимостей
+STEPS = [
+    ('users', 'users', USERS_SQL, 0),
+    ('coupons', 'coupons', COUPONS_SQL, 0),
+    ('products', 'products', PRODUCTS_SQL, 1),
+    ('orders', 'orders', ORDERS_SQL, 1),
+    ('order_items', 'order_items', ORDER_ITEMS_SQL, 0),
+]
+
+
+def _primary_key(conn, table):
+    for row in conn.execute(f'PRAGMA src.table_info({table})'):
+        if row['pk'] == 1:
+            return row['name']
+    return 'rowid'
+
+
+def _last_order_id(conn):
+    row = conn.execute("SELECT MAX(COALESCE((SELECT MAX(id) FROM main.orders), 0), "
+                       "COALESCE((SELECT seq FROM main.sqlite_sequence WHERE name = 'orders'), 0))").fetchone()
+    return row[0]
+
+
+def _migrate_step(db, source, step, table, statements, counted, chunk_size, progress):
+    report = {'read': 0, 'written': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+    with db.connection() as conn:
+        pk = _primary_key(conn, table)
+        statements = [sql.replace('{pk}', pk) for sql in statements]
+        row = conn.execute('SELECT last_id FROM import_progress WHERE source = ? AND step = ?',
+                           (source, step)).fetchone()
+        last_id = row[0] if row else 0
+        while True:
+            with db.transaction():
+                hi, count = conn.execute(f'SELECT MAX({pk}), COUNT(*) FROM (SELECT {pk} FROM src.{table} '
+                                         f'WHERE {pk} > ? ORDER BY {pk} LIMIT ?)', (last_id, chunk_size)).fetchone()
+                if not count:
+                    break
+                params = {'source': source, 'lo': last_id + 1, 'hi': hi}
+                if step == 'orders':
+                    params['base'] = _last_order_id(conn)
+                for number, sql in enumerate(statements):
+                    cursor = conn.execute(sql, params)
+                    if number == counted:
+                        written = cursor.rowcount
+                conn.execute('INSERT INTO import_progress (source, step, last_id, rows) VALUES (?, ?, ?, ?) '
+                             'ON CONFLICT(source, step) DO UPDATE SET last_id = excluded.last_id, '
+                             'rows = rows + excluded.rows', (source, step, hi, count))
+            last_id = hi
+            report['read'] += count
+            report['written'] += written
+            report['seconds'] = time.perf_counter() - started
+            if progress is not None:
+                progress(step, report)
+    report['seconds'] = time.perf_counter() - started
+    report['rows_per_second'] = report['read'] / report['seconds'] if report['seconds'] else 0.0
+    return report
+
+
+# Переносит source в базу db (по умолчанию arscode.db). label — имя источника
+# в import_progress/import_map: под тем же label перенос продолжается с места
+# остановки, уже перенесённые пачки не повторяются.
+def migrate_shop(source=SOURCE_FILE, db=None, chunk_size=50_000, label=None, progress=None):
+    if not os.path.exists(source):
+        raise FileNotFoundError(source)
+    db = db or ShopDatabase()
+    label = label or os.path.basename(source)
+    reports = {}
+    with db.connection() as conn:
+        conn.execute('ATTACH DATABASE ? AS src', (source,))
+        try:
+            for step, table, statements, counted in STEPS:
+                reports[step] = _migrate_step(db, label, step, table, statements, counted, chunk_size, progress)
+        finally:
+            conn.execute('DETACH DATABASE src')
+    return reports
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else SOURCE_FILE
+    db = ShopDatabase(sys.argv[2]) if len(sys.argv) > 2 else ShopDatabase()
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else 50_000
+
+    def show(step, report):
+        print(f"\r{step}: {report['read']} строк ({report['read'] / report['seconds']:.0f} строк/с)",
+              end='', flush=True)
+
+    reports = migrate_shop(source, db, chunk_size, progress=show)
+    print()
+    for step, report in reports.items():
+        print(f"{step}: прочитано {report['read']}, записано {report['written']} "
+              f"(дублей и пропусков {report['read'] - report['written']}) за {report['seconds']:.2f} с "
+              f"({report['rows_per_second']:.0f} строк/с)")
@@ -0,0 +1,307 @@
+import sys
+import threading
+from datetime import datetime
+
+from db_pool import ConnectionPool
+from errors import InvalidCouponError
+
+# Расчёт корзины для схемы arscode.db: скидка товара, скидка категории и
+# общая скидка из globals применяются по очереди, затем купон на сумму.
+# Все суммы в целых копейках, как и цены в arscode.db; каждая скидка
+# округляется до копейки (половина — вверх). Скидки категорий и общая скидка
+# держатся в памяти и перечитываются, только когда триггеры увеличили их
+# версию в table_versions; корзина с товарами читается одним запросом по
+# индексу carts(user_id, product_id).
+
+DB_FILE = 'arscode.db'
+CENTS = 100
+
+MIGRATIONS = [
+(1, [
+'''
+CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            discount INTEGER DEFAULT 0  -- percent integer
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category_id INTEGER,
+            price INTEGER NOT NULL,
+            stock INTEGER DEFAULT 0,
+            discount INTEGER DEFAULT 0,  -- percent for product
+            FOREIGN KEY(category_id) REFERENCES categories(id)
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            email TEXT UNIQUE,
+            password TEXT,
+            balance INTEGER DEFAULT 0,
+            is_admin INTEGER DEFAULT 0
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS carts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER,
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(product_id) REFERENCES products(id)
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            total INTEGER,
+            coupon_code TEXT,
+            created_at TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER,
+            price_at_purchase INTEGER,
+            discount_applied INTEGER,
+            FOREIGN KEY(order_id) REFERENCES orders(id),
+            FOREIGN KEY(product_id) REFERENCES products(id)
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS coupons (
+            code TEXT PRIMARY KEY,
+            discount INTEGER,  -- percent
+            expires_at TEXT,   -- ISO date
+            usage_limit INTEGER,
+            used_count INTEGER DEFAULT 0,
+            active INTEGER DEFAULT 1
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS coupon_uses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            coupon_code TEXT,
+            user_id INTEGER,
+            used_at TEXT,
+            FOREIGN KEY(coupon_code) REFERENCES coupons(code),
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            order_id INTEGER,
+            amount INTEGER,
+            type TEXT,
+            created_at TEXT
+        )
+''',
+'''
+CREATE TABLE IF NOT EXISTS globals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            global_discount INTEGER DEFAULT 0
+        )
+''',
+"INSERT OR IGNORE INTO globals (id, global_discount) VALUES (1, 0)",
+]),
+# Корзина пользователя по индексу; версии скидок категорий и общей скидки
+(2, [
+"CREATE INDEX IF NOT EXISTS carts_user_product ON carts(user_id, product_id)",
+"CREATE INDEX IF NOT EXISTS products_category ON products(category_id)",
+'''
+CREATE TABLE IF NOT EXISTS table_versions (
+name TEXT PRIMARY KEY,
+version INTEGER NOT NULL DEFAULT 0
+)
+''',
+"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('categories', 0), ('globals', 0)",
+'''
+CREATE TRIGGER IF NOT EXISTS categories_version_insert AFTER INSERT ON categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'categories';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS categories_version_update AFTER UPDATE ON categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'categories';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS categories_version_delete AFTER DELETE ON categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'categories';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS globals_version_insert AFTER INSERT ON globals
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'globals';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS globals_version_update AFTER UPDATE ON globals
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'globals';
+END
+''',
+'''
+CREATE TRIGGER IF NOT EXISTS globals_version_delete AFTER DELETE ON globals
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'globals';
+END
+''',
+]),
+# Перенос каталога из chocolate.db (shop_migrate.py): статус заказа, поиск
+# уже перенесённого товара по названию и категории, прогресс и соответствие
+# id источника и arscode.db для продолжения после обрыва
+(3, [
+"ALTER TABLE orders ADD COLUMN status TEXT",
+"CREATE INDEX IF NOT EXISTS products_name_category ON products(name, category_id)",
+'''
+CREATE TABLE IF NOT EXISTS import_progress (
+source TEXT,
+step TEXT,
+last_id INTEGER NOT NULL DEFAULT 0,
+rows INTEGER NOT NULL DEFAULT 0,
+PRIMARY KEY (source, step)
+)
+''',
+'''
+CREATE TABLE IF NOT EXISTS import_map (
+source TEXT,
+kind TEXT,
+source_id INTEGER,
+target_id INTEGER,
+PRIMARY KEY (source, kind, source_id)
+) WITHOUT ROWID
+''',
+]),
+]
+
+CART_SQL = '''
+SELECT p.id, p.name, p.price, p.discount, p.category_id, p.stock, SUM(c.quantity) AS quantity
+FROM carts c
+JOIN products p ON p.id = c.product_id
+WHERE c.user_id = ?
+GROUP BY c.product_id
+ORDER BY c.product_id
+'''
+
+
+class ShopDatabase(ConnectionPool):
+    default_file = DB_FILE
+    migrations = MIGRATIONS
+
+
+def _percent(value):
+    return min(max(int(value or 0), 0), 100)
+
+
+# Скидка percent к сумме в копейках с округлением до копейки
+def apply_percent(cents, percent):
+    return (cents * (100 - percent) + 50) // 100
+
+
+def format_cents(cents):
+    return f"{cents // CENTS}.{cents % CENTS:02d}"
+
+
+class CartPricer:
+    def __init__(self, db=None):
+        self.db = db or ShopDatabase()
+        self._lock = threading.Lock()
+        self._versions = None
+        self._categories = {}
+        self._global = 0
+        self.reloads = 0
+
+    def _refresh(self, conn):
+        versions = tuple(conn.execute("SELECT version FROM table_versions WHERE name IN ('categories', 'globals') "
+                                      "ORDER BY name").fetchall())
+        if versions == self._versions:
+            return
+        with self._lock:
+            if versions == self._versions:
+                return
+            self._categories = {row[0]: _percent(row[1]) for row in conn.execute('SELECT id, discount FROM categories')}
+            row = conn.execute('SELECT global_discount FROM globals WHERE id = 1').fetchone()
+            self._global = _percent(row[0]) if row else 0
+            self._versions = versions
+            self.reloads += 1
+
+    def coupon(self, code, now=None, conn=None):
+        if conn is None:
+            with self.db.connection() as conn:
+                return self.coupon(code, now, conn)
+        now = (now or datetime.now()).isoformat()
+        row = conn.execute('SELECT code, discount, expires_at, usage_limit, used_count, active FROM coupons '
+                           'WHERE code = ?', (code,)).fetchone()
+        if (row is None or not row['active'] or (row['expires_at'] and row['expires_at'] <= now)
+                or (row['usage_limit'] is not None and (row['used_count'] or 0) >= row['usage_limit'])):
+            raise InvalidCouponError(f"Купон {code} недействителен")
+        return row
+
+    # Корзина пользователя из carts. Строки: цена за штуку до и после скидок,
+    # проценты скидок (товар, категория, общая) и сумма строки — всё в копейках.
+    def price_cart(self, user_id, coupon_code=None, now=None, conn=None):
+        if conn is None:
+            with self.db.connection() as conn:
+                return self.price_cart(user_id, coupon_code, now, conn)
+
+        self._refresh(conn)
+        categories, global_percent = self._categories, self._global
+        lines = []
+        subtotal = 0
+        for product_id, name, price, discount, category_id, stock, quantity in conn.execute(CART_SQL, (user_id,)):
+            if quantity <= 0:
+                continue
+            base = price
+            discounts = (_percent(discount), categories.get(category_id, 0), global_percent)
+            unit = base
+            for percent in discounts:
+                unit = apply_percent(unit, percent)
+            line_total = unit * quantity
+            lines.append({'product_id': product_id, 'name': name, 'quantity': quantity, 'stock': stock,
+                          'base_cents': base, 'discounts': discounts, 'unit_cents': unit,
+                          'line_cents': line_total})
+            subtotal += line_total
+
+        coupon = None
+        total = subtotal
+        if coupon_code:
+            coupon = self.coupon(coupon_code, now, conn)
+            total = apply_percent(subtotal, _percent(coupon['discount']))
+        return {'user_id': user_id, 'lines': lines, 'subtotal_cents': subtotal,
+                'coupon': coupon['code'] if coupon else None, 'total_cents': total}
+
+
+_pricers = {}
+
+def get_cart_pricer(db=None):
+    db_file = db.db_file if db is not None else DB_FILE
+    pricer = _pricers.get(db_file)
+    if pricer is None:
+        pricer = _pricers.setdefault(db_file, CartPricer(db or ShopDatabase(db_file)))
+    return pricer
+
+
+if __name__ == "__main__":
+    priced = get_cart_pricer().price_cart(int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+                                          sys.argv[2] if len(sys.argv) > 2 else None)
+    for line in priced['lines']:
+        print(f"{line['name']}: {line['quantity']} × {format_cents(line['unit_cents'])} "
+              f"(было {format_cents(line['base_cents'])}, скидки {line['discounts']}) = {format_cents(line['line_cents'])}")
+    print(f"Итого: {format_cents(priced['subtotal_cents'])}, к оплате: {format_cents(priced['total_cents'])}")
@@ -0,0 +1,221 @@
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import time
+from array import array
+
+import numpy as np
+
+# Снимок таблицы students (school.db или school_v2.db) в колоночный файл для
+# аналитики. Каждый столбец — отдельный типизированный массив, имена и почты
+# закодированы словарём (в столбце номер строки словаря). Файл открывается
+# через mmap, фильтры по классу и возрасту и группировки считаются numpy
+# одним проходом по массивам; строки словаря декодируются только для
+# выбранных записей. NULL во всех столбцах хранится как -1.
+#
+# Устройство файла: MAGIC, блоки столбцов (каждый выровнен на 64 байта),
+# JSON-оглавление с типами и смещениями блоков, длина оглавления (8 байт) и
+# снова MAGIC.
+# Запуск: python student_columns.py export [school_v2.db] [students.col]
+#         python student_columns.py query [students.col]
+
+MAGIC = b'STUDCOL1'
+ALIGN = 64
+NULL = -1
+
+# столбец: (тип массива при выгрузке, тип в файле)
+COLUMNS = {
+    'id': ('q', '<i8'),
+    'age': ('h', '<i2'),
+    'grade': ('h', '<i2'),
+    'name': ('i', '<i4'),
+    'email': ('i', '<i4'),
+}
+DICTIONARY_COLUMNS = ('name', 'email')
+
+
+def _encode(values, index):
+    return [NULL if value is None else index.setdefault(value, len(index)) for value in values]
+
+
+def _dictionary_blocks(index):
+    data = [value.encode('utf-8') for value in index]
+    offsets = np.zeros(len(data) + 1, dtype='<i8')
+    np.cumsum([len(value) for value in data], out=offsets[1:])
+    return offsets, b''.join(data)
+
+
+# Выгружает students из conn в path. Строки читаются страницами по id, файл
+# пишется во временный и подменяется целиком, так что читатели старого
+# снимка его не видят недописанным. Возвращает число строк.
+def export_students(conn, path, page_size=50_000):
+    has_grade = any(row[1] == 'grade' for row in conn.execute('PRAGMA table_info(students)'))
+    select = ('SELECT id, age, {}, name, email FROM students WHERE id > ? ORDER BY id LIMIT ?'
+              .format('grade' if has_grade else 'NULL'))
+    columns = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+    indexes = {name: {} for name in DICTIONARY_COLUMNS}
+    last_id = 0
+    while True:
+        rows = conn.execute(select, (last_id, page_size)).fetchall()
+        if not rows:
+            break
+        ids, ages, grades, names, emails = zip(*rows)
+        columns['id'].extend(ids)
+        columns['age'].extend(NULL if age is None else age for age in ages)
+        columns['grade'].extend(NULL if grade is None else grade for grade in grades)
+        columns['name'].extend(_encode(names, indexes['name']))
+        columns['email'].extend(_encode(emails, indexes['email']))
+        last_id = rows[-1][0]
+
+    blocks = [(f'column:{name}', np.frombuffer(values, dtype=values.typecode).astype(COLUMNS[name][1], copy=False))
+              for name, values in columns.items()]
+    for name, index in indexes.items():
+        offsets, data = _dictionary_blocks(index)
+        blocks.append((f'offsets:{name}', offsets))
+        blocks.append((f'data:{name}', np.frombuffer(data, dtype=np.uint8)))
+
+    toc = {'rows': len(columns['id']), 'exported_at': time.time(), 'blocks': {}}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for name, block in blocks:
+            f.write(b'\0' * (-f.tell() % ALIGN))
+            toc['blocks'][name] = (block.dtype.str, f.tell(), len(block))
+            f.write(block.tobytes())
+        footer = json.dumps(toc).encode('utf-8')
+        f.write(footer)
+        f.write(len(footer).to_bytes(8, 'little'))
+        f.write(MAGIC)
+    os.replace(tmp_path, path)
+    return toc['rows']
+
+
+class StudentColumns:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self._mmap)
+        if size < 2 * len(MAGIC) + 8 or self._mmap[:len(MAGIC)] != MAGIC or self._mmap[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"{path}: не колоночный снимок students")
+        footer_size = int.from_bytes(self._mmap[size - len(MAGIC) - 8:size - len(MAGIC)], 'little')
+        footer_end = size - len(MAGIC) - 8
+        toc = json.loads(self._mmap[footer_end - footer_size:footer_end])
+        self.rows = toc['rows']
+        self.exported_at = toc['exported_at']
+        self._blocks = toc['blocks']
+        self.id = self._block('column:id')
+        self.age = self._block('column:age')
+        self.grade = self._block('column:grade')
+        self.name = self._block('column:name')
+        self.email = self._block('column:email')
+        self._lookup = {}
+
+    def _block(self, name):
+        dtype, offset, count = self._blocks[name]
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+
+    def __len__(self):
+        return self.rows
+
+    def dictionary_size(self, column):
+        return self._blocks[f'offsets:{column}'][2] - 1
+
+    # Значения словаря column по номерам codes (номер -1 — None)
+    def decode(self, column, codes):
+        offsets = self._block(f'offsets:{column}')
+        _, data_offset, _ = self._blocks[f'data:{column}']
+        values = {NULL: None}
+        for code in np.unique(codes).tolist():
+            if code != NULL:
+                start, end = int(offsets[code]), int(offsets[code + 1])
+                values[code] = self._mmap[data_offset + start:data_offset + end].decode('utf-8')
+        return [values[code] for code in codes.tolist()]
+
+    # Номер значения в словаре column или None, если такого значения нет
+    def code(self, column, value):
+        lookup = self._lookup.get(column)
+        if lookup is None:
+            codes = np.arange(self.dictionary_size(column))
+            lookup = self._lookup[column] = dict(zip(self.decode(column, codes), codes.tolist()))
+        return lookup.get(value)
+
+    # Булева маска строк; grade — номер класса или список номеров, возраст —
+    # строго больше age_above и строго меньше age_below, name и email — точное
+    # совпадение
+    def where(self, grade=None, age_above=None, age_below=None, name=None, email=None):
+        mask = np.ones(self.rows, dtype=bool)
+        if grade is not None:
+            mask &= np.isin(self.grade, grade) if isinstance(grade, (list, tuple, set)) else self.grade == grade
+        if age_above is not None:
+            mask &= self.age > age_above
+        if age_below is not None:
+            mask &= (self.age != NULL) & (self.age < age_below)
+        for column, value in (('name', name), ('email', email)):
+            if value is not None:
+                code = self.code(column, value)
+                if code is None:
+                    mask[:] = False
+                else:
+                    mask &= getattr(self, column) == code
+        return mask
+
+    def count(self, mask=None):
+        return self.rows if mask is None else int(np.count_nonzero(mask))
+
+    # Строки (кортежи значений columns) под маской, в порядке id
+    def select(self, mask=None, columns=('id', 'name', 'age', 'email', 'grade')):
+        picked = []
+        for column in columns:
+            values = getattr(self, column) if mask is None else getattr(self, column)[mask]
+            if column in DICTIONARY_COLUMNS:
+                picked.append(self.decode(column, values))
+            elif column in ('age', 'grade'):
+                picked.append([None if value == NULL else value for value in values.tolist()])
+            else:
+                picked.append(values.tolist())
+        return list(zip(*picked))
+
+    # Число учеников и средний возраст по значениям столбца key (grade, age,
+    # name или email) под маской: {значение: (число, средний возраст)}
+    def group_by(self, key='grade', mask=None):
+        keys = getattr(self, key)
+        ages = self.age
+        if mask is not None:
+            keys, ages = keys[mask], ages[mask]
+        if not len(keys):
+            return {}
+        low = int(keys.min())
+        shifted = (keys - low).astype(np.intp)
+        counts = np.bincount(shifted)
+        known = ages != NULL
+        age_sums = np.bincount(shifted[known], weights=ages[known], minlength=len(counts))
+        age_counts = np.bincount(shifted[known], minlength=len(counts))
+        present = np.flatnonzero(counts)
+        values = (present + low).tolist()
+        if key in DICTIONARY_COLUMNS:
+            values = self.decode(key, present + low)
+        else:
+            values = [None if value == NULL else value for value in values]
+        return {value: (int(counts[i]), float(age_sums[i] / age_counts[i]) if age_counts[i] else None)
+                for value, i in zip(values, present.tolist())}
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'query'
+    if command == 'export':
+        conn = sqlite3.connect(sys.argv[2] if len(sys.argv) > 2 else 'school_v2.db')
+        path = sys.argv[3] if len(sys.argv) > 3 else 'students.col'
+        started = time.perf_counter()
+        rows = export_students(conn, path)
+        print(f"{rows} учеников выгружено в {path} за {time.perf_counter() - started:.2f} с")
+    else:
+        students = StudentColumns(sys.argv[2] if len(sys.argv) > 2 else 'students.col')
+        print("\n ====== Студенты 10 класса ======")
+        for row in students.select(students.where(grade=10)):
+            print(row)
+        print(f"\n ====== Студенты старше 15 лет: {students.count(students.where(age_above=15))} ======")
+        print("\n ====== По классам: число, средний возраст ======")
+        for grade, (count, mean_age) in sorted(students.group_by('grade').items(), key=lambda item: -1 if item[0] is None else item[0]):
+            print(grade, count, mean_age)
@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from bank_writer import GroupCommitWriter
+from ledger import BankDatabase, Ledger
+
+
+class GroupCommitWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'bank.db')
+        self.ledger = Ledger(BankDatabase(self.path, timeout=0.2))
+
+    def tearDown(self):
+        self.ledger.db.close()
+        self.directory.cleanup()
+
+    def test_transfer(self):
+        with GroupCommitWriter(self.ledger) as writer:
+            txn_id = writer.transfer(self.ledger.client_id('Малика'), self.ledger.client_id('Али'), 100).result(5)
+        self.assertIsNotNone(txn_id)
+        self.assertEqual(self.ledger.balance(self.ledger.client_id('Али')), 10100)
+
+    # База занята дольше timeout: BEGIN пачки не удаётся, и каждая её операция
+    # должна завершиться ошибкой, а не зависнуть
+    def test_busy_database_fails_batch(self):
+        blocker = sqlite3.connect(self.path, isolation_level=None)
+        blocker.execute('BEGIN IMMEDIATE')
+        try:
+            with GroupCommitWriter(self.ledger) as writer:
+                futures = [writer.deposit(self.ledger.client_id('Али'), 10) for _ in range(3)]
+                for future in futures:
+                    with self.assertRaises(sqlite3.OperationalError):
+                        future.result(5)
+                blocker.rollback()
+                self.assertIsNotNone(writer.deposit(self.ledger.client_id('Али'), 10).result(5))
+                self.assertEqual(writer.metrics()['failed'], 3)
+        finally:
+            blocker.close()
+        self.assertEqual(self.ledger.balance(self.ledger.client_id('Али')), 10010)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import re
+import tempfile
+import unittest
+
+from arscode import REPORT_QUERIES, DatabaseManager
+
+# Планы запросов отчётов arscode.py: EXPLAIN QUERY PLAN каждого запроса не
+# должен содержать полного просмотра таблицы (SCAN), кроме таблиц, которые
+# отчёт по смыслу читает целиком, и автоматических индексов (SQLite строит
+# их полным просмотром на каждый запрос).
+# Запуск: python -m unittest discover -s tests -t .  (или python -m pytest tests)
+
+SCAN = re.compile(r'^SCAN (\w+)')
+AUTOMATIC = re.compile(r'^SEARCH \w+ USING AUTOMATIC ')
+
+
+def query_plan(conn, sql, params):
+    return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+class ReportQueryPlanTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.db = DatabaseManager(os.path.join(cls.directory.name, 'plans.db'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.directory.cleanup()
+
+    def test_no_unexpected_full_scans(self):
+        with self.db.connection() as conn:
+            for name, (sql, params, allowed) in REPORT_QUERIES.items():
+                with self.subTest(report=name):
+                    plan = query_plan(conn, sql, params)
+                    scans = [detail for detail in plan
+                             if (SCAN.match(detail) and SCAN.match(detail).group(1) not in allowed)
+                             or AUTOMATIC.match(detail)]
+                    self.assertEqual(scans, [], f"{name}: полный просмотр в плане {plan}")
+
+    # Разрешённый полный просмотр, которого в плане уже нет, — устаревшая
+    # запись: она скрыла бы будущую регрессию этой таблицы.
+    def test_allowed_scans_are_used(self):
+        with self.db.connection() as conn:
+            for name, (sql, params, allowed) in REPORT_QUERIES.items():
+                with self.subTest(report=name):
+                    scanned = {SCAN.match(detail).group(1) for detail in query_plan(conn, sql, params)
+                               if SCAN.match(detail)}
+                    self.assertEqual(set(allowed) - scanned, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from arscode import DatabaseManager, ReservationConflictError, checkout
+from reservations import StockReservations
+
+
+class StockReservationsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = DatabaseManager(os.path.join(self.directory.name, 'shop.db'))
+        with self.db.transaction() as conn:
+            self.product_id = conn.execute("INSERT INTO products (name, category, price, quantity) "
+                                           "VALUES ('Шоколад', 'chocolate', 10.0, 5)").lastrowid
+            self.owner, self.stranger = (
+                conn.execute("INSERT INTO users (name, email, password, balance, role) "
+                             "VALUES (?, ?, 'x', 100.0, 'client')", (name, f'{name}@example.com')).lastrowid
+                for name in ('owner', 'stranger'))
+        self.holds = StockReservations(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        self.directory.cleanup()
+
+    def stock(self):
+        with self.db.connection() as conn:
+            return conn.execute('SELECT quantity FROM products WHERE id = ?', (self.product_id,)).fetchone()[0]
+
+    def test_confirm_by_holder(self):
+        hold_id = self.holds.hold(self.product_id, 2, holder=self.owner)
+        order = self.holds.confirm(hold_id, self.owner)
+        self.assertEqual(order['lines'][0]['quantity'], 2)
+        self.assertEqual(self.stock(), 3)
+
+    # Чужой резерв нельзя ни подтвердить, ни списать через checkout(hold_ids=...)
+    def test_foreign_hold_rejected(self):
+        hold_id = self.holds.hold(self.product_id, 2, holder=self.owner)
+        with self.assertRaises(ReservationConflictError):
+            self.holds.confirm(hold_id, self.stranger)
+        with self.assertRaises(ReservationConflictError):
+            checkout(self.stranger, {self.product_id: 2}, db=self.db, hold_ids=(hold_id,))
+        self.assertEqual(self.stock(), 3)
+        self.holds.confirm(hold_id, self.owner)
+        self.assertEqual(self.stock(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+import os
+
+from flask import Flask, jsonify, request, session
+
+from arscode import (InsufficientBalanceError, InvalidCouponError, OutOfStockError,
+                     checkout, discount_perfomance, get_authenticator, get_coupon_usage,
+                     get_db, get_discount_engine, get_top_products, get_total_revenue)
+
+# HTTP API для ChocolateHeaven поверх общего пула соединений arscode.
+# Каталог отдаётся страницами по id (after_id + limit) с ETag по версии
+# каталога (название, категория, цена, скидка товаров) — без остатков, они
+# меняются с каждой покупкой и отдаются отдельно без кэширования через
+# /api/products/stock. Корзина хранится в подписанной cookie-сессии.
+# Запуск: python webapp.py  (порт из PORT, по умолчанию 5000)
+
+MAX_PAGE = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _int_arg(name, default, low=0, high=None):
+    value = request.args.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"{name} должен быть целым числом")
+    if value < low or (high is not None and value > high):
+        raise ApiError(f"{name} вне диапазона")
+    return value
+
+
+def _json_body():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ApiError("ожидается JSON-объект")
+    return data
+
+
+def _rows(rows):
+    return [dict(row) for row in rows]
+
+
+def create_app(db=None):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SHOP_SECRET_KEY') or os.urandom(32)
+    app.json.ensure_ascii = False
+    db = db or get_db()
+
+    def current_user():
+        user_id = session.get('user_id')
+        if user_id is None:
+            raise ApiError("нужно войти", 401)
+        return user_id
+
+    def require_admin():
+        user_id = current_user()
+        with db.connection() as conn:
+            row = conn.execute('SELECT role FROM users WHERE id = ?', (user_id,)).fetchone()
+        if row is None or row['role'] != 'admin':
+            raise ApiError("доступ только для администратора", 403)
+
+    def catalog_version(conn):
+        row = conn.execute("SELECT version FROM table_versions WHERE name = 'products'").fetchone()
+        return row[0] if row else 0
+
+    @app.errorhandler(ApiError)
+    def api_error(e):
+        return jsonify(error=str(e)), e.status
+
+    @app.post('/api/login')
+    def login():
+        data = _json_body()
+        user_id = get_authenticator(db).verify(str(data.get('email', '')), str(data.get('password', '')))
+        if user_id is None:
+            raise ApiError("неверный email или пароль", 401)
+        session.clear()
+        session['user_id'] = user_id
+        return jsonify(user_id=user_id)
+
+    @app.post('/api/logout')
+    def logout():
+        session.clear()
+        return jsonify(ok=True)
+
+    @app.get('/api/products')
+    def products():
+        after_id = _int_arg('after_id', 0)
+        limit = _int_arg('limit', 20, 1, MAX_PAGE)
+        with db.connection() as conn:
+            etag = f'p{catalog_version(conn)}-{after_id}-{limit}'
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                items = _rows(conn.execute('SELECT id, name, category, price FROM products '
+                                           'WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit)))
+                next_after_id = items[-1]['id'] if len(items) == limit else None
+                response = jsonify(items=items, next_after_id=next_after_id)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, max-age=5, must-revalidate'
+        return response
+
+    @app.get('/api/products/<int:product_id>')
+    def product(product_id):
+        with db.connection() as conn:
+            etag = f'p{catalog_version(conn)}-item{product_id}'
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                row = conn.execute('SELECT id, name, category, price FROM products WHERE id = ?',
+                                   (product_id,)).fetchone()
+                if row is None:
+                    raise ApiError("товар не найден", 404)
+                response = jsonify(dict(row))
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, max-age=5, must-revalidate'
+        return response
+
+    # Остатки товаров ids (через запятую, не больше MAX_PAGE): {id: quantity}
+    @app.get('/api/products/stock')
+    def stock():
+        try:
+            ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            raise ApiError("ids должен быть списком целых чисел")
+        if not ids or len(ids) > MAX_PAGE:
+            raise ApiError("ids вне диапазона")
+        with db.connection() as conn:
+            rows = conn.execute(f"SELECT id, quantity FROM products WHERE id IN ({', '.join('?' * len(ids))})", ids)
+            response = jsonify({str(row['id']): row['quantity'] for row in rows})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    def cart_items():
+        return {int(k): v for k, v in session.get('cart', {}).items()}
+
+    def priced_cart(cart):
+        if not cart:
+            return {'lines': [], 'subtotal': 0, 'total': 0}
+        priced = get_discount_engine(db).price_order(cart)
+        return {'lines': priced['lines'], 'subtotal': priced['subtotal'], 'total': priced['total']}
+
+    @app.get('/api/cart')
+    def get_cart():
+        current_user()
+        try:
+            return jsonify(priced_cart(cart_items()))
+        except ValueError as e:
+            raise ApiError(str(e))
+
+    @app.post('/api/cart')
+    def put_cart():
+        current_user()
+        data = _json_body()
+        try:
+            product_id, quantity = int(data['product_id']), int(data.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            raise ApiError("нужны product_id и quantity")
+        if quantity < 0:
+            raise ApiError("quantity < 0")
+        cart = cart_items()
+        if quantity:
+            cart[product_id] = quantity
+        else:
+            cart.pop(product_id, None)
+        try:
+            priced = priced_cart(cart)
+        except ValueError as e:
+            raise ApiError(str(e))
+        session['cart'] = {str(k): v for k, v in cart.items()}
+        return jsonify(priced)
+
+    @app.delete('/api/cart')
+    def clear_cart():
+        session.pop('cart', None)
+        return jsonify(ok=True)
+
+    @app.post('/api/checkout')
+    def do_checkout():
+        user_id = current_user()
+        cart = cart_items()
+        if not cart:
+            raise ApiError("корзина пуста")
+        coupon_code = (request.get_json(silent=True) or {}).get('coupon_code')
+        try:
+            order = checkout(user_id, cart, coupon_code, db=db)
+        except OutOfStockError as e:
+            raise ApiError(str(e), 409)
+        except InsufficientBalanceError as e:
+            raise ApiError(str(e), 402)
+        except (InvalidCouponError, ValueError) as e:
+            raise ApiError(str(e))
+        session.pop('cart', None)
+        return jsonify(order_id=order['order_id'], total=order['total'], lines=order['lines']), 201
+
+    @app.get('/api/admin/revenue')
+    def revenue():
+        require_admin()
+        period = request.args.get('period', 'daily')
+        try:
+            return jsonify(period=period, total=get_total_revenue(period, db))
+        except ValueError as e:
+            raise ApiError(str(e))
+
+    @app.get('/api/admin/top-products')
+    def top_products():
+        require_admin()
+        return jsonify(items=_rows(get_top_products(_int_arg('limit', 3, 1, MAX_PAGE), db)))
+
+    @app.get('/api/admin/coupons')
+    def coupons():
+        require_admin()
+        return jsonify(items=_rows(get_coupon_usage(db)))
+
+    @app.get('/api/admin/discounts')
+    def discounts():
+        require_admin()
+        return jsonify(items=_rows(discount_perfomance(db)))
+
+    return app
+
+
+if __name__ == "__main__":
+    create_app().run(port=int(os.environ.get('PORT', 5000)), threaded=True)
@@ -1,81 +1,34 @@
-import sqlite3
+from ledger import BankDatabase, Ledger
 
-# === Создание и подключение к базе данных ===
-conn = sqlite3.connect("bank.db")
-cursor = conn.cursor()
-
-# === Создание таблиц ===
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS clients (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    balance INTEGER
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS transactions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    client_name TEXT,
-    amount INTEGER,
-    type TEXT  -- 'deposit' или 'withdraw'
-)
-""")
-conn.commit()
-
-# === Добавляем клиентов ===
-
-cursor.execute("INSERT INTO clients (name, balance) VALUES (?, ?)", 
-            ('Али', 10000))
-
-conn.commit()
-
-cursor.execute("INSERT INTO clients (name, balance) VALUES (?, ?)",
-               ('Малика', 5000))
-
-conn.commit()
-
-cursor.execute("INSERT INTO clients (name, balance) VALUES (?, ?)",
-               ('Тимур', 7000))
-
-conn.commit()
+# === Создание и подключение к базе данных (схема — в ledger.MIGRATIONS) ===
+db = BankDatabase("bank.db")
+ledger = Ledger(db)
+ledger.recover()
 
 print("\n--- Клиенты до перевода ---")
-for row in cursor.execute("SELECT * FROM clients"):
-    print(row)
-
-# Перевод: Малика -> Али 2000
-
-# Уменьшаем баланс Малики
-cursor.execute("UPDATE clients SET balance = balance - 2000 WHERE name = 'Малика'")
-conn.commit()
-
-# Увеличиваем баланс Али
-cursor.execute("UPDATE clients SET balance = balance + 2000 WHERE name = 'Али'")
-
-conn.commit()
-
-# === Добавляем транзакции ===
-cursor.execute("INSERT INTO transactions (client_name, amount, type) VALUES (?, ?, ?)",
-            ("Малика", 2000, "withdraw"))
-            
-cursor.execute("INSERT INTO transactions (client_name, amount, type) VALUES (?, ?, ?)",
-            ("Али", 2000, "deposit"))
-
-conn.commit()
+with db.connection() as conn:
+    for row in conn.execute("SELECT id, name, balance FROM clients"):
+        print(tuple(row))
+
+# Перевод: Малика -> Али 2000 — одной транзакцией, с проводками в журнале
+# и строками withdraw/deposit в transactions. Делается один раз: при
+# повторном запуске перевод уже записан в transactions.
+with db.connection() as conn:
+    done = conn.execute("SELECT 1 FROM transactions WHERE client_name = 'Малика' AND amount = 2000 "
+                        "AND type = 'withdraw'").fetchone()
+if done is None:
+    ledger.transfer(ledger.client_id("Малика"), ledger.client_id("Али"), 2000)
 
 print("\n--- Таблица транзакций ---")
-for row in cursor.execute("SELECT * FROM transactions"):
-    print(row)
-
-# === Удаляем клиентов с балансом < 6000 ===
-# cursor.execute("DELETE FROM clients WHERE balance < 6000")
-# conn.commit()
+with db.connection() as conn:
+    for row in conn.execute("SELECT id, client_name, amount, type FROM transactions"):
+        print(tuple(row))
 
-print("\n--- Клиенты после удаления ---")
-for row in cursor.execute("SELECT * FROM clients"):
-    print(row)
+print("\n--- Клиенты после перевода ---")
+with db.connection() as conn:
+    for row in conn.execute("SELECT id, name, balance FROM clients"):
+        print(tuple(row))
 
 # === Закрываем соединение ===
-conn.close()
-print("\nБаза данных 'bank.db' успешно создана и сохранена!")
\ No newline at end of file
+db.close()
+print("\nБаза данных 'bank.db' успешно создана и сохранена!")